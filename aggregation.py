@@ -0,0 +1,503 @@
+import heapq
+import time
+from array import array
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+from itertools import accumulate
+
+from sentiment import LABELS, NEGATIVE_THRESHOLD, POSITIVE_THRESHOLD, label
+
+from lazy_import import optional_module
+
+# NumPy, imported on first use; None selects the pure-Python fallback
+np = optional_module('numpy')
+
+SECONDS_PER_DAY = 86400
+# Bucket length of each rollup period
+ROLLUP_PERIODS = {'hour': 3600, 'day': SECONDS_PER_DAY}
+
+
+class MatchColumns:
+    """Columnar store of matched posts for fast keyword/competitor statistics
+
+    Per-post columns hold subreddit ID, day, timestamp, score and comments;
+    per-match columns hold (post index, pattern ID) pairs. Pattern IDs index the
+    matcher's keywords first, then its competitors. Group-bys use NumPy when it
+    is installed and fall back to Counters otherwise.
+
+    With `keep_top=N` only the N most engaging post objects are retained (the
+    columns still cover every post), which keeps long backfills bounded.
+
+    Each post also carries the discussion ID a Deduplicator gave it, so counts
+    can be taken per unique discussion as well as per raw post; posts that
+    were never deduplicated are their own discussion.
+
+    Competitor mentions that were scored for sentiment add a (competitor ID,
+    compound score) pair to two more columns.
+    """
+
+    def __init__(self, matcher, keep_top=None):
+        self.matcher = matcher
+        self.competitor_offset = len(matcher.keywords)
+        self.keep_top = keep_top
+        self.posts = []
+        self._post_count = 0
+        self._top_heap = []
+
+        self.subreddit_names = []
+        self._subreddit_ids = {}
+
+        self.post_subreddit = array('l')
+        self.post_timestamp = array('d')
+        self.post_day = array('l')
+        self.post_score = array('q')
+        self.post_comments = array('q')
+        self.post_discussion = array('q')
+
+        self.match_post = array('l')
+        self.match_pattern = array('l')
+        # Pattern IDs of matches found in comments, one entry per matching comment
+        self.comment_pattern = array('l')
+        # Sentiment of scored competitor mentions
+        self.mention_competitor = array('l')
+        self.mention_score = array('d')
+
+        # Posts loaded from JSON carry names rather than pattern IDs
+        self._keyword_ids = {kw: i for i, kw in reversed(list(enumerate(matcher.keywords)))}
+        self._competitor_ids = {c: i for i, c in reversed(list(enumerate(matcher.competitors)))}
+
+    @classmethod
+    def from_posts(cls, posts, matcher, keep_top=None):
+        columns = cls(matcher, keep_top)
+        for post in posts:
+            columns.add(post)
+        return columns
+
+    def __len__(self):
+        return self._post_count
+
+    @property
+    def pattern_count(self):
+        return self.competitor_offset + len(self.matcher.competitors)
+
+    # (keyword ID attribute, competitor ID attribute, keyword name field, competitor name field)
+    POST_MATCHES = ('keyword_ids', 'competitor_ids', 'matched_keywords', 'matched_competitors')
+    COMMENT_MATCHES = ('comment_keyword_ids', 'comment_competitor_ids', 'comment_keywords', 'comment_competitors')
+
+    def _pattern_ids(self, post, fields):
+        keyword_attr, competitor_attr, keyword_field, competitor_field = fields
+        keyword_ids = getattr(post, keyword_attr, None)
+        if keyword_ids is not None:
+            return keyword_ids, getattr(post, competitor_attr)
+        return ([self._keyword_ids[kw] for kw in post.get(keyword_field) or () if kw in self._keyword_ids],
+                [self._competitor_ids[c] for c in post.get(competitor_field) or () if c in self._competitor_ids])
+
+    def _competitor_scores(self, post, competitor_ids):
+        """(competitor ID, sentiment score) pairs of a post's scored competitor mentions"""
+        scores = post.get('competitor_sentiment')
+        if not scores:
+            return ()
+        if getattr(post, 'competitor_ids', None) is not None:
+            return zip(competitor_ids, scores)
+        return [(self._competitor_ids[c], score)
+                for c, score in zip(post.get('matched_competitors') or (), scores) if c in self._competitor_ids]
+
+    def subreddit_id(self, name):
+        subreddit_id = self._subreddit_ids.get(name)
+        if subreddit_id is None:
+            subreddit_id = self._subreddit_ids[name] = len(self.subreddit_names)
+            self.subreddit_names.append(name)
+        return subreddit_id
+
+    def add(self, post):
+        index = self._post_count
+        self._post_count += 1
+        if self.keep_top is None:
+            self.posts.append(post)
+        else:
+            self._retain(index, post)
+
+        created_utc = post.get('created_utc') or 0
+        self.post_subreddit.append(self.subreddit_id(post['subreddit']))
+        self.post_timestamp.append(created_utc)
+        self.post_day.append(int(created_utc // SECONDS_PER_DAY))
+        self.post_score.append(post['score'])
+        self.post_comments.append(post['num_comments'])
+        discussion = post.discussion if hasattr(post, 'discussion') else post.get('discussion')
+        self.post_discussion.append(-1 - index if discussion is None else discussion)
+
+        keyword_ids, competitor_ids = self._pattern_ids(post, self.POST_MATCHES)
+        for pattern_id in keyword_ids:
+            self.match_post.append(index)
+            self.match_pattern.append(pattern_id)
+        for competitor_id in competitor_ids:
+            self.match_post.append(index)
+            self.match_pattern.append(self.competitor_offset + competitor_id)
+        for competitor_id, score in self._competitor_scores(post, competitor_ids):
+            self.mention_competitor.append(competitor_id)
+            self.mention_score.append(score)
+
+        keyword_ids, competitor_ids = self._pattern_ids(post, self.COMMENT_MATCHES)
+        self.comment_pattern.extend(keyword_ids)
+        self.comment_pattern.extend(self.competitor_offset + i for i in competitor_ids)
+
+    @staticmethod
+    def _column(values, dtype):
+        # Zero-copy view of the array buffer
+        return np.frombuffer(values, dtype=dtype) if len(values) else np.zeros(0, dtype=dtype)
+
+    def pattern_counts(self, comments=False):
+        """Mentions per pattern ID (in posts, or in comments), as a list indexed by pattern ID"""
+        values = self.comment_pattern if comments else self.match_pattern
+        if np is not None:
+            patterns = self._column(values, self._long_dtype())
+            return np.bincount(patterns, minlength=self.pattern_count).tolist()
+        counts = Counter(values)
+        return [counts.get(i, 0) for i in range(self.pattern_count)]
+
+    def discussion_count(self):
+        """Number of unique discussions among the posts"""
+        if np is not None:
+            return int(np.unique(self._column(self.post_discussion, np.int64)).size)
+        return len(set(self.post_discussion))
+
+    def pattern_discussion_counts(self):
+        """Unique discussions mentioning each pattern ID (in posts), as a list indexed by pattern ID"""
+        if np is not None:
+            dtype = self._long_dtype()
+            patterns = self._column(self.match_pattern, dtype).astype(np.int64)
+            discussions = self._column(self.post_discussion, np.int64)[self._column(self.match_post, dtype)]
+            pairs = np.unique(np.stack([patterns, discussions]), axis=1)
+            return np.bincount(pairs[0], minlength=self.pattern_count).tolist()
+        counts = Counter(pattern for pattern, _ in
+                         set(zip(self.match_pattern, (self.post_discussion[i] for i in self.match_post))))
+        return [counts.get(i, 0) for i in range(self.pattern_count)]
+
+    def keyword_counts(self, comments=False, unique=False):
+        """Mentions per keyword name (with `unique`, discussions mentioning it)"""
+        counts = defaultdict(int)
+        pattern_counts = self.pattern_discussion_counts() if unique else self.pattern_counts(comments)
+        for i, keyword in enumerate(self.matcher.keywords):
+            if pattern_counts[i]:
+                counts[keyword] += pattern_counts[i]
+        return counts
+
+    def competitor_counts(self, comments=False, unique=False):
+        """Mentions per competitor, keyed by display name (with `unique`, discussions mentioning it)"""
+        counts = defaultdict(int)
+        pattern_counts = self.pattern_discussion_counts() if unique else self.pattern_counts(comments)
+        for i, competitor in enumerate(self.matcher.competitors):
+            count = pattern_counts[self.competitor_offset + i]
+            if count:
+                counts[competitor.title()] += count
+        return counts
+
+    def competitor_sentiment(self):
+        """Scored mentions per competitor display name, as {name: {'negative': n, 'neutral': n,
+        'positive': n, 'mean': average compound score}}"""
+        competitor_count = len(self.matcher.competitors)
+        if not self.mention_competitor:
+            return {}
+        if np is not None:
+            competitors = self._column(self.mention_competitor, self._long_dtype())
+            scores = self._column(self.mention_score, np.float64)
+            labels = (scores > NEGATIVE_THRESHOLD).astype(np.int64) + (scores >= POSITIVE_THRESHOLD)
+            grid = np.bincount(competitors * len(LABELS) + labels,
+                               minlength=competitor_count * len(LABELS)).reshape(competitor_count, len(LABELS))
+            grid = grid.tolist()
+            sums = np.bincount(competitors, weights=scores, minlength=competitor_count).tolist()
+        else:
+            grid = [[0] * len(LABELS) for _ in range(competitor_count)]
+            sums = [0.0] * competitor_count
+            for competitor_id, score in zip(self.mention_competitor, self.mention_score):
+                grid[competitor_id][LABELS.index(label(score))] += 1
+                sums[competitor_id] += score
+
+        result = {}
+        for i, competitor in enumerate(self.matcher.competitors):
+            if not any(grid[i]):
+                continue
+            entry = result.setdefault(competitor.title(), dict.fromkeys(LABELS, 0))
+            for name, count in zip(LABELS, grid[i]):
+                entry[name] += count
+            entry['mean'] = entry.get('mean', 0.0) + sums[i]
+        for entry in result.values():
+            entry['mean'] /= sum(entry[name] for name in LABELS)
+        return result
+
+    def subreddit_counts(self):
+        """Matched posts per subreddit"""
+        if np is not None:
+            ids = self._column(self.post_subreddit, self._long_dtype())
+            counts = np.bincount(ids, minlength=len(self.subreddit_names)).tolist()
+        else:
+            counter = Counter(self.post_subreddit)
+            counts = [counter.get(i, 0) for i in range(len(self.subreddit_names))]
+        return dict(zip(self.subreddit_names, counts))
+
+    def daily_counts(self):
+        """Matched posts per UTC day, oldest first, as {date: count}"""
+        if np is not None:
+            days, counts = np.unique(self._column(self.post_day, self._long_dtype()), return_counts=True)
+            pairs = zip(days.tolist(), counts.tolist())
+        else:
+            pairs = sorted(Counter(self.post_day).items())
+        return {self.day_to_date(day): count for day, count in pairs}
+
+    def daily_pattern_counts(self):
+        """Mentions per (pattern ID, UTC day) as {pattern_id: {date: count}}"""
+        result = defaultdict(dict)
+        if not self.match_pattern:
+            return result
+        if np is not None:
+            dtype = self._long_dtype()
+            days = self._column(self.post_day, dtype)[self._column(self.match_post, dtype)]
+            patterns = self._column(self.match_pattern, dtype)
+            first_day = int(days.min())
+            span = int(days.max()) - first_day + 1
+            grid = np.bincount(patterns * span + (days - first_day),
+                               minlength=self.pattern_count * span).reshape(self.pattern_count, span)
+            for pattern_id, offset in zip(*np.nonzero(grid)):
+                result[int(pattern_id)][self.day_to_date(first_day + int(offset))] = int(grid[pattern_id, offset])
+        else:
+            counts = Counter(zip(self.match_pattern, (self.post_day[i] for i in self.match_post)))
+            for (pattern_id, day), count in sorted(counts.items()):
+                result[pattern_id][self.day_to_date(day)] = count
+        return result
+
+    def _retain(self, index, post):
+        # Min-heap keyed so the least engaging (and, on ties, latest) post is evicted first
+        entry = (post['score'] + post['num_comments'], -index, post)
+        if len(self._top_heap) < self.keep_top:
+            heapq.heappush(self._top_heap, entry)
+        elif entry[:2] > self._top_heap[0][:2]:
+            heapq.heapreplace(self._top_heap, entry)
+
+    def top_posts(self, n=10):
+        """Top n posts by score + comments, in descending order (ties keep input order)"""
+        if self.keep_top is not None:
+            if n is not None and n > self.keep_top:
+                raise ValueError(f"Only the top {self.keep_top} posts were retained")
+            ranked = sorted(self._top_heap, key=lambda entry: entry[:2], reverse=True)
+            return [post for _, _, post in ranked[:n]]
+
+        if n is None or n >= len(self.posts):
+            order = sorted(range(len(self.posts)), key=self._engagement, reverse=True)
+            return [self.posts[i] for i in order]
+
+        if np is not None and n:
+            engagement = (self._column(self.post_score, np.int64)
+                          + self._column(self.post_comments, np.int64))
+            # Partial selection: the n-th largest value is the cut-off
+            threshold = np.partition(engagement, len(engagement) - n)[len(engagement) - n]
+            above = np.flatnonzero(engagement > threshold)
+            tied = np.flatnonzero(engagement == threshold)[:n - len(above)]
+            chosen = np.concatenate([above, tied])
+            # Descending engagement, then ascending index to match a stable sort
+            order = chosen[np.lexsort((chosen, -engagement[chosen]))]
+            return [self.posts[i] for i in order.tolist()]
+
+        return [self.posts[i] for i in heapq.nlargest(n, range(len(self.posts)), key=self._engagement)]
+
+    def _engagement(self, index):
+        return self.post_score[index] + self.post_comments[index]
+
+    @staticmethod
+    def _long_dtype():
+        return np.int64 if array('l').itemsize == 8 else np.int32
+
+    @staticmethod
+    def day_to_date(day):
+        return datetime.fromtimestamp(day * SECONDS_PER_DAY, timezone.utc).date()
+
+
+class WindowStats:
+    """Mention counts, top keywords and top posts over several trailing windows of one MatchColumns
+
+    Matches are counted once into a (pattern, day) grid over the last `span`
+    days up to `today` (UTC day numbers), which is then prefix-summed along the
+    days; any window's count, and the count of the window before it, is the
+    difference of two prefix entries, so extra windows cost next to nothing.
+    A window of N days covers today and the N - 1 days before it. Posts older
+    than `span` days are left out.
+
+    `covered_since` is the time from which the posts are known to be complete
+    (a truncated or failed fetch leaves older days short); None means the
+    whole span is. A window, or the window before it, only counts as covered
+    when it starts on or after both the span's first day and the first full
+    day after `covered_since`, and changes are only reported between covered
+    windows.
+    """
+
+    def __init__(self, stats, windows=(7, 30, 90), today=None, span=None, covered_since=None):
+        self.stats = stats
+        self.windows = sorted(set(windows))
+        self.today = int(time.time() // SECONDS_PER_DAY) if today is None else today
+        self.span = max(span or 0, self.windows[-1])
+        self.first_day = self.today - self.span + 1
+        self.first_covered_day = self.first_day
+        if covered_since is not None:
+            # A day is only covered if it starts at or after covered_since
+            self.first_covered_day = max(self.first_day, -int(-covered_since // SECONDS_PER_DAY))
+        pattern_count = stats.pattern_count
+
+        if np is not None:
+            dtype = stats._long_dtype()
+            # Posts stamped after today (clock skew) count towards today
+            offsets = np.minimum(stats._column(stats.post_day, dtype).astype(np.int64) - self.first_day,
+                                 self.span - 1)
+            self._post_offsets = offsets
+            post_grid = np.bincount(offsets[offsets >= 0], minlength=self.span)
+            match_offsets = offsets[stats._column(stats.match_post, dtype)]
+            patterns = stats._column(stats.match_pattern, dtype).astype(np.int64)[match_offsets >= 0]
+            match_offsets = match_offsets[match_offsets >= 0]
+            grid = np.bincount(patterns * self.span + match_offsets,
+                               minlength=pattern_count * self.span).reshape(pattern_count, self.span)
+            self.grid = grid.tolist()
+            prefix = np.zeros((pattern_count + 1, self.span + 1), dtype=np.int64)
+            prefix[0, 1:] = np.cumsum(post_grid)
+            prefix[1:, 1:] = np.cumsum(grid, axis=1)
+            self._prefix = prefix.tolist()
+        else:
+            self._post_offsets = [min(day - self.first_day, self.span - 1) for day in stats.post_day]
+            post_grid = [0] * self.span
+            for offset in self._post_offsets:
+                if offset >= 0:
+                    post_grid[offset] += 1
+            self.grid = [[0] * self.span for _ in range(pattern_count)]
+            for post_index, pattern_id in zip(stats.match_post, stats.match_pattern):
+                offset = self._post_offsets[post_index]
+                if offset >= 0:
+                    self.grid[pattern_id][offset] += 1
+            self._prefix = [[0] + list(accumulate(row)) for row in [post_grid] + self.grid]
+
+    def _window_counts(self, row, window, previous=False):
+        # Row 0 holds posts, row 1 + pattern ID that pattern's mentions
+        prefix = self._prefix[row]
+        end = self.span - window if previous else self.span
+        return prefix[end] - prefix[end - window]
+
+    @property
+    def covered_days(self):
+        """How many days, up to and including today, the data fully covers"""
+        return max(self.today - self.first_covered_day + 1, 0)
+
+    def covers(self, window, previous=False):
+        """Whether the data is complete for the last `window` days (or the `window` days before)"""
+        start = self.today - (2 if previous else 1) * window + 1
+        return start >= self.first_covered_day
+
+    def has_previous(self, window):
+        """Whether a change can be reported: the window and the one before it are both covered"""
+        return self.covers(window) and self.covers(window, previous=True)
+
+    def post_count(self, window, previous=False):
+        """Matched posts in the last `window` days (or in the `window` days before those)"""
+        return self._window_counts(0, window, previous)
+
+    def keyword_counts(self, window, previous=False):
+        """Mentions per keyword name in the last `window` days (or the `window` days before)"""
+        counts = defaultdict(int)
+        for i, keyword in enumerate(self.stats.matcher.keywords):
+            count = self._window_counts(1 + i, window, previous)
+            if count:
+                counts[keyword] += count
+        return counts
+
+    def competitor_counts(self, window, previous=False):
+        """Mentions per competitor display name in the last `window` days (or the `window` days before)"""
+        counts = defaultdict(int)
+        offset = 1 + self.stats.competitor_offset
+        for i, competitor in enumerate(self.stats.matcher.competitors):
+            count = self._window_counts(offset + i, window, previous)
+            if count:
+                counts[competitor.title()] += count
+        return counts
+
+    def post_series(self):
+        """Matched posts per day over the whole span, oldest first"""
+        return [self._prefix[0][i + 1] - self._prefix[0][i] for i in range(self.span)]
+
+    def competitor_series(self):
+        """Mentions per day over the whole span for each competitor display name that has any"""
+        series = {}
+        for i, competitor in enumerate(self.stats.matcher.competitors):
+            row = self.grid[self.stats.competitor_offset + i]
+            if any(row):
+                total = series.setdefault(competitor.title(), [0] * self.span)
+                for day, count in enumerate(row):
+                    total[day] += count
+        return series
+
+    def top_posts(self, window, n=10):
+        """Top n posts of the last `window` days by score + comments (ties keep input order)"""
+        stats = self.stats
+        start = self.span - window
+        if np is not None:
+            chosen = np.flatnonzero(self._post_offsets >= start)
+            engagement = (stats._column(stats.post_score, np.int64)
+                          + stats._column(stats.post_comments, np.int64))[chosen]
+            order = chosen[np.lexsort((chosen, -engagement))]
+            return [stats.posts[i] for i in order[:n].tolist()]
+        chosen = [i for i, offset in enumerate(self._post_offsets) if offset >= start]
+        return [stats.posts[i] for i in heapq.nlargest(n, chosen, key=lambda i: (stats._engagement(i), -i))]
+
+
+def rollup_rows(posts, new_discussions=None, periods=ROLLUP_PERIODS):
+    """Count matched posts and mentions per (period, bucket, subreddit) for StateStore.add_rollups
+
+    Returns (period, bucket start, subreddit, kind, name, count) rows where
+    kind is 'posts' or 'discussions' (with an empty name), 'keyword' or
+    'competitor'. `new_discussions` holds the IDs of posts that opened a
+    discussion; without it every post counts as one.
+    """
+    counts = Counter()
+    for post in posts:
+        created_utc = post.get('created_utc') or 0
+        subreddit = post['subreddit']
+        opened = new_discussions is None or post['id'] in new_discussions
+        for period, seconds in periods.items():
+            bucket = int(created_utc // seconds) * seconds
+            counts[period, bucket, subreddit, 'posts', ''] += 1
+            if opened:
+                counts[period, bucket, subreddit, 'discussions', ''] += 1
+            for keyword in post['matched_keywords']:
+                counts[period, bucket, subreddit, 'keyword', keyword] += 1
+            for competitor in post['matched_competitors']:
+                counts[period, bucket, subreddit, 'competitor', competitor] += 1
+    return [key + (count,) for key, count in counts.items()]
+
+
+class RollupView:
+    """Rollup rows of one period read back from the state store
+
+    Rows are (bucket, subreddit, kind, name, count) as StateStore.rollups
+    returns them.
+    """
+
+    def __init__(self, rows, period='hour'):
+        self.rows = rows
+        self.period = period
+
+    def __len__(self):
+        return len(self.rows)
+
+    def totals(self, kind='posts'):
+        """Counts of `kind` per bucket start (summed over subreddits and names), oldest first"""
+        totals = defaultdict(int)
+        for bucket, _, row_kind, _, count in self.rows:
+            if row_kind == kind:
+                totals[bucket] += count
+        return dict(sorted(totals.items()))
+
+    def name_counts(self, kind):
+        """Counts per keyword or competitor name over every bucket"""
+        counts = defaultdict(int)
+        for _, _, row_kind, name, count in self.rows:
+            if row_kind == kind:
+                counts[name] += count
+        return counts
+
+    @staticmethod
+    def bucket_time(bucket):
+        return datetime.fromtimestamp(bucket, timezone.utc)
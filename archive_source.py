@@ -0,0 +1,81 @@
+import gzip
+import io
+import re
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - only needed for .zst dumps
+    zstandard = None
+
+# Pushshift dumps are compressed with a long window that needs a raised limit
+ZSTD_MAX_WINDOW = 2 ** 31
+
+SUBREDDIT_FIELD = re.compile(rb'"subreddit"\s*:\s*"([^"]*)"')
+CREATED_FIELD = re.compile(rb'"created_utc"\s*:\s*"?(\d+)')
+
+
+def open_archive(path):
+    """Open a JSONL dump (plain, .gz or .zst) as a binary line iterator"""
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError("Reading .zst archives requires the 'zstandard' package")
+        raw = open(path, 'rb')
+        reader = zstandard.ZstdDecompressor(max_window_size=ZSTD_MAX_WINDOW).stream_reader(raw)
+        return io.BufferedReader(reader, buffer_size=1024 * 1024)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+
+class ArchiveSource:
+    """Stream posts from Pushshift-style submission dumps
+
+    Files are read line by line so memory stays flat whatever their size. Each
+    line is screened with byte-level regexes for subreddit and date before any
+    JSON parsing; `accepts` then applies the exact filter to matched records
+    (nested crosspost objects can make the screen let a line through).
+    """
+
+    def __init__(self, paths, subreddits=None, start_utc=None, end_utc=None):
+        self.paths = list(paths)
+        self.subreddits = {s.lower() for s in subreddits} if subreddits else None
+        self.start_utc = start_utc
+        self.end_utc = end_utc
+        self.lines_read = 0
+        self.lines_passed = 0
+        self.bytes_read = 0
+
+    def _screen(self, line):
+        if self.subreddits is not None:
+            names = SUBREDDIT_FIELD.findall(line)
+            if not any(name.decode('utf-8', 'replace').lower() in self.subreddits for name in names):
+                return False
+        if self.start_utc is not None or self.end_utc is not None:
+            stamps = [int(stamp) for stamp in CREATED_FIELD.findall(line)]
+            if not any(self._in_range(stamp) for stamp in stamps):
+                return False
+        return True
+
+    def _in_range(self, created_utc):
+        if self.start_utc is not None and created_utc < self.start_utc:
+            return False
+        if self.end_utc is not None and created_utc >= self.end_utc:
+            return False
+        return True
+
+    def lines(self):
+        """Yield raw JSON lines that pass the subreddit/date screen"""
+        for path in self.paths:
+            with open_archive(path) as f:
+                for line in f:
+                    self.lines_read += 1
+                    self.bytes_read += len(line)
+                    if self._screen(line):
+                        self.lines_passed += 1
+                        yield line
+
+    def accepts(self, post):
+        """Exact subreddit/date filter for a parsed post or PostRecord"""
+        if self.subreddits is not None and post['subreddit'].lower() not in self.subreddits:
+            return False
+        return self._in_range(float(post['created_utc'] or 0))
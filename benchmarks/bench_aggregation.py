@@ -0,0 +1,84 @@
+"""Report statistics: dict-counting loops vs the columnar MatchColumns engine
+
+Run from the repository root:
+    python benchmarks/bench_aggregation.py --posts 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from collections import defaultdict
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import aggregation  # noqa: E402
+from aggregation import MatchColumns  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from post_record import PostRecord  # noqa: E402
+
+KEYWORDS = [f"keyword{i}" for i in range(30)]
+COMPETITORS = [f"brand{i}" for i in range(12)]
+
+
+def make_posts(count, matcher):
+    rng = random.Random(5)
+    subreddits = ['fitness', 'supplements', 'nutrition', 'bodybuilding']
+    return [PostRecord(f"t3_{i:x}", 1700000000 + rng.randint(0, 90 * 86400), 'title',
+                       rng.randint(0, 5000), rng.randint(0, 800), rng.choice(subreddits),
+                       tuple(sorted(rng.sample(range(len(KEYWORDS)), 2))),
+                       (rng.randrange(len(COMPETITORS)),), '/r/x/', matcher)
+            for i in range(count)]
+
+
+def loops(posts):
+    """The previous approach: defaultdict tallies and a full sort for the top 10"""
+    keyword_counts = defaultdict(int)
+    competitor_counts = defaultdict(int)
+    for post in posts:
+        for keyword in post['matched_keywords']:
+            keyword_counts[keyword] += 1
+        for competitor in post['matched_competitors']:
+            competitor_counts[competitor.title()] += 1
+    sorted(posts, key=lambda x: x['score'] + x['num_comments'], reverse=True)[:10]
+
+
+def columnar(posts, matcher):
+    start = time.perf_counter()
+    stats = MatchColumns.from_posts(posts, matcher)
+    built = time.perf_counter() - start
+    stats.keyword_counts()
+    stats.competitor_counts()
+    stats.subreddit_counts()
+    stats.daily_counts()
+    stats.daily_pattern_counts()
+    stats.top_posts(10)
+    return built
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher(KEYWORDS, COMPETITORS)
+    posts = make_posts(args.posts, matcher)
+    print(f"Aggregating {args.posts} posts (loops: counts + top 10; columnar adds per-subreddit/day tables)")
+
+    start = time.perf_counter()
+    loops(posts)
+    print(f"{'loops':>18}: {time.perf_counter() - start:6.2f}s")
+
+    for label, numpy_module in (('columnar (numpy)', aggregation.np), ('columnar (python)', None)):
+        if label.endswith('(numpy)') and numpy_module is None:
+            continue
+        saved, aggregation.np = aggregation.np, numpy_module
+        start = time.perf_counter()
+        built = columnar(posts, matcher)
+        total = time.perf_counter() - start
+        aggregation.np = saved
+        print(f"{label:>18}: {total:6.2f}s ({built:.2f}s building columns, {total - built:.2f}s aggregating)")
+
+
+if __name__ == "__main__":
+    main()
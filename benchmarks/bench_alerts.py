@@ -0,0 +1,81 @@
+"""Spike detector update throughput and accuracy on a synthetic mention stream
+
+Every pattern gets Poisson background mentions at its own hourly rate over
+`--days`; `--spikes` random (pattern, hour) pairs get `--spike-factor` times
+their usual rate on top. Reports updates per second, how many injected
+spikes alerted, and how many alerts fired elsewhere.
+
+Run from the repository root:
+    python benchmarks/bench_alerts.py --patterns 200 --days 30
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from spike_alerts import SpikeDetector  # noqa: E402
+
+HOUR = 3600
+
+
+def mention_stream(patterns, days, spikes, spike_factor, seed=0):
+    """Return (timestamps, pattern indexes, injected (pattern, hour) set) in time order"""
+    rng = np.random.default_rng(seed)
+    hours = int(days * 24)
+    rates = rng.uniform(0.5, 40.0, patterns)
+    counts = rng.poisson(np.broadcast_to(rates, (hours, patterns)))
+    injected = set()
+    # Spikes only after the first day, once the detector has a baseline
+    for hour, pattern in zip(rng.integers(24, hours, spikes), rng.integers(0, patterns, spikes)):
+        counts[hour, pattern] += rng.poisson(rates[pattern] * (spike_factor - 1))
+        injected.add((int(pattern), int(hour)))
+
+    hour_of, pattern_of = np.nonzero(counts)
+    repeats = counts[hour_of, pattern_of]
+    start = 1_700_000_000 // HOUR * HOUR
+    timestamps = start + (np.repeat(hour_of, repeats) + rng.random(repeats.sum())) * HOUR
+    pattern_ids = np.repeat(pattern_of, repeats)
+    order = np.argsort(timestamps, kind='stable')
+    return timestamps[order].tolist(), pattern_ids[order].tolist(), injected, start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--patterns', type=int, default=200)
+    parser.add_argument('--days', type=float, default=30)
+    parser.add_argument('--spikes', type=int, default=50)
+    parser.add_argument('--spike-factor', type=float, default=4.0)
+    parser.add_argument('--z', type=float, default=4.0, help="z-score threshold, 0 to disable")
+    parser.add_argument('--ratio', type=float, default=None)
+    args = parser.parse_args()
+
+    timestamps, pattern_ids, injected, start = mention_stream(args.patterns, args.days, args.spikes,
+                                                              args.spike_factor)
+    names = [f"pattern{i}" for i in range(args.patterns)]
+    detector = SpikeDetector(z_threshold=args.z or None, ratio_threshold=args.ratio)
+    alerts = []
+
+    add = detector.add
+    started = time.perf_counter()
+    for created_utc, pattern in zip(timestamps, pattern_ids):
+        spike = add('keyword', names[pattern], created_utc)
+        if spike:
+            alerts.append(spike)
+    elapsed = time.perf_counter() - started
+
+    alerted = {(int(spike.name[len('pattern'):]), (spike.bucket_start - start) // HOUR) for spike in alerts}
+    found = len(injected & alerted)
+    print(f"{len(timestamps):,} mentions of {args.patterns} patterns over {args.days:g} days")
+    print(f"  updates: {elapsed:6.2f}s ({len(timestamps) / elapsed:,.0f} mentions/s, "
+          f"{elapsed / len(timestamps) * 1e9:.0f} ns each)")
+    print(f"  injected spikes alerted: {found}/{len(injected)} ({found / max(len(injected), 1):.0%})")
+    print(f"  other alerts: {len(alerted - injected)} "
+          f"(of {args.patterns * int(args.days * 24)} pattern-hours)")
+
+
+if __name__ == "__main__":
+    main()
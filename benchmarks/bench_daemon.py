@@ -0,0 +1,96 @@
+"""Run the polling daemon against the local stub with posts arriving live
+
+Half the subreddits are busy and half quiet. Every `--sample` seconds prints
+polls made, CPU use and resident memory, which should stay flat once the
+first (backfill) polls are done; at the end prints each subreddit's poll count,
+estimated posting rate and interval, and renders a report from the store.
+
+Run from the repository root:
+    python benchmarks/bench_daemon.py --duration 120 --busy-rate 5 --quiet-rate 0.05
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from daemon import MonitorDaemon, PollScheduler  # noqa: E402
+from reddit_fetcher import TokenBucket  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from reddit_stub import RedditStub  # noqa: E402
+
+
+def resident_mb():
+    with open('/proc/self/statm') as f:
+        return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024 / 1024
+
+
+def sample(daemon, interval, stopped, rows):
+    start = time.perf_counter()
+    last_cpu, last_polls = time.process_time(), 0
+    while not stopped.wait(interval):
+        cpu, polls = time.process_time(), daemon.polls
+        rows.append((time.perf_counter() - start, polls - last_polls, (cpu - last_cpu) / interval, resident_mb()))
+        print(f"  t={rows[-1][0]:5.0f}s  {rows[-1][1]:4d} polls  CPU {rows[-1][2]:6.1%}  RSS {rows[-1][3]:6.1f} MB")
+        last_cpu, last_polls = cpu, polls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subreddits', type=int, default=6)
+    parser.add_argument('--busy-rate', type=float, default=5.0, help="new posts per second in busy subreddits")
+    parser.add_argument('--quiet-rate', type=float, default=0.05, help="new posts per second in quiet subreddits")
+    parser.add_argument('--duration', type=float, default=60.0, help="seconds to run the daemon")
+    parser.add_argument('--sample', type=float, default=10.0, help="seconds between samples")
+    parser.add_argument('--poll-min', type=float, default=1.0)
+    parser.add_argument('--poll-max', type=float, default=20.0)
+    parser.add_argument('--posts', type=int, default=300, help="posts already in each listing at start")
+    args = parser.parse_args()
+
+    # The stub derives post IDs from a subreddit's first three letters, so lead with the number
+    subreddits = [f"{i:02d}{'busy' if i % 2 == 0 else 'quiet'}" for i in range(args.subreddits)]
+    rates = {name: args.busy_rate if name.endswith('busy') else args.quiet_rate for name in subreddits}
+    workdir = tempfile.mkdtemp(prefix='bench_daemon_')
+    os.chdir(workdir)
+
+    with RedditStub(posts_per_subreddit=args.posts, arrival_rates=rates) as stub:
+        monitor = SimpleRedditMonitor(state_path=os.path.join(workdir, 'state.db'),
+                                      metrics_path=os.path.join(workdir, 'metrics.json'))
+        monitor.subreddits = subreddits
+        monitor.fetcher.base_url = stub.base_url
+        monitor.fetcher.rate_limiter = TokenBucket(50, 10)
+        scheduler = PollScheduler(subreddits, args.poll_min, args.poll_max)
+        daemon = MonitorDaemon(monitor, scheduler, report_every=0, metrics_every=args.sample)
+
+        polls = Counter()
+        poll = daemon.poll
+        daemon.poll = lambda name: (polls.update([name]), poll(name))[1]
+
+        stopped = threading.Event()
+        rows = []
+        threading.Timer(args.duration, daemon.stop).start()
+        sampler = threading.Thread(target=sample, args=(daemon, args.sample, stopped, rows), daemon=True)
+        sampler.start()
+        daemon.run()
+        stopped.set()
+
+        print(f"\n{stub.arrived} posts arrived during the run, {stub.request_count} requests served")
+        for name in subreddits:
+            rate = scheduler.rates[name] or 0.0
+            print(f"  r/{name:<7} {polls[name]:4d} polls, estimated {rate:6.3f} posts/s "
+                  f"(actual {rates[name]:g}), interval {scheduler.intervals[name]:5.1f}s")
+        steady = rows[1:] or rows
+        if steady:
+            print(f"  steady state: CPU {min(r[2] for r in steady):.1%}-{max(r[2] for r in steady):.1%}, "
+                  f"RSS {min(r[3] for r in steady):.1f}-{max(r[3] for r in steady):.1f} MB")
+        daemon.report()
+        monitor.close()
+    print(f"Output in {workdir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Duplicate detection throughput and accuracy on a synthetic crosspost/repost corpus
+
+Streams posts in time order; a share of them are crossposts, verbatim reposts
+or lightly edited reposts (a few words changed, punctuation and case shuffled)
+of a recent post in another subreddit. Reports signature and grouping
+throughput, how many planted duplicates were found, false merges, and peak RSS.
+
+Run from the repository root:
+    python benchmarks/bench_dedup.py --posts 1000000
+"""
+import argparse
+import os
+import random
+import resource
+import sys
+import time
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from dedup import Deduplicator, content_signature  # noqa: E402
+
+SUBREDDITS = ['fitness', 'running', 'bodybuilding', 'supplements', 'nutrition', 'cycling']
+
+
+def corpus(count, duplicate_rate, seed=0, days=90):
+    """Yield (post dict, text, truth group, kind) in created_utc order"""
+    rng = random.Random(seed)
+    vocabulary = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=rng.randint(2, 9))) for _ in range(5000)]
+    recent = deque(maxlen=5000)
+    start = 1700000000
+    spacing = days * 86400 / count
+    for i in range(count):
+        post_id = f"t3_{i:x}"
+        created_utc = start + i * spacing
+        roll = rng.random()
+        if recent and roll < duplicate_rate:
+            original_id, words, group = rng.choice(recent)
+            kind = ('crosspost', 'exact', 'near')[int(roll / duplicate_rate * 3)]
+            parent = original_id if kind == 'crosspost' else None
+            if kind == 'near':
+                words = list(words)
+                for _ in range(rng.randint(1, 2)):
+                    words[rng.randrange(len(words))] = rng.choice(vocabulary)
+            text = ' '.join(words)
+            if kind != 'crosspost':
+                text = text.capitalize().replace(' ', '  ', 1) + '!'
+        else:
+            words = rng.choices(vocabulary, k=rng.randint(20, 120))
+            group, kind, parent = i, 'original', None
+            text = ' '.join(words)
+            recent.append((post_id, words, group))
+        post = {'id': post_id, 'created_utc': created_utc, 'subreddit': rng.choice(SUBREDDITS),
+                'crosspost_parent': parent}
+        yield post, text, group, kind
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=1_000_000)
+    parser.add_argument('--duplicate-rate', type=float, default=0.3)
+    parser.add_argument('--days', type=float, default=90, help="time span of the corpus")
+    parser.add_argument('--window-days', type=float, default=7)
+    parser.add_argument('--max-distance', type=int, default=None,
+                        help="SimHash bits two near-duplicates may differ in (default: Deduplicator's)")
+    args = parser.parse_args()
+
+    options = {} if args.max_distance is None else {'max_distance': args.max_distance}
+    deduplicator = Deduplicator(window_days=args.window_days, **options)
+    planted = {'crosspost': 0, 'exact': 0, 'near': 0}
+    found = dict.fromkeys(planted, 0)
+    # Discussion ID each truth group first received, kept for recent groups only
+    group_discussion = {}
+    false_merges = 0
+    signature_seconds = assign_seconds = 0.0
+    peak_entries = 0
+
+    started = time.perf_counter()
+    for post, text, group, kind in corpus(args.posts, args.duplicate_rate, days=args.days):
+        t0 = time.perf_counter()
+        post['content_hash'], post['simhash'] = content_signature(text.lower())
+        t1 = time.perf_counter()
+        discussion = deduplicator.assign(post)
+        assign_seconds += time.perf_counter() - t1
+        signature_seconds += t1 - t0
+        peak_entries = max(peak_entries, len(deduplicator._window))
+
+        if kind == 'original':
+            group_discussion[group] = discussion
+            if discussion != deduplicator.discussions - 1:
+                false_merges += 1
+            if len(group_discussion) > 20000:
+                group_discussion.pop(next(iter(group_discussion)))
+        else:
+            planted[kind] += 1
+            if group_discussion.get(group) == discussion:
+                found[kind] += 1
+    total = time.perf_counter() - started
+
+    print(f"{args.posts} posts, {sum(planted.values())} planted duplicates, "
+          f"{args.window_days:g}-day window (peak {peak_entries} posts remembered)")
+    print(f"  signatures: {signature_seconds:6.2f}s ({args.posts / signature_seconds:,.0f} posts/s)")
+    print(f"  grouping:   {assign_seconds:6.2f}s ({args.posts / assign_seconds:,.0f} posts/s)")
+    print(f"  end to end: {total:6.2f}s including corpus generation")
+    for kind in planted:
+        print(f"  {kind:>9}: {found[kind]}/{planted[kind]} found ({found[kind] / max(planted[kind], 1):.1%})")
+    print(f"  originals wrongly merged: {false_merges}")
+    print(f"  unique discussions: {deduplicator.discussions}")
+    print(f"  peak RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+"""End-to-end weekly report runs over a parameter grid, saved as JSON to compare commits
+
+Every grid point serves synthetic listings from the local Reddit stub (or
+recorded ones with --listings, see reddit_stub.load_listings), with optional
+per-request latency and 429 rate limiting, and delivers the report to the local
+SMTP sink. Each run happens in a fresh child process, so peak RSS and warm
+caches belong to that point alone. The child times search_reddit_posts,
+deduplication, generate_simple_report, save_report_locally and
+send_email_report, and keeps the run's stage timings and counters.
+
+--output writes the results with the commit they were measured on; --compare
+prints the change per grid point between two such files.
+
+Run from the repository root:
+    python benchmarks/bench_e2e.py --subreddits 2,8 --posts 200,1000 --keywords 0,500 \\
+        --selftext-words 60,600 --output e2e.json
+    python benchmarks/bench_e2e.py --compare e2e-before.json e2e.json
+"""
+import argparse
+import itertools
+import json
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.join(BENCH_DIR, '..')
+sys.path.insert(0, REPO_DIR)
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from match_stage import MatchStage  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from reddit_stub import RedditStub, load_listings  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+DAY = 86400
+# Timed monitor methods, in the order the weekly report calls them
+STEPS = ['search_reddit_posts', 'deduplicate', 'generate_simple_report', 'save_report_locally', 'send_email_report']
+GRID = ['subreddits', 'posts', 'keywords', 'selftext_words', 'latency', 'rate_limit']
+# Besides these, every --compare row shows total time and peak RSS
+COMPARED = ['search_reddit_posts', 'generate_simple_report', 'send_email_report']
+
+
+def int_list(value):
+    return [int(v) for v in value.split(',')]
+
+
+def float_list(value):
+    return [float(v) for v in value.split(',')]
+
+
+def extra_keywords(count, seed=0):
+    """Made-up product terms, nearly all absent from posts, like most of a real watchlist"""
+    rng = random.Random(seed)
+    syllables = ['ka', 'zo', 'vel', 'tri', 'mag', 'nox', 'pra', 'lum', 'sor', 'qui', 'dex', 'ryn']
+    return [''.join(rng.choice(syllables) for _ in range(rng.randint(2, 4))) + f" {i}" for i in range(count)]
+
+
+def run_point(params, result_path):
+    """Child process: one weekly report against the stub and sink named in the environment"""
+    os.chdir(tempfile.mkdtemp(prefix='bench_e2e_'))
+    monitor = SimpleRedditMonitor(async_fetch=params['async_fetch'], match_processes=params['processes'])
+    monitor.subreddits = params['subreddit_names']
+    if params['keywords']:
+        monitor.keywords = monitor.keywords + extra_keywords(params['keywords'])
+        monitor.matcher = KeywordMatcher(monitor.keywords, monitor.competitor_brands, brand_variants=True)
+        monitor.match_stage.close()
+        monitor.match_stage = MatchStage(monitor.matcher, processes=params['processes'], sentiment=monitor.sentiment,
+                                          signatures=monitor.dedup)
+
+    timings = {}
+
+    def timed(name):
+        method = getattr(monitor, name)
+
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timings[name] = timings.get(name, 0.0) + time.perf_counter() - started
+        setattr(monitor, name, wrapper)
+
+    for name in STEPS:
+        timed(name)
+
+    started = time.perf_counter()
+    posts = monitor.search_reddit_posts(days_back=7)
+    if monitor.dedup:
+        posts = monitor.deduplicate(posts)
+    html_report = monitor.generate_simple_report(posts)
+    monitor.save_report_locally(html_report)
+    sent = monitor.send_email_report(html_report)
+    total = time.perf_counter() - started
+    monitor.metrics.finish()
+    monitor.close()
+
+    counters = monitor.metrics.counters
+    fetched = counters.get('posts_fetched', 0)
+    result = {
+        'total_seconds': round(total, 4),
+        'steps': {name: round(timings.get(name, 0.0), 4) for name in STEPS},
+        'stages': {name: round(seconds, 4) for name, seconds in monitor.metrics.stages.items()},
+        'counters': {name: round(value, 4) if isinstance(value, float) else value for name, value in counters.items()},
+        'posts_fetched': fetched,
+        'posts_matched': len(posts),
+        'posts_per_second': round(fetched / total, 1) if total else None,
+        'report_bytes': len(html_report.encode('utf-8')),
+        'email_sent': sent,
+        # Kilobytes on Linux, bytes on macOS
+        'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                             / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+    }
+    with open(result_path, 'w', encoding='utf-8') as f:
+        json.dump(result, f)
+
+
+def measure(params, listings, args):
+    """Serve one grid point and run it `--repeat` times, each in a fresh child process"""
+    names = sorted(listings)[:params['subreddits']] if listings else [
+        # The stub derives post IDs from a subreddit's first three letters, so lead with the number
+        f"{i:02d}fitness" for i in range(params['subreddits'])]
+    # Spread each synthetic listing over six days so the whole of it is inside the weekly window
+    spacing = 6 * DAY / max(params['posts'], 1)
+    longest = max(len(listings[name]) for name in names) if listings else params['posts']
+    runs = []
+    for _ in range(args.repeat):
+        stub = RedditStub({name: listings[name] for name in names} if listings else None,
+                          latency=params['latency'], posts_per_subreddit=params['posts'],
+                          selftext_words=params['selftext_words'], spacing=spacing,
+                          rate_limit=params['rate_limit'] or None, rate_window=args.rate_window)
+        with stub, SMTPSink(latency=args.smtp_latency) as sink:
+            env = dict(os.environ, REDDIT_BASE_URL=stub.base_url,
+                       REDDIT_CLIENT_ID='bench', REDDIT_CLIENT_SECRET='bench',
+                       REDDIT_RATE_LIMIT=str(args.client_rate), REDDIT_RATE_BURST='10',
+                       REDDIT_MAX_PAGES=str(longest // 100 + 2), REDDIT_RETRY_BACKOFF='0.1',
+                       SMTP_SERVER=sink.host, SMTP_PORT=str(sink.port), SMTP_STARTTLS='0',
+                       EMAIL_FROM='bench@example.com', EMAIL_PASSWORD='bench',
+                       EMAIL_TO=','.join(f"team{i}@example.com" for i in range(args.recipients)))
+            result_path = os.path.join(tempfile.mkdtemp(prefix='bench_e2e_result_'), 'result.json')
+            point = dict(params, subreddit_names=names, async_fetch=args.async_fetch, processes=args.processes)
+            completed = subprocess.run([sys.executable, os.path.abspath(__file__), '--run-point', json.dumps(point),
+                                        '--result', result_path], env=env, capture_output=not args.verbose, text=True)
+            if completed.returncode or not os.path.exists(result_path):
+                print(completed.stdout or '', completed.stderr or '', sep='\n')
+                raise SystemExit(f"Grid point {params} failed")
+            with open(result_path, encoding='utf-8') as f:
+                run = json.load(f)
+            run['requests'] = stub.request_count
+            run['throttled'] = stub.throttled
+            run['emails_received'] = len(sink.recipients)
+            runs.append(run)
+    return runs
+
+
+def summarize(runs):
+    """The median of each timing over repeats; counts come from the first run"""
+    summary = dict(runs[0])
+    summary['total_seconds'] = statistics.median(run['total_seconds'] for run in runs)
+    summary['steps'] = {name: statistics.median(run['steps'][name] for run in runs) for name in runs[0]['steps']}
+    summary['stages'] = {name: statistics.median(run['stages'].get(name, 0.0) for run in runs)
+                         for name in runs[0]['stages']}
+    summary['peak_rss_mb'] = max(run['peak_rss_mb'] for run in runs)
+    fetched = summary['posts_fetched']
+    summary['posts_per_second'] = round(fetched / summary['total_seconds'], 1) if summary['total_seconds'] else None
+    summary['repeats'] = len(runs)
+    return summary
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_DIR, capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=REPO_DIR,
+                               capture_output=True, text=True).stdout.strip()
+        return commit + ('-dirty' if dirty else '')
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def point_key(params):
+    return tuple(params[name] for name in GRID)
+
+
+def describe(params, recorded=False):
+    posts = 'recorded' if recorded else f"{params['posts']:>5} posts"
+    return (f"{params['subreddits']:>3} subs x {posts}, {params['keywords']:>4} extra kw, "
+            f"{params['selftext_words']:>4} words, {params['latency'] * 1000:>4.0f} ms, "
+            f"limit {params['rate_limit'] or '-'}")
+
+
+def compare(before_path, after_path, threshold):
+    """Print each grid point's change between two result files; True if nothing got slower than `threshold`"""
+    with open(before_path, encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, encoding='utf-8') as f:
+        after = json.load(f)
+    previous = {point_key(point['params']): point for point in before['points']}
+    print(f"{before.get('commit') or before_path} -> {after.get('commit') or after_path}")
+
+    regressions = 0
+    for point in after['points']:
+        old = previous.get(point_key(point['params']))
+        if old is None:
+            print(f"  {describe(point['params'])}  (new grid point)")
+            continue
+        cells = []
+        pairs = [('total', old['total_seconds'], point['total_seconds'])]
+        pairs += [(name.split('_')[0], old['steps'].get(name, 0.0), point['steps'].get(name, 0.0))
+                  for name in COMPARED]
+        for label, was, now in pairs:
+            change = (now - was) / was if was else 0.0
+            cells.append(f"{label} {now:.2f}s ({change:+.0%})")
+        change = (point['total_seconds'] - old['total_seconds']) / old['total_seconds'] if old['total_seconds'] else 0
+        flag = ''
+        if change > threshold:
+            regressions += 1
+            flag = '  ⚠️  slower'
+        cells.append(f"RSS {point['peak_rss_mb']:.0f} MB ({point['peak_rss_mb'] - old['peak_rss_mb']:+.0f})")
+        print(f"  {describe(point['params'])}  " + " | ".join(cells) + flag)
+    print(f"{regressions} grid points slower by more than {threshold:.0%}")
+    return regressions == 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subreddits', type=int_list, default=[4], help="comma-separated grid values")
+    parser.add_argument('--posts', type=int_list, default=[500], help="posts per subreddit")
+    parser.add_argument('--keywords', type=int_list, default=[0], help="extra watchlist keywords")
+    parser.add_argument('--selftext-words', type=int_list, default=[60])
+    parser.add_argument('--latency', type=float_list, default=[0.0], help="seconds the stub adds per request")
+    parser.add_argument('--rate-limit', type=int_list, default=[0],
+                        help="requests the stub allows per --rate-window before answering 429 (0: unlimited)")
+    parser.add_argument('--rate-window', type=float, default=2.0)
+    parser.add_argument('--listings', default=None, help="serve recorded listings from this directory")
+    parser.add_argument('--client-rate', type=float, default=1000.0,
+                        help="the monitor's own request rate limit (REDDIT_RATE_LIMIT)")
+    parser.add_argument('--async-fetch', action='store_true')
+    parser.add_argument('--processes', type=int, default=0, help="match worker processes")
+    parser.add_argument('--recipients', type=int, default=3)
+    parser.add_argument('--smtp-latency', type=float, default=0.0)
+    parser.add_argument('--repeat', type=int, default=1, help="runs per grid point; timings are medians")
+    parser.add_argument('--output', default=None, help="write the results to this JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), default=None,
+                        help="compare two result files instead of running")
+    parser.add_argument('--threshold', type=float, default=0.1,
+                        help="with --compare, the slowdown that counts as a regression")
+    parser.add_argument('--verbose', action='store_true', help="show the monitor's own output")
+    parser.add_argument('--run-point', default=None, help=argparse.SUPPRESS)
+    parser.add_argument('--result', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.run_point:
+        run_point(json.loads(args.run_point), args.result)
+        return
+    if args.compare:
+        sys.exit(0 if compare(*args.compare, args.threshold) else 1)
+
+    listings = load_listings(args.listings) if args.listings else None
+    if args.listings and not listings:
+        parser.error(f"no recorded listings in {args.listings}")
+    grid = [dict(zip(GRID, values)) for values in itertools.product(
+        args.subreddits, args.posts, args.keywords, args.selftext_words, args.latency, args.rate_limit)]
+    commit = git_commit()
+    print(f"{len(grid)} grid points, {args.repeat} run(s) each, at {commit or 'unknown commit'}")
+
+    points = []
+    for params in grid:
+        summary = summarize(measure(params, listings, args))
+        points.append({'params': params, **summary})
+        steps = summary['steps']
+        print(f"  {describe(params, bool(listings))}: {summary['total_seconds']:6.2f}s "
+              f"({summary['posts_per_second'] or 0:,.0f} posts/s, peak RSS {summary['peak_rss_mb']:.0f} MB) "
+              f"search {steps['search_reddit_posts']:.2f}s, report {steps['generate_simple_report']:.2f}s, "
+              f"save {steps['save_report_locally']:.2f}s, email {steps['send_email_report']:.2f}s; "
+              f"{summary['requests']} requests, {summary['throttled']} throttled")
+
+    if args.output:
+        results = {
+            'commit': commit,
+            'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'settings': {name: getattr(args, name) for name in ('listings', 'rate_window', 'client_rate', 'async_fetch',
+                                                               'processes', 'recipients', 'smtp_latency', 'repeat')},
+            'points': points,
+        }
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
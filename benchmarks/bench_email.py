@@ -0,0 +1,84 @@
+"""Report delivery: a fresh SMTP session per email vs the pooled ReportMailer
+
+Sends --reports team reports to --recipients addresses each through a local SMTP
+sink that adds --latency to every reply, like a remote server would.
+
+Run from the repository root:
+    python benchmarks/bench_email.py --reports 3 --recipients 40 --latency 0.02
+"""
+import argparse
+import os
+import smtplib
+import sys
+import time
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from email_delivery import ReportMailer  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+SENDER = 'reports@example.com'
+
+
+def per_email(sink, reports):
+    """The previous approach: connect, log in and build the MIME body for every email"""
+    for html, subject, recipients in reports:
+        for recipient in recipients:
+            msg = MIMEMultipart('alternative')
+            msg['Subject'] = subject
+            msg['From'] = SENDER
+            msg['To'] = recipient
+            msg.attach(MIMEText(html, 'html'))
+            with smtplib.SMTP(sink.host, sink.port) as server:
+                server.login(SENDER, 'secret')
+                server.send_message(msg)
+
+
+def pooled(sink, reports, connections, batch_size):
+    mailer = ReportMailer(sink.host, sink.port, SENDER, 'secret', starttls=False,
+                          connections=connections, batch_size=batch_size, backoff=0.05)
+    result = mailer.send_many(reports)
+    mailer.close()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--reports', type=int, default=3)
+    parser.add_argument('--recipients', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.02)
+    parser.add_argument('--report-kb', type=int, default=200)
+    args = parser.parse_args()
+
+    html = '<html><body>' + '<p>Report line</p>' * (args.report_kb * 1024 // 16) + '</body></html>'
+    reports = [(html, f"Team {t} report", [f"user{i}@team{t}.example.com" for i in range(args.recipients)])
+               for t in range(args.reports)]
+    total = args.reports * args.recipients
+    print(f"{args.reports} reports x {args.recipients} recipients ({len(html) / 1024:.0f} KB each), "
+          f"{args.latency * 1000:.0f} ms per SMTP reply")
+
+    runs = [('per email', lambda sink: per_email(sink, reports))]
+    for connections, batch_size in ((1, 1), (4, 1), (1, 50), (4, 10)):
+        runs.append((f"pooled {connections} conn, {batch_size}/txn",
+                     lambda sink, c=connections, b=batch_size: pooled(sink, reports, c, b)))
+
+    for label, send in runs:
+        with SMTPSink(latency=args.latency) as sink:
+            start = time.perf_counter()
+            send(sink)
+            elapsed = time.perf_counter() - start
+        delivered = len(sink.recipients)
+        print(f"{label:>24}: {elapsed:6.2f}s, {delivered}/{total} delivered, "
+              f"{sink.connections} connections, {sink.transactions} transactions")
+
+    # Retry behaviour: 10% transient 451s and one permanently unknown address
+    with SMTPSink(latency=args.latency, flaky_rate=0.1, reject={reports[0][2][0]}) as sink:
+        result = pooled(sink, reports, 4, 10)
+    print(f"{'flaky server':>24}: {len(result.delivered)} delivered, {len(result.failed)} failed "
+          f"({', '.join(result.failed)}), {result.retries} recipient retries")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""Compare sequential and concurrent subreddit fetching against the local stub
+
+Run from the repository root:
+    python benchmarks/bench_fetch.py --subreddits 10 --latency 0.3
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reddit_fetcher import TokenBucket  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from reddit_stub import RedditStub  # noqa: E402
+
+
+def timed_search(monitor):
+    start = time.perf_counter()
+    posts = monitor.search_reddit_posts(days_back=7)
+    elapsed = time.perf_counter() - start
+    pages = sum(stats['pages'] for stats in monitor.fetch_stats.values())
+    size = sum(stats['bytes'] for stats in monitor.fetch_stats.values())
+    return elapsed, len(posts), pages, size
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subreddits', type=int, default=10)
+    parser.add_argument('--latency', type=float, default=0.3)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=20.0, help="token bucket refill (requests/s)")
+    parser.add_argument('--burst', type=int, default=10)
+    parser.add_argument('--posts', type=int, default=1500,
+                        help="posts per subreddit, one every 10 minutes (1008 fit in 7 days)")
+    args = parser.parse_args()
+
+    subreddits = [f"sub{i}" for i in range(args.subreddits)]
+    results = {}
+
+    with RedditStub(latency=args.latency, posts_per_subreddit=args.posts) as stub:
+        for label, async_fetch in (('sequential', False), ('async', True)):
+            monitor = SimpleRedditMonitor(async_fetch=async_fetch, concurrency=args.concurrency)
+            monitor.subreddits = subreddits
+            monitor.fetcher.base_url = stub.base_url
+            monitor.fetcher.rate_limiter = TokenBucket(args.rate, args.burst)
+            results[label] = timed_search(monitor)
+            monitor.fetcher.close()
+
+    print()
+    for label, (elapsed, found, pages, size) in results.items():
+        print(f"{label:>10}: {elapsed:6.2f}s for {args.subreddits} subreddits "
+              f"({found} matching posts, {pages} pages, {size / 1024:.0f} KB)")
+
+
+if __name__ == "__main__":
+    main()
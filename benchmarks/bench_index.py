@@ -0,0 +1,101 @@
+"""Full-text index build rate, size and query latency on synthetic posts
+
+Indexes `--posts` stub posts spread over `--days` across `--subreddits`, in
+batches the size of a listing page, with a rare term planted in a small
+fraction of them. Then times queries for rare, common, phrase and prefix
+terms over the whole range, the last week and the last day, and a report-style
+scan that re-matches the last week's posts.
+
+Run from the repository root:
+    python benchmarks/bench_index.py --posts 500000 --days 90
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from match_stage import MatchStage  # noqa: E402
+from post_index import PostIndex  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from reddit_stub import make_post  # noqa: E402
+
+DAY = 86400
+QUERIES = ['cordyceps', 'creatine', 'beta alanine', 'electro*']
+
+
+def timed_query(index, term, since_utc, repeats):
+    times = []
+    for _ in range(repeats):
+        result = index.query(term, since_utc)
+        times.append(result.elapsed)
+    return result.count, statistics.median(times)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=200_000)
+    parser.add_argument('--days', type=float, default=90)
+    parser.add_argument('--subreddits', type=int, default=20)
+    parser.add_argument('--rare', type=float, default=0.001, help="fraction of posts mentioning 'cordyceps'")
+    parser.add_argument('--batch', type=int, default=100, help="posts per add() call, like a listing page")
+    parser.add_argument('--repeats', type=int, default=5)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    subreddits = [f"{i:02d}sub" for i in range(args.subreddits)]
+    now = time.time()
+    start = now - args.days * DAY
+    posts = []
+    for i in range(args.posts):
+        post = make_post(rng, subreddits[i % len(subreddits)], i, start + rng.random() * args.days * DAY)['data']
+        if rng.random() < args.rare:
+            post['selftext'] += ' tried cordyceps today'
+        posts.append(post)
+    posts.sort(key=lambda post: post['created_utc'])
+
+    path = os.path.join(tempfile.mkdtemp(prefix='bench_index_'), 'index.db')
+    index = PostIndex(path)
+    started = time.perf_counter()
+    for i in range(0, len(posts), args.batch):
+        index.add(posts[i:i + args.batch])
+    elapsed = time.perf_counter() - started
+    size = os.path.getsize(path)
+    print(f"Indexed {len(posts):,} posts over {args.days:g} days in {elapsed:.1f}s "
+          f"({len(posts) / elapsed:,.0f} posts/s)")
+    print(f"  {size / 1024 / 1024:.1f} MB on disk ({size / len(posts):.0f} bytes/post)")
+
+    started = time.perf_counter()
+    index.add(posts[-args.batch:])
+    print(f"  re-adding a page of known posts: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    print(f"\nQuery latency (median of {args.repeats}):")
+    for term in QUERIES:
+        cells = []
+        for label, since_utc in (('all', None), ('7d', now - 7 * DAY), ('1d', now - DAY)):
+            count, seconds = timed_query(index, term, since_utc, args.repeats)
+            cells.append(f"{label} {count:>7,} in {seconds * 1000:7.1f} ms")
+        print(f"  {term!r:<15} " + " | ".join(cells))
+
+    monitor = SimpleRedditMonitor()
+    matcher = KeywordMatcher(monitor.keywords, monitor.competitor_brands)
+    stage = MatchStage(matcher)
+    started = time.perf_counter()
+    scanned = list(index.posts(since_utc=now - 7 * DAY))
+    read = time.perf_counter() - started
+    matched = sum(1 for _ in stage.match(scanned))
+    total = time.perf_counter() - started
+    print(f"\nReport from index (last 7 days): read {len(scanned):,} posts in {read * 1000:.0f} ms, "
+          f"matched {matched:,} in {total:.2f}s total")
+    monitor.close()
+    index.close()
+    print(f"Index in {path}")
+
+
+if __name__ == "__main__":
+    main()
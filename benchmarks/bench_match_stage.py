@@ -0,0 +1,80 @@
+"""Throughput of the matching stage in-process vs across a process pool
+
+Generates (or reuses) a JSONL fixture of raw posts and matches it with 0, 1, 2,
+4, ... worker processes up to the CPU count.
+
+Run from the repository root:
+    python benchmarks/bench_match_stage.py --posts 1000000 --fixture /tmp/posts_1m.jsonl
+"""
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from match_stage import MatchStage  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from reddit_stub import SAMPLE_WORDS  # noqa: E402
+
+FILLER = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit',
+          'sed', 'do', 'eiusmod', 'tempor', 'incididunt', 'labore', 'magna', 'aliqua']
+
+
+def write_fixture(path, count, selftext_words):
+    rng = random.Random(11)
+    vocabulary = FILLER * 6 + SAMPLE_WORDS
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            f.write(json.dumps({
+                'id': f"{i:x}",
+                'name': f"t3_{i:x}",
+                'subreddit': 'fitness',
+                'created_utc': 1700000000 + i,
+                'title': ' '.join(rng.choice(vocabulary) for _ in range(10)),
+                'selftext': ' '.join(rng.choice(vocabulary) for _ in range(selftext_words)),
+                'score': rng.randint(0, 1000),
+                'num_comments': rng.randint(0, 100),
+                'permalink': f"/r/fitness/comments/{i:x}/post/",
+            }) + '\n')
+
+
+def read_lines(path):
+    with open(path, 'rb') as f:
+        yield from f
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    parser.add_argument('--selftext-words', type=int, default=120)
+    parser.add_argument('--fixture', default=None, help="JSONL path (created if missing)")
+    parser.add_argument('--batch-size', type=int, default=2000)
+    args = parser.parse_args()
+
+    fixture = args.fixture or os.path.join('/tmp', f"reddit_posts_{args.posts}.jsonl")
+    if not os.path.exists(fixture):
+        print(f"Writing {args.posts} posts to {fixture}...")
+        write_fixture(fixture, args.posts, args.selftext_words)
+
+    # Match against the monitor's own keyword and competitor lists
+    matcher = SimpleRedditMonitor().matcher
+
+    cpus = os.cpu_count() or 1
+    worker_counts = [0] + [n for n in (1, 2, 4, 8, 16, 32) if n <= cpus]
+    baseline = None
+    for processes in worker_counts:
+        with MatchStage(matcher, processes=processes, batch_size=args.batch_size) as stage:
+            start = time.perf_counter()
+            matched = sum(1 for _ in stage.match(read_lines(fixture)))
+            elapsed = time.perf_counter() - start
+        rate = args.posts / elapsed
+        baseline = baseline or rate
+        label = 'in-process' if processes == 0 else f"{processes} workers"
+        print(f"{label:>12}: {elapsed:6.1f}s, {rate:9.0f} posts/s ({rate / baseline:.1f}x), {matched} matched")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""Micro-benchmark: compiled KeywordMatcher vs the per-keyword substring loop
+
+The trie regex only pays off on large pattern sets: below LOOP_MAX_PATTERNS
+the matcher runs the substring loop itself, so the "path" column shows which
+scan each row measured.
+
+Run from the repository root:
+    python benchmarks/bench_matcher.py
+"""
+import os
+import random
+import string
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from keyword_matcher import LOOP_MAX_PATTERNS, KeywordMatcher  # noqa: E402
+
+PATTERN_COUNTS = [30, 300, 1000, 10000]
+POSTS = 500
+WORDS_PER_POST = 300
+
+
+def random_word(rng, low=3, high=10):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(low, high)))
+
+
+def make_patterns(rng, count):
+    patterns = set()
+    while len(patterns) < count:
+        words = [random_word(rng) for _ in range(rng.randint(1, 2))]
+        patterns.add(' '.join(words))
+    patterns = sorted(patterns)
+    split = len(patterns) // 2
+    return patterns[:split], patterns[split:]
+
+
+def make_posts(rng, patterns):
+    posts = []
+    for _ in range(POSTS):
+        words = [random_word(rng) for _ in range(WORDS_PER_POST)]
+        for _ in range(3):
+            words.insert(rng.randrange(len(words)), rng.choice(patterns))
+        posts.append(' '.join(words).lower())
+    return posts
+
+
+def baseline(keywords, competitors, posts):
+    for text in posts:
+        [kw for kw in keywords if kw.lower() in text]
+        [comp for comp in competitors if comp.lower() in text]
+
+
+def compiled(matcher, posts):
+    for text in posts:
+        matcher.match(text)
+
+
+def main():
+    rng = random.Random(42)
+    print(f"{'patterns':>10} {'loop (s)':>10} {'compile (s)':>12} {'matcher (s)':>12} {'path':>6} {'speedup':>8}")
+
+    for count in PATTERN_COUNTS:
+        keywords, competitors = make_patterns(rng, count)
+        posts = make_posts(rng, keywords + competitors)
+
+        start = time.perf_counter()
+        baseline(keywords, competitors, posts)
+        loop_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        matcher = KeywordMatcher(keywords, competitors)
+        compile_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        compiled(matcher, posts)
+        match_time = time.perf_counter() - start
+
+        # Sanity check: both approaches must agree
+        for text in posts[:20]:
+            expected = ([kw for kw in keywords if kw.lower() in text],
+                        [comp for comp in competitors if comp.lower() in text])
+            assert matcher.match(text) == expected
+
+        path = 'loop' if matcher._loop_patterns is not None else 'regex'
+        print(f"{count:>10} {loop_time:>10.3f} {compile_time:>12.3f} {match_time:>12.3f} {path:>6} "
+              f"{loop_time / match_time:>7.1f}x")
+    print(f"\nUp to {LOOP_MAX_PATTERNS} patterns a substring test per pattern beats the trie regex, so the "
+          f"matcher\nruns the loop itself there; the regex wins from a few hundred patterns up.")
+
+
+if __name__ == "__main__":
+    main()
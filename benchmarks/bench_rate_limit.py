@@ -0,0 +1,75 @@
+"""Fixed pacing vs header-driven pacing with retries, against a rate-limited, flaky stub
+
+The stub allows --budget requests per --window seconds, answers 429 once a
+window is spent and injects bursts of 5xx errors. "fixed" is the previous
+behaviour: a constant request rate and no retries.
+
+Run from the repository root:
+    python benchmarks/bench_rate_limit.py --subreddits 16 --budget 20 --window 2
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from reddit_fetcher import RedditFetcher  # noqa: E402
+from reddit_stub import RedditStub  # noqa: E402
+
+
+class FixedPaceFetcher(RedditFetcher):
+    """Ignores the rate-limit headers, like the fetcher before adaptive pacing"""
+
+    def _observe_limits(self, response):
+        pass
+
+
+def run(label, fetcher_class, rate, max_retries, args, subreddits):
+    with RedditStub(posts_per_subreddit=args.posts, rate_limit=args.budget, rate_window=args.window,
+                    fault_rate=args.fault_rate, seed=1) as stub:
+        fetcher = fetcher_class(base_url=stub.base_url, rate=rate, burst=args.budget,
+                                concurrency=args.concurrency, max_retries=max_retries, backoff=0.2)
+        start = time.perf_counter()
+        results = asyncio.run(fetcher.fetch_all_async(subreddits, 0))
+        elapsed = time.perf_counter() - start
+        fetcher.close()
+
+    posts = sum(len(result.posts) for result in results)
+    failed = sum(1 for result in results if not result.ok)
+    retries = sum(result.retries for result in results)
+    return (f"{label:>19}: {elapsed:6.2f}s, {posts}/{args.posts * len(subreddits)} posts, "
+            f"{failed} subreddits failed, {stub.throttled} throttled (429), {stub.faults} 5xx, "
+            f"{retries} retries")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--subreddits', type=int, default=16)
+    parser.add_argument('--posts', type=int, default=350, help="posts per subreddit (100 per page)")
+    parser.add_argument('--budget', type=int, default=20, help="requests allowed per window")
+    parser.add_argument('--window', type=float, default=2.0, help="rate-limit window in seconds")
+    parser.add_argument('--fault-rate', type=float, default=0.05)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=40.0,
+                        help="configured requests/s, deliberately above the stub's budget")
+    args = parser.parse_args()
+
+    # Silence the per-request debug line
+    sys.stdout = open(os.devnull, 'w')
+    subreddits = [f"sub{i}" for i in range(args.subreddits)]
+    lines = [
+        run('fixed', FixedPaceFetcher, args.rate, 0, args, subreddits),
+        run('fixed (budget pace)', FixedPaceFetcher, args.budget / args.window, 0, args, subreddits),
+        run('adaptive', RedditFetcher, args.rate, 4, args, subreddits),
+    ]
+    sys.stdout = sys.__stdout__
+    print(f"{len(subreddits)} subreddits, {args.budget} requests per {args.window}s window, "
+          f"fault rate {args.fault_rate}")
+    for line in lines:
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
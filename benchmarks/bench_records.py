@@ -0,0 +1,81 @@
+"""Memory of matched posts as per-post dicts vs slotted PostRecords
+
+Run from the repository root:
+    python benchmarks/bench_records.py --posts 1000000
+"""
+import argparse
+import os
+import random
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from post_record import PostRecord  # noqa: E402
+
+KEYWORDS = ['creatine', 'caffeine', 'hydration', 'electrolytes', 'pre workout', 'bcaa']
+COMPETITORS = ['myprotein', 'esn', 'puresport', 'xendurance']
+SUBREDDITS = ['fitness', 'supplements', 'nutrition', 'bodybuilding']
+
+
+def listing_posts(count):
+    """Yield post `data` dicts shaped like a Reddit listing, with fresh strings like JSON parsing gives"""
+    rng = random.Random(7)
+    for i in range(count):
+        yield {
+            'name': f"t3_{i:07x}",
+            'created_utc': 1700000000.0 + i,
+            'title': f"Post {i} about {rng.choice(KEYWORDS)}",
+            'score': rng.randint(0, 1000),
+            'num_comments': rng.randint(0, 300),
+            'subreddit': ''.join(rng.choice(SUBREDDITS)),
+            'permalink': f"/r/fitness/comments/{i:07x}/post_{i}/",
+        }
+
+
+def as_dicts(posts, matcher):
+    rows = []
+    for post in posts:
+        keyword_ids, competitor_ids = (0, 3), (1,)
+        rows.append({
+            'id': post['name'],
+            'created_utc': post['created_utc'],
+            'title': post['title'],
+            'score': post['score'],
+            'num_comments': post['num_comments'],
+            'subreddit': post['subreddit'],
+            'matched_keywords': matcher.keyword_names(keyword_ids),
+            'matched_competitors': matcher.competitor_names(competitor_ids),
+            'permalink': f"https://reddit.com{post['permalink']}",
+        })
+    return rows
+
+
+def as_records(posts, matcher):
+    return [PostRecord.from_listing(post, post['subreddit'], (0, 3), (1,), matcher)
+            for post in posts]
+
+
+def measure(label, build, count, matcher):
+    tracemalloc.start()
+    rows = build(listing_posts(count), matcher)
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>10}: {current / 1024 / 1024:8.1f} MB retained, {current / len(rows):6.0f} bytes/post")
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=1000000)
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher(KEYWORDS, COMPETITORS)
+    print(f"Holding {args.posts} matched posts")
+    measure('dicts', as_dicts, args.posts, matcher)
+    measure('records', as_records, args.posts, matcher)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""Render 100k posts with string concatenation vs the streaming ReportRenderer
+
+Run from the repository root:
+    python benchmarks/bench_render.py --posts 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregation import MatchColumns  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from report_renderer import ReportRenderer  # noqa: E402
+
+KEYWORDS = ['creatine', 'caffeine', 'hydration', 'electrolytes', 'pre workout']
+COMPETITORS = ['myprotein', 'esn', 'puresport']
+
+
+def make_posts(count):
+    rng = random.Random(1)
+    return [{
+        'title': f"Post {i} about <stacks> & {rng.choice(KEYWORDS)}",
+        'score': rng.randint(0, 1000),
+        'num_comments': rng.randint(0, 300),
+        'subreddit': rng.choice(['fitness', 'supplements', 'nutrition']),
+        'matched_keywords': rng.sample(KEYWORDS, 2),
+        'matched_competitors': rng.sample(COMPETITORS, rng.randint(0, 1)),
+        'permalink': f"https://reddit.com/r/fitness/comments/{i:07d}/post/",
+    } for i in range(count)]
+
+
+def concatenated(posts):
+    """The previous approach: one string grown with += for every post (no escaping)"""
+    html = "<html><body><div class='section'><h2>Sample Posts</h2>"
+    for post in sorted(posts, key=lambda x: x['score'] + x['num_comments'], reverse=True):
+        matches = ', '.join(post['matched_keywords'] + post['matched_competitors'])
+        html += f"""
+                <div class="post">
+                    <h4><a href="{post['permalink']}" target="_blank">{post['title']}</a></h4>
+                    <p>r/{post['subreddit']} | ⬆️ {post['score']} | 💬 {post['num_comments']}</p>
+                    <p><strong>Matches:</strong> {matches}</p>
+                </div>
+            """
+    html += "</div></body></html>"
+    return html
+
+
+def measure(label, func):
+    # Time and memory are measured in separate runs; tracing skews the timing
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:>12}: {elapsed:6.2f}s, peak {peak / 1024 / 1024:7.1f} MB above baseline")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--posts', type=int, default=100000)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts)
+    renderer = ReportRenderer(top_posts=None)
+    matcher = KeywordMatcher(KEYWORDS, COMPETITORS)
+    out_path = os.path.join(tempfile.mkdtemp(), 'report.html')
+
+    def concat_to_file():
+        with open(out_path, 'w', encoding='utf-8') as f:
+            f.write(concatenated(posts))
+
+    def stream_to_file():
+        with open(out_path, 'w', encoding='utf-8') as f:
+            stats = MatchColumns.from_posts(posts, matcher)
+            for chunk in renderer.render(stats, '2024-01-01', ['fitness', 'supplements', 'nutrition']):
+                f.write(chunk)
+
+    print(f"Rendering {args.posts} posts")
+    measure('concatenate', concat_to_file)
+    measure('stream', stream_to_file)
+    print(f"Report size: {os.path.getsize(out_path) / 1024 / 1024:.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
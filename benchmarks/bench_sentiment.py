@@ -0,0 +1,99 @@
+"""Cost of sentiment scoring on top of matching, cold and from the cache
+
+Builds `--posts` posts that each mention one to three competitors amid praise,
+complaints, negations and filler, then matches them three times: without
+sentiment, with sentiment and an empty cache, and again with the cache warm.
+Also times the scorer alone on the collected windows, with NumPy and with the
+pure-Python fallback.
+
+Run from the repository root:
+    python benchmarks/bench_sentiment.py --posts 30000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import sentiment  # noqa: E402
+from match_stage import MatchStage  # noqa: E402
+from reddit_monitor import SimpleRedditMonitor  # noqa: E402
+from sentiment import SentimentCache, SentimentScorer, label  # noqa: E402
+
+BRANDS = ['myprotein', 'my protein', 'esn', 'pure sport', 'puresport', 'gold standard', 'cadence', 'marchon']
+PHRASES = ['love the taste of {}', '{} is really good', 'not impressed with {}', '{} gave me jitters and a crash',
+           'switched to {} last month', 'never had a problem with {}', '{} is overpriced garbage',
+           'the {} vanilla mixes smooth', 'honestly {} is fine', 'anyone tried {}?']
+FILLER = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'training', 'squat', 'week', 'today', 'after', 'gym']
+
+
+def make_posts(count, words, seed=3):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        text = [' '.join(rng.choice(FILLER) for _ in range(words // 4))]
+        for brand in rng.sample(BRANDS, rng.randint(1, 3)):
+            text.append(rng.choice(PHRASES).format(brand))
+            text.append(' '.join(rng.choice(FILLER) for _ in range(words // 4)))
+        posts.append({'id': f"{i:x}", 'name': f"t3_{i:x}", 'subreddit': 'fitness', 'created_utc': 1700000000 + i,
+                      'title': f"Supplement thoughts {i}", 'selftext': ' '.join(text), 'score': rng.randint(0, 500),
+                      'num_comments': rng.randint(0, 50), 'permalink': f"/r/fitness/comments/{i:x}/post/"})
+    return posts
+
+
+def timed_match(stage, posts):
+    with stage:
+        started = time.perf_counter()
+        records = list(stage.match(posts))
+        return records, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=30000)
+    parser.add_argument('--words', type=int, default=60, help="filler words per post")
+    parser.add_argument('--processes', type=int, default=0)
+    args = parser.parse_args()
+
+    posts = make_posts(args.posts, args.words)
+    matcher = SimpleRedditMonitor().matcher
+    cache_path = os.path.join(tempfile.mkdtemp(prefix='bench_sentiment_'), 'sentiment.db')
+
+    records, plain = timed_match(MatchStage(matcher, args.processes), posts)
+    scorer = SentimentScorer(cache=SentimentCache(cache_path))
+    records, cold = timed_match(MatchStage(matcher, args.processes, sentiment=scorer), posts)
+    mentions = scorer.scored
+    warm_scorer = SentimentScorer(cache=SentimentCache(cache_path))
+    _, warm = timed_match(MatchStage(matcher, args.processes, sentiment=warm_scorer), posts)
+
+    print(f"{len(posts):,} posts, {len(records):,} matched, {mentions:,} competitor mentions")
+    print(f"  match only:            {plain:6.2f}s")
+    print(f"  match + sentiment:     {cold:6.2f}s (+{cold - plain:.2f}s, {mentions / max(cold - plain, 1e-9):,.0f} "
+          f"mentions/s)")
+    print(f"  match + cached scores: {warm:6.2f}s ({warm_scorer.cache_hits:,} hits, {warm_scorer.scored} scored)")
+
+    labels = [label(score) for record in records for score in record.competitor_sentiment or ()]
+    print("  labels: " + ", ".join(f"{name} {labels.count(name):,}" for name in sentiment.LABELS))
+
+    # The scorer alone, on windows like the ones matching cuts out
+    windows = [post['selftext'] for post in posts]
+    for name, numpy in (('numpy', sentiment.np), ('python', None)):
+        if name == 'numpy' and numpy is None:
+            continue
+        saved, sentiment.np = sentiment.np, numpy
+        try:
+            alone = SentimentScorer()
+            started = time.perf_counter()
+            alone.score_windows(windows)
+            elapsed = time.perf_counter() - started
+        finally:
+            sentiment.np = saved
+        print(f"  scorer alone ({name}): {len(windows):,} windows in {elapsed:.2f}s "
+              f"({len(windows) / elapsed:,.0f}/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Startup time: import cost and time to first output of an offline (replay) run
+
+Seeds a response cache from the local stub, then runs the monitor in a fresh
+interpreter with --replay and measures how long it takes to print its first
+line and to finish. Exits non-zero if first output misses the target.
+
+Run from the repository root:
+    python benchmarks/bench_startup.py
+"""
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from reddit_stub import RedditStub  # noqa: E402
+
+# Target for a cached/offline run to reach its first line of output
+FIRST_OUTPUT_TARGET = 0.5
+
+
+def seed_cache(cache_dir, subreddits):
+    from reddit_monitor import SimpleRedditMonitor
+
+    with RedditStub(posts_per_subreddit=100) as stub:
+        monitor = SimpleRedditMonitor(cache_dir=cache_dir, cache_ttl=10 ** 9)
+        monitor.subreddits = subreddits
+        monitor.fetcher.base_url = stub.base_url
+        monitor.search_reddit_posts()
+        return stub.base_url
+
+
+def time_import(runs):
+    best = None
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, '-c', 'import reddit_monitor'], cwd=ROOT, check=True)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def time_replay_run(cache_dir, subreddits, base_url, work_dir):
+    env = dict(os.environ, REDDIT_BASE_URL=base_url,
+               REDDIT_CLIENT_ID=os.getenv('REDDIT_CLIENT_ID', 'offline'),
+               REDDIT_CLIENT_SECRET=os.getenv('REDDIT_CLIENT_SECRET', 'offline'),
+               EMAIL_FROM='', EMAIL_PASSWORD='', EMAIL_TO='')
+    command = [sys.executable, os.path.join(ROOT, 'reddit_monitor.py'), '--replay',
+               '--cache-dir', cache_dir, '--subreddits', ','.join(subreddits)]
+
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=work_dir, env=env, stdout=subprocess.PIPE,
+                               stderr=subprocess.STDOUT, text=True)
+    process.stdout.readline()
+    first_output = time.perf_counter() - start
+    process.stdout.read()
+    process.wait()
+    return first_output, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    subreddits = ['fitness', 'supplements', 'nutrition']
+    with tempfile.TemporaryDirectory() as work_dir:
+        cache_dir = os.path.join(work_dir, 'cache')
+        base_url = seed_cache(cache_dir, subreddits)
+
+        print(f"import reddit_monitor (fresh interpreter): {time_import(args.runs):.3f}s")
+        results = [time_replay_run(cache_dir, subreddits, base_url, work_dir) for _ in range(args.runs)]
+        first_output = min(r[0] for r in results)
+        total = min(r[1] for r in results)
+
+    verdict = 'OK' if first_output <= FIRST_OUTPUT_TARGET else 'MISSED'
+    print(f"replay run: first output {first_output:.3f}s (target {FIRST_OUTPUT_TARGET}s: {verdict}), "
+          f"complete {total:.3f}s")
+    sys.exit(0 if verdict == 'OK' else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Multi-window report statistics: re-aggregating per window vs prefix sums over day buckets
+
+Builds `--posts` records spread over the last `--days` days and computes, for
+each window set, mention counts, the change from the window before, top
+keywords and top posts per window. The old way filters the posts and builds a
+MatchColumns per window (and per previous window); WindowStats counts the
+posts once into day buckets and answers every window from prefix sums.
+
+Run from the repository root:
+    python benchmarks/bench_windows.py --posts 500000 --days 180
+"""
+import argparse
+import heapq
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from aggregation import SECONDS_PER_DAY, MatchColumns, WindowStats  # noqa: E402
+from keyword_matcher import KeywordMatcher  # noqa: E402
+from post_record import PostRecord  # noqa: E402
+
+KEYWORDS = [f"keyword{i}" for i in range(30)]
+COMPETITORS = [f"brand{i}" for i in range(12)]
+WINDOW_SETS = [(7,), (7, 30, 90), (1, 7, 14, 30, 60, 90)]
+
+
+def make_posts(count, days, matcher):
+    rng = random.Random(5)
+    now = time.time()
+    subreddits = ['fitness', 'supplements', 'nutrition', 'bodybuilding']
+    return [PostRecord(f"t3_{i:x}", now - rng.random() * days * SECONDS_PER_DAY, 'title',
+                       rng.randint(0, 5000), rng.randint(0, 800), rng.choice(subreddits),
+                       tuple(sorted(rng.sample(range(len(KEYWORDS)), 2))),
+                       (rng.randrange(len(COMPETITORS)),), '/r/x/', matcher)
+            for i in range(count)]
+
+
+def per_window(posts, matcher, windows, today):
+    """The previous approach: one MatchColumns per window and per previous window"""
+    for window in windows:
+        for start, end in ((today - window + 1, today), (today - 2 * window + 1, today - window)):
+            selected = [post for post in posts if start <= int(post.created_utc // SECONDS_PER_DAY) <= end]
+            stats = MatchColumns.from_posts(selected, matcher)
+            stats.competitor_counts()
+            heapq.nlargest(10, stats.keyword_counts().items(), key=lambda x: x[1])
+            stats.top_posts(10)
+
+
+def prefix_sums(stats, windows, today):
+    window_stats = WindowStats(stats, windows, today=today, span=2 * max(windows))
+    for window in windows:
+        window_stats.competitor_counts(window)
+        window_stats.competitor_counts(window, previous=True)
+        heapq.nlargest(10, window_stats.keyword_counts(window).items(), key=lambda x: x[1])
+        window_stats.top_posts(window, 10)
+    window_stats.competitor_series()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--posts', type=int, default=200_000)
+    parser.add_argument('--days', type=int, default=180)
+    args = parser.parse_args()
+
+    matcher = KeywordMatcher(KEYWORDS, COMPETITORS)
+    posts = make_posts(args.posts, args.days, matcher)
+    today = int(time.time() // SECONDS_PER_DAY)
+
+    started = time.perf_counter()
+    stats = MatchColumns.from_posts(posts, matcher)
+    built = time.perf_counter() - started
+    print(f"{len(posts):,} posts over {args.days} days; one MatchColumns pass: {built:.2f}s")
+
+    for windows in WINDOW_SETS:
+        started = time.perf_counter()
+        per_window(posts, matcher, windows, today)
+        old = time.perf_counter() - started
+        started = time.perf_counter()
+        prefix_sums(stats, windows, today)
+        new = time.perf_counter() - started
+        print(f"  windows {','.join(map(str, windows)):<18} per-window re-aggregation {old:6.2f}s | "
+              f"prefix sums {new * 1000:7.1f} ms ({old / new:,.0f}x)")
+
+
+if __name__ == "__main__":
+    main()
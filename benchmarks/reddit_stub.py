@@ -0,0 +1,376 @@
+"""Local HTTP stub that serves canned Reddit `new.json` listings (with `after` paging)
+and `/comments/<id>.json` comment trees
+
+Listings can also grow while the stub runs: with `arrival_rates`, new posts
+appear at the top of a subreddit's listing at that many posts per second.
+Instead of synthetic posts it can serve recorded listings (see load_listings).
+
+It can also enforce a Reddit-style rate limit (`rate_limit` requests per
+`rate_window` seconds, advertised in x-ratelimit-* headers and answered with 429
+and Retry-After once spent), inject bursts of 5xx errors, and fill listings
+with crossposts and reposts of other subreddits' posts.
+
+Usage from a script:
+
+    with RedditStub(latency=0.2) as stub:
+        monitor.fetcher.base_url = stub.base_url
+        ...
+
+or standalone:
+    python benchmarks/reddit_stub.py --port 8765 --latency 0.2
+    python benchmarks/reddit_stub.py --listings recorded/
+"""
+import argparse
+import glob
+import hashlib
+import json
+import math
+import os
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SAMPLE_WORDS = [
+    'creatine', 'hydration', 'electrolytes', 'caffeine', 'pre workout', 'myprotein',
+    'puresport', 'squat', 'bench', 'deadlift', 'rest', 'sleep', 'protein powder',
+    'cardio', 'running', 'marathon', 'cramps', 'fatigue', 'esn', 'beta alanine',
+    'the', 'and', 'with', 'after', 'before', 'today', 'week', 'progress',
+]
+
+
+def make_post(rng, subreddit, index, created_utc, selftext_words=60):
+    post_id = f"{subreddit.lower()[:3]}{index:07d}"
+    return {
+        'kind': 't3',
+        'data': {
+            'id': post_id,
+            'name': f"t3_{post_id}",
+            'title': ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(8)).capitalize(),
+            'selftext': ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(selftext_words)),
+            'score': rng.randint(0, 500),
+            'num_comments': rng.randint(0, 200),
+            'created_utc': created_utc,
+            'subreddit': subreddit,
+            'permalink': f"/r/{subreddit}/comments/{post_id}/post_{index}/",
+        }
+    }
+
+
+def make_comment_tree(rng, post_id, depth=4, breadth=3, prefix='c'):
+    """Build a nested comment listing `depth` levels deep with `breadth` replies per comment"""
+    children = []
+    for i in range(breadth):
+        comment_id = f"{prefix}{i}"
+        replies = make_comment_tree(rng, post_id, depth - 1, breadth, comment_id) if depth > 1 else ''
+        children.append({'kind': 't1', 'data': {
+            'id': comment_id,
+            'name': f"t1_{post_id}_{comment_id}",
+            'body': ' '.join(rng.choice(SAMPLE_WORDS) for _ in range(20)),
+            'score': rng.randint(0, 50),
+            'replies': replies,
+        }})
+    if depth > 1:
+        children.append({'kind': 'more', 'data': {'count': 10, 'children': []}})
+    return {'kind': 'Listing', 'data': {'children': children, 'after': None}}
+
+
+def make_listing(subreddit, posts=50, seed=0, spacing=600, now=None, selftext_words=60):
+    """Build a synthetic newest-first listing, one post every `spacing` seconds"""
+    rng = random.Random(f"{seed}-{subreddit}")
+    now = now or time.time()
+    return [make_post(rng, subreddit, i, now - i * spacing, selftext_words) for i in range(posts)]
+
+
+def load_listings(path, rebase=True, now=None):
+    """Load recorded listings as {subreddit: newest-first children} for RedditStub(listings=...)
+
+    `path` is a directory of `<subreddit>.json` files, each a saved `new.json`
+    response, a JSON list of such pages, or JSON lines of posts; or a
+    ResponseCache directory (`--cache-dir`), whose cached `new.json` pages are
+    grouped by the subreddit of their posts. With `rebase`, each subreddit's
+    timestamps are shifted so its newest post is `now`, keeping the gaps, so a
+    recording stays inside the monitor's weekly window.
+    """
+    pages = {}
+    for file_path in sorted(glob.glob(os.path.join(path, '*.json')) + glob.glob(os.path.join(path, '*.body'))):
+        with open(file_path, 'rb') as f:
+            raw = f.read()
+        try:
+            documents = [json.loads(raw)]
+        except ValueError:
+            documents = [json.loads(line) for line in raw.splitlines() if line.strip()]
+        if len(documents) == 1 and isinstance(documents[0], list):
+            documents = documents[0]
+        children = []
+        for document in documents:
+            if isinstance(document, dict) and document.get('kind') == 'Listing':
+                children.extend(child for child in document['data']['children'] if child.get('kind') == 't3')
+            elif isinstance(document, dict) and 'created_utc' in document.get('data', document):
+                children.append(document if 'data' in document else {'kind': 't3', 'data': document})
+        for child in children:
+            default = os.path.basename(file_path).rsplit('.', 1)[0]
+            pages.setdefault(child['data'].get('subreddit') or default, {})[child['data']['name']] = child
+
+    now = now or time.time()
+    listings = {}
+    for subreddit, by_name in pages.items():
+        listing = sorted(by_name.values(), key=lambda child: child['data']['created_utc'], reverse=True)
+        if rebase and listing:
+            shift = now - listing[0]['data']['created_utc']
+            for child in listing:
+                child['data']['created_utc'] += shift
+        listings[subreddit] = listing
+    return listings
+
+
+class RedditStub:
+    """Threaded HTTP server answering `/r/<subreddit>/new.json` from canned listings
+
+    `fault_rate` is the chance that a request starts a burst of `fault_burst`
+    consecutive 500/502/503 responses. `throttled` counts requests answered with
+    429 because the rate-limit window was spent, `faults` the injected 5xx.
+
+    With `duplicate_rate` that share of a listing's posts copy the same-index
+    post of an earlier listing: half as crossposts (with `crosspost_parent`),
+    half as reposts. `duplicates` counts them.
+
+    `arrival_rates` maps subreddit names to new posts per second; a listing
+    keeps at most `max_listing` posts once posts start arriving.
+
+    Synthetic listings hold `posts_per_subreddit` posts of `selftext_words`
+    words, one every `spacing` seconds back from the first request.
+    """
+
+    def __init__(self, listings=None, latency=0.0, host='127.0.0.1', port=0,
+                 posts_per_subreddit=50, seed=0, comment_depth=4, comment_breadth=3,
+                 rate_limit=None, rate_window=60.0, fault_rate=0.0, fault_burst=3, duplicate_rate=0.0,
+                 arrival_rates=None, max_listing=1000, selftext_words=60, spacing=600):
+        self.listings = dict(listings or {})
+        self.latency = latency
+        self.posts_per_subreddit = posts_per_subreddit
+        self.selftext_words = selftext_words
+        self.spacing = spacing
+        self.seed = seed
+        self.comment_depth = comment_depth
+        self.comment_breadth = comment_breadth
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.fault_rate = fault_rate
+        self.fault_burst = fault_burst
+        self.duplicate_rate = duplicate_rate
+        self.duplicates = 0
+        self.arrival_rates = dict(arrival_rates or {})
+        self.max_listing = max_listing
+        self.arrived = 0
+        # subreddit -> (time of the last arrival check, next post index, fractional post carried over)
+        self._arrivals = {}
+        self.request_count = 0
+        self.throttled = 0
+        self.faults = 0
+        self._window_start = time.monotonic()
+        self._window_used = 0
+        self._faults_left = 0
+        self._fault_rng = random.Random(f"{seed}-faults")
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def listing_for(self, subreddit):
+        with self._lock:
+            if subreddit not in self.listings:
+                listing = make_listing(subreddit, self.posts_per_subreddit, self.seed, self.spacing,
+                                       selftext_words=self.selftext_words)
+                if self.duplicate_rate and self.listings:
+                    self._add_duplicates(subreddit, listing)
+                self.listings[subreddit] = listing
+            if self.arrival_rates.get(subreddit):
+                self._add_arrivals(subreddit)
+            return self.listings[subreddit]
+
+    def _add_arrivals(self, subreddit):
+        now = time.time()
+        listing = self.listings[subreddit]
+        last, index, carry = self._arrivals.get(subreddit, (now, len(listing), 0.0))
+        due = carry + (now - last) * self.arrival_rates[subreddit]
+        count = int(due)
+        if count:
+            rng = random.Random(f"{self.seed}-{subreddit}-{index}")
+            # Newest first, spread evenly over the time since the last check
+            new = [make_post(rng, subreddit, index + i, now - (count - 1 - i) * (now - last) / count)
+                   for i in range(count)]
+            listing[:0] = reversed(new)
+            del listing[self.max_listing:]
+            self.arrived += count
+        self._arrivals[subreddit] = (now, index + count, due - count)
+
+    def _add_duplicates(self, subreddit, listing):
+        rng = random.Random(f"{self.seed}-{subreddit}-duplicates")
+        earlier = list(self.listings.values())
+        for index, child in enumerate(listing):
+            if rng.random() >= self.duplicate_rate:
+                continue
+            source = rng.choice(earlier)
+            if index >= len(source):
+                continue
+            original = source[index]['data']
+            post = child['data']
+            post['title'], post['selftext'] = original['title'], original['selftext']
+            if rng.random() < 0.5:
+                post['crosspost_parent'] = original['name']
+            self.duplicates += 1
+
+    def page(self, subreddit, limit, after=None):
+        """Slice a listing the way Reddit does, continuing after the `after` fullname"""
+        listing = self.listing_for(subreddit)
+        start = 0
+        if after:
+            names = [child['data']['name'] for child in listing]
+            start = names.index(after) + 1 if after in names else len(listing)
+        children = listing[start:start + limit]
+        more = start + limit < len(listing)
+        return {'kind': 'Listing',
+                'data': {'children': children,
+                         'after': children[-1]['data']['name'] if children and more else None}}
+
+    def admit(self):
+        """Account for one request; returns (status or None to serve it, extra headers)"""
+        with self._lock:
+            self.request_count += 1
+            if self.rate_limit is None:
+                headers = {}
+            else:
+                now = time.monotonic()
+                if now - self._window_start >= self.rate_window:
+                    self._window_start, self._window_used = now, 0
+                self._window_used += 1
+                reset = max(1, math.ceil(self._window_start + self.rate_window - now))
+                remaining = max(0, self.rate_limit - self._window_used)
+                headers = {'x-ratelimit-used': str(self._window_used),
+                           'x-ratelimit-remaining': f"{remaining:.1f}",
+                           'x-ratelimit-reset': str(reset)}
+                if self._window_used > self.rate_limit:
+                    self.throttled += 1
+                    return 429, dict(headers, **{'Retry-After': str(reset)})
+
+            if not self._faults_left and self.fault_rate and self._fault_rng.random() < self.fault_rate:
+                self._faults_left = self.fault_burst
+            if self._faults_left:
+                self._faults_left -= 1
+                self.faults += 1
+                return self._fault_rng.choice((500, 502, 503)), headers
+            return None, headers
+
+    def comments(self, post_id, depth):
+        """Return [post listing, comment listing] like Reddit's comments endpoint"""
+        rng = random.Random(f"{self.seed}-{post_id}")
+        tree = make_comment_tree(rng, post_id, min(depth, self.comment_depth), self.comment_breadth)
+        post = {'kind': 'Listing', 'data': {'children': [], 'after': None}}
+        return [post, tree]
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+
+            def log_message(self, format, *args):
+                pass
+
+            def send_json(self, status, payload, headers=None):
+                body = json.dumps(payload).encode('utf-8')
+                etag = '"%s"' % hashlib.md5(body).hexdigest()
+                if status == 200 and self.headers.get('If-None-Match') == etag:
+                    self.send_response(304)
+                    self.send_header('ETag', etag)
+                    self.send_header('Content-Length', '0')
+                    self.end_headers()
+                    return
+                headers = dict(headers or {}, ETag=etag) if status == 200 else headers
+
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                status, headers = stub.admit()
+                if stub.latency:
+                    time.sleep(stub.latency)
+                if status is not None:
+                    self.send_json(status, {'message': 'Too Many Requests' if status == 429 else 'Server Error',
+                                            'error': status}, headers)
+                    return
+
+                url = urlparse(self.path)
+                query = parse_qs(url.query)
+                parts = [p for p in url.path.split('/') if p]
+
+                if len(parts) == 3 and parts[0] == 'r' and parts[2] == 'new.json':
+                    limit = min(int(query.get('limit', ['25'])[0]), 100)
+                    self.send_json(200, stub.page(parts[1], limit, query.get('after', [None])[0]), headers)
+                elif len(parts) == 2 and parts[0] == 'comments' and parts[1].endswith('.json'):
+                    depth = int(query.get('depth', ['10'])[0])
+                    self.send_json(200, stub.comments(parts[1][:-len('.json')], depth), headers)
+                else:
+                    self.send_json(404, {'message': 'Not Found', 'error': 404}, headers)
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve canned Reddit listings locally")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0)
+    parser.add_argument('--posts', type=int, default=50)
+    parser.add_argument('--selftext-words', type=int, default=60)
+    parser.add_argument('--listings', default=None,
+                        help="serve recorded listings from this directory instead of synthetic ones")
+    parser.add_argument('--rate-limit', type=int, default=None,
+                        help="requests allowed per --rate-window seconds (default: unlimited)")
+    parser.add_argument('--rate-window', type=float, default=60.0)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0,
+                        help="share of posts copied from an earlier subreddit's listing")
+    parser.add_argument('--fault-rate', type=float, default=0.0,
+                        help="chance that a request starts a burst of 5xx errors")
+    args = parser.parse_args()
+
+    listings = load_listings(args.listings) if args.listings else None
+    stub = RedditStub(listings, latency=args.latency, port=args.port, posts_per_subreddit=args.posts,
+                      selftext_words=args.selftext_words,
+                      rate_limit=args.rate_limit, rate_window=args.rate_window,
+                      fault_rate=args.fault_rate, duplicate_rate=args.duplicate_rate)
+    print(f"Serving stub Reddit on {stub.base_url} (REDDIT_BASE_URL={stub.base_url})")
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        stub.stop()
+
+
+if __name__ == "__main__":
+    main()
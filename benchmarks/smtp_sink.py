@@ -0,0 +1,176 @@
+"""Local SMTP sink that accepts (and keeps) every message, for testing report delivery
+
+Speaks just enough ESMTP for smtplib: EHLO/HELO, AUTH PLAIN/LOGIN (any
+credentials), MAIL, RCPT, DATA, RSET, NOOP and QUIT. No STARTTLS, so point the
+monitor at it with SMTP_STARTTLS=0.
+
+Usage from a script:
+
+    with SMTPSink(latency=0.02) as sink:
+        os.environ.update(SMTP_SERVER=sink.host, SMTP_PORT=str(sink.port), SMTP_STARTTLS='0')
+        ...
+        print(len(sink.messages))
+
+or standalone:
+    python benchmarks/smtp_sink.py --port 8025
+"""
+import argparse
+import random
+import socketserver
+import threading
+import time
+
+
+class SMTPSink:
+    """Threaded SMTP server collecting (mail_from, rcpt_tos, data) tuples in `messages`
+
+    `latency` is added before every reply to mimic a remote server. `reject`
+    recipients get a permanent 550; with `flaky_rate` each RCPT has that chance
+    of a transient 451.
+    """
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, reject=(), flaky_rate=0.0, seed=0):
+        self.latency = latency
+        self.reject = set(reject)
+        self.flaky_rate = flaky_rate
+        self.messages = []
+        self.connections = 0
+        self.logins = 0
+        self.transactions = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.server = socketserver.ThreadingTCPServer((host, port), self._handler_class())
+        self.server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def host(self):
+        return self.server.server_address[0]
+
+    @property
+    def port(self):
+        return self.server.server_address[1]
+
+    @property
+    def recipients(self):
+        return [rcpt for _, rcpts, _ in self.messages for rcpt in rcpts]
+
+    def _flaky(self):
+        with self._lock:
+            return self.flaky_rate and self._rng.random() < self.flaky_rate
+
+    def _handler_class(self):
+        sink = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, line):
+                if sink.latency:
+                    time.sleep(sink.latency)
+                self.wfile.write(line.encode('utf-8') + b'\r\n')
+
+            def read_line(self):
+                line = self.rfile.readline()
+                if not line:
+                    raise ConnectionError("client went away")
+                return line.decode('utf-8', 'replace').rstrip('\r\n')
+
+            def handle(self):
+                with sink._lock:
+                    sink.connections += 1
+                mail_from, rcpt_tos = None, []
+                self.reply('220 localhost SMTP sink ready')
+                try:
+                    while True:
+                        line = self.read_line()
+                        command, _, argument = line.partition(' ')
+                        command = command.upper()
+                        if command == 'EHLO':
+                            self.wfile.write(b'250-localhost\r\n250-8BITMIME\r\n')
+                            self.reply('250 AUTH PLAIN LOGIN')
+                        elif command == 'HELO':
+                            self.reply('250 localhost')
+                        elif command == 'AUTH':
+                            if argument.upper().startswith('LOGIN'):
+                                self.reply('334 VXNlcm5hbWU6')
+                                self.read_line()
+                                self.reply('334 UGFzc3dvcmQ6')
+                                self.read_line()
+                            with sink._lock:
+                                sink.logins += 1
+                            self.reply('235 2.7.0 Authentication successful')
+                        elif command == 'MAIL':
+                            mail_from, rcpt_tos = argument.split(':', 1)[1].strip(' <>'), []
+                            self.reply('250 OK')
+                        elif command == 'RCPT':
+                            address = argument.split(':', 1)[1].strip(' <>')
+                            if address in sink.reject:
+                                self.reply('550 5.1.1 No such user')
+                            elif sink._flaky():
+                                self.reply('451 4.3.0 Try again later')
+                            else:
+                                rcpt_tos.append(address)
+                                self.reply('250 OK')
+                        elif command == 'DATA':
+                            if not rcpt_tos:
+                                self.reply('503 No valid recipients')
+                                continue
+                            self.reply('354 End data with <CR><LF>.<CR><LF>')
+                            lines = []
+                            while True:
+                                data_line = self.rfile.readline()
+                                if not data_line or data_line == b'.\r\n':
+                                    break
+                                lines.append(data_line[1:] if data_line.startswith(b'..') else data_line)
+                            with sink._lock:
+                                sink.messages.append((mail_from, rcpt_tos, b''.join(lines)))
+                                sink.transactions += 1
+                            mail_from, rcpt_tos = None, []
+                            self.reply('250 OK queued')
+                        elif command == 'RSET':
+                            mail_from, rcpt_tos = None, []
+                            self.reply('250 OK')
+                        elif command == 'NOOP':
+                            self.reply('250 OK')
+                        elif command == 'QUIT':
+                            self.reply('221 Bye')
+                            return
+                        else:
+                            self.reply('502 Command not implemented')
+                except (ConnectionError, OSError):
+                    return
+
+        return Handler
+
+    def start(self):
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Accept and count SMTP messages locally")
+    parser.add_argument('--port', type=int, default=8025)
+    parser.add_argument('--latency', type=float, default=0.0)
+    args = parser.parse_args()
+
+    sink = SMTPSink(port=args.port, latency=args.latency)
+    print(f"SMTP sink on {sink.host}:{sink.port} (SMTP_SERVER={sink.host} SMTP_PORT={sink.port} SMTP_STARTTLS=0)")
+    try:
+        sink.server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"{len(sink.messages)} messages to {len(sink.recipients)} recipients")
+        sink.stop()
+
+
+if __name__ == "__main__":
+    main()
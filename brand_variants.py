@@ -0,0 +1,124 @@
+import re
+import unicodedata
+
+# Ways a multi-word brand gets written: "my protein", "myprotein", "my-protein"
+SEPARATORS = (' ', '', '-')
+PLURAL_SUFFIXES = ('s', "'s")
+# Endings that turn a brand that is also a word ("cadence") into another real word
+# ("cadenced", "cadency") one edit away; such typos would match ordinary English
+INFLECTION_SUFFIXES = ('s', 'es', 'd', 'ed', 'r', 'er', 'y', 'ly', 'n', 'al', 'ic')
+VOWELS = 'aeiouy'
+# Letters next to each other on a QWERTY keyboard: the likely slips of a finger
+KEYBOARD_NEIGHBOURS = {
+    'q': 'wa', 'w': 'qeas', 'e': 'wrsd', 'r': 'etdf', 't': 'ryfg', 'y': 'tugh', 'u': 'yihj',
+    'i': 'uojk', 'o': 'ipkl', 'p': 'ol', 'a': 'qwsz', 's': 'awedxz', 'd': 'serfcx',
+    'f': 'drtgvc', 'g': 'ftyhbv', 'h': 'gyujnb', 'j': 'huikmn', 'k': 'jiolm', 'l': 'kop',
+    'z': 'asx', 'x': 'zsdc', 'c': 'xdfv', 'v': 'cfgb', 'b': 'vghn', 'n': 'bhjm', 'm': 'njk',
+}
+# Brands shorter than this (e.g. "esn") get no typo variants: too many collide with real words
+MIN_TYPO_LENGTH = 5
+
+# Unicode dashes and spaces folded to their ASCII forms before matching
+_FOLD = str.maketrans({
+    '\u2010': '-', '\u2011': '-', '\u2012': '-', '\u2013': '-', '\u2014': '-', '\u2212': '-',
+    '\u00a0': ' ', '\u2007': ' ', '\u202f': ' ', '\u2019': "'",
+})
+
+
+def normalize_text(text):
+    """Fold compatibility forms, accents, Unicode dashes/spaces and case
+
+    ASCII text (the vast majority of posts) is returned untouched.
+    """
+    if text.isascii():
+        return text
+    text = unicodedata.normalize('NFKD', text.translate(_FOLD))
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return unicodedata.normalize('NFC', text).lower()
+
+
+def _words(brand):
+    return [w for w in re.split(r'[\s\-_]+', normalize_text(brand.lower())) if w]
+
+
+def separator_forms(brand):
+    """Every spelling of `brand` with its words joined by a space, a hyphen or nothing"""
+    words = _words(brand)
+    forms = words[:1]
+    for word in words[1:]:
+        forms = [form + separator + word for form in forms for separator in SEPARATORS]
+    return forms
+
+
+def _likely_letters(char):
+    """Letters a typist plausibly hits instead of (or next to) `char`"""
+    letters = KEYBOARD_NEIGHBOURS.get(char, '')
+    return letters + VOWELS if char in VOWELS else letters
+
+
+def typos(word):
+    """Likely edit-distance-1 variants of `word` that keep its first letter
+
+    Every deletion and transposition; substitutions and insertions limited to
+    keyboard neighbours, vowel swaps ("cadance") and doubled letters. Using all
+    26 letters would multiply the pattern count (and the regex build time)
+    about five-fold for typos nobody makes. Leaving the first letter alone
+    keeps the combined regex's set of possible match starts small.
+    """
+    splits = [(word[:i], word[i:]) for i in range(1, len(word) + 1)]
+    deletes = [left + right[1:] for left, right in splits if right]
+    transposes = [left + right[1] + right[0] + right[2:] for left, right in splits if len(right) > 1]
+    replaces = [left + c + right[1:] for left, right in splits if right for c in _likely_letters(right[0])]
+    inserts = [left + c + right for left, right in splits
+               for c in set(_likely_letters(left[-1]) + left[-1] + (_likely_letters(right[0]) if right else ''))]
+    return set(deletes + transposes + replaces + inserts) - {word}
+
+
+def inflections(word):
+    """`word` with a common English ending added, dropping a final 'e' or 'y' first"""
+    stems = {word}
+    if word[-1:] in ('e', 'y'):
+        stems.add(word[:-1])
+    return {stem + suffix for stem in stems for suffix in INFLECTION_SUFFIXES}
+
+
+class BrandVariantIndex:
+    """Precomputed spelling variants for a list of canonical brands
+
+    Each brand expands at load time into its separator forms ("x endurance",
+    "xendurance", "x-endurance") and their plurals, which match like the brand
+    itself, plus edit-distance-1 typos of its joined form, which only match as
+    whole words. A typo that is another brand's spelling, one of the
+    `reserved` patterns (e.g. keywords), an inflection of the brand (see
+    `inflections`) or shared by two brands is dropped.
+
+    `variants` lists (variant, brand position, whole_word_only) for every
+    brand position in the input list.
+    """
+
+    def __init__(self, brands, reserved=(), typo_min_length=MIN_TYPO_LENGTH):
+        self.brands = list(brands)
+        exact = {}
+        for brand in self.brands:
+            forms = separator_forms(brand)
+            exact[brand] = set(forms) | {form + suffix for form in forms for suffix in PLURAL_SUFFIXES}
+        taken = set(reserved).union(*exact.values()) if exact else set(reserved)
+
+        # A typo is only kept if exactly one brand produces it
+        typo_owners = {}
+        for brand in exact:
+            joined = ''.join(_words(brand))
+            if len(joined) < typo_min_length:
+                continue
+            for typo in typos(joined) - inflections(joined):
+                if len(typo) >= 4 and typo not in taken:
+                    typo_owners.setdefault(typo, set()).add(brand)
+
+        self.variants = []
+        for position, brand in enumerate(self.brands):
+            self.variants.extend((variant, position, False) for variant in sorted(exact[brand]))
+            self.variants.extend((typo, position, True) for typo, owners in sorted(typo_owners.items())
+                                 if owners == {brand})
+
+    def __len__(self):
+        return len(self.variants)
@@ -0,0 +1,289 @@
+import heapq
+import signal
+import threading
+import time
+from datetime import datetime
+
+from aggregation import ROLLUP_PERIODS, SECONDS_PER_DAY, MatchColumns, rollup_rows
+from dedup import Deduplicator
+from run_metrics import RunMetrics
+
+
+class PollScheduler:
+    """Per-subreddit polling intervals that follow each subreddit's posting rate
+
+    Each subreddit's rate of new posts is tracked as an exponentially weighted
+    average, and it is polled again once about `target_posts` new posts are
+    expected: busy subreddits as often as every `min_interval` seconds, quiet
+    ones less often. A poll that finds nothing new, or fails, multiplies the
+    interval by `backoff`, up to `max_interval`.
+    """
+
+    def __init__(self, subreddits, min_interval=60, max_interval=1800, target_posts=25,
+                 backoff=2.0, smoothing=0.5, now=None):
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.target_posts = target_posts
+        self.backoff = backoff
+        self.smoothing = smoothing
+        # New posts per second, None until the first successful poll
+        self.rates = dict.fromkeys(subreddits)
+        self.intervals = dict.fromkeys(subreddits, min_interval)
+        self.last_polled = {}
+        # (due time, subreddit); every subreddit is due straight away
+        now = time.time() if now is None else now
+        self._due = [(now, name) for name in subreddits]
+        heapq.heapify(self._due)
+
+    def __len__(self):
+        return len(self._due)
+
+    def next_due(self):
+        """Return (due time, subreddit) of the next poll without removing it"""
+        return self._due[0]
+
+    def pop(self):
+        """Remove and return the subreddit due next; `record` puts it back"""
+        return heapq.heappop(self._due)[1]
+
+    def record(self, subreddit, new_posts, now, since=None, ok=True):
+        """Reschedule `subreddit` after a poll that found `new_posts`; returns its next interval
+
+        The rate is measured since the previous successful poll, or since
+        `since` (e.g. the stored high-water mark) on the first one.
+        """
+        interval = self.intervals[subreddit]
+        if ok:
+            since = self.last_polled.get(subreddit, since)
+            self.last_polled[subreddit] = now
+            if since is not None:
+                observed = new_posts / max(now - since, 1.0)
+                rate = self.rates[subreddit]
+                self.rates[subreddit] = observed if rate is None else rate + self.smoothing * (observed - rate)
+        if ok and new_posts and self.rates[subreddit]:
+            interval = self.target_posts / self.rates[subreddit]
+        else:
+            interval *= self.backoff
+        interval = min(max(interval, self.min_interval), self.max_interval)
+        self.intervals[subreddit] = interval
+        heapq.heappush(self._due, (now + interval, subreddit))
+        return interval
+
+
+class MonitorDaemon:
+    """Poll every subreddit's `new` listing continuously and match posts as they arrive
+
+    Each poll resumes from the subreddit's high-water mark in the state store,
+    so only new posts are fetched; a first poll reaches back `days_back` days,
+    or over the report's longest window if that is longer. It stores the
+    matches together with hourly and daily rollups. Reports are rendered from
+    the store every `report_every` seconds and on SIGUSR1; SIGINT or SIGTERM stop the daemon
+    after the current poll. With a SpikeDetector, every new match is counted
+    towards its patterns' hourly rates and spikes are sent as alerts; the
+    detector's baseline is loaded from the stored hourly rollups at start.
+    With a post index, every fetched post is added to it as well, and with an
+    export directory every report appends its posts and aggregates there.
+
+    Nothing grows with uptime: posts live in SQLite rather than memory, the
+    deduplicator remembers at most `dedup_entries` recent posts, counters are
+    overwritten, and hourly rollups older than `hourly_retention_days` are
+    pruned.
+    """
+
+    def __init__(self, monitor, scheduler, days_back=7, report_every=7 * SECONDS_PER_DAY,
+                 hourly_retention_days=14, metrics_every=300, dedup_entries=20_000, detector=None):
+        if not monitor.state_store:
+            raise ValueError("The daemon needs a state store for its checkpoints")
+        self.monitor = monitor
+        self.scheduler = scheduler
+        # Poll and keep enough history for the report's longest window
+        self.days_back = max(days_back, monitor.report_days)
+        self.report_every = report_every
+        self.hourly_retention = hourly_retention_days * SECONDS_PER_DAY
+        self.metrics_every = metrics_every
+        # Groups new posts into discussions for the rollups' unique counts
+        self.deduplicator = (Deduplicator(window_days=self.days_back, max_entries=dedup_entries)
+                             if monitor.dedup else None)
+        self.detector = detector
+        self.polls = 0
+        self._stopping = False
+        self._report_requested = False
+        # Set by signal handlers (and stop) to cut a sleep short
+        self._wake = threading.Event()
+
+    def stop(self):
+        """Ask the loop to exit after the current poll"""
+        self._stopping = True
+        self._wake.set()
+
+    def request_report(self):
+        """Render a report from the store before the next poll"""
+        self._report_requested = True
+        self._wake.set()
+
+    def _install_signal_handlers(self):
+        if threading.current_thread() is not threading.main_thread():
+            return {}
+        handlers = {signal.SIGINT: lambda signum, frame: self.stop(),
+                    signal.SIGTERM: lambda signum, frame: self.stop()}
+        if hasattr(signal, 'SIGUSR1'):
+            handlers[signal.SIGUSR1] = lambda signum, frame: self.request_report()
+        return {signum: signal.signal(signum, handler) for signum, handler in handlers.items()}
+
+    def run(self):
+        """Poll until stopped; returns the number of polls made"""
+        monitor = self.monitor
+        monitor.metrics = RunMetrics('daemon')
+        monitor.metrics.count('patterns', len(monitor.keywords) + len(monitor.competitor_brands))
+        monitor.fetcher.verbose = False
+        if self.detector is not None:
+            self.seed_detector()
+        previous_handlers = self._install_signal_handlers()
+        print(f"\n🛰️  Daemon polling {len(self.scheduler)} subreddits every "
+              f"{self.scheduler.min_interval:g}-{self.scheduler.max_interval:g}s "
+              f"(started {datetime.now().strftime('%Y-%m-%d %H:%M:%S')})")
+
+        now = time.time()
+        next_report = now + self.report_every if self.report_every else float('inf')
+        next_metrics = now + self.metrics_every
+        next_prune = now
+        try:
+            while not self._stopping:
+                now = time.time()
+                if self._report_requested or now >= next_report:
+                    self._report_requested = False
+                    self.report()
+                    if now >= next_report:
+                        next_report = now + self.report_every
+                if now >= next_prune:
+                    self.monitor.state_store.prune_rollups('hour', now - self.hourly_retention)
+                    next_prune = now + 3600
+                if now >= next_metrics:
+                    monitor.write_metrics(verbose=False)
+                    next_metrics = now + self.metrics_every
+
+                due, _ = self.scheduler.next_due()
+                wait = min(due, next_report, next_metrics, next_prune) - now
+                if wait > 0:
+                    self._wake.wait(wait)
+                    self._wake.clear()
+                    continue
+                self.poll(self.scheduler.pop())
+            monitor.metrics.finish()
+        except Exception:
+            monitor.metrics.finish('failed')
+            raise
+        finally:
+            for signum, handler in previous_handlers.items():
+                signal.signal(signum, handler)
+            print(f"\n🛑 Daemon stopped after {self.polls} polls")
+            monitor.write_metrics()
+        return self.polls
+
+    def poll(self, subreddit_name):
+        """Fetch one subreddit's new posts, store the matches and roll them up"""
+        monitor = self.monitor
+        metrics = monitor.metrics
+        store = monitor.state_store
+        now = time.time()
+        cutoff_utc = now - self.days_back * SECONDS_PER_DAY
+        mark = store.get_high_water(subreddit_name)
+
+        with metrics.stage('fetch'):
+            result = monitor.fetcher.fetch_subreddit(subreddit_name, cutoff_utc,
+                                                     high_water={subreddit_name: mark} if mark else None)
+        metrics.record_fetch(result)
+        self.polls += 1
+        metrics.gauge('polls', self.polls)
+
+        posts = []
+        try:
+            if monitor.post_index:
+                monitor.index_posts(result.posts)
+            posts = monitor.extract_matching_posts(subreddit_name, result.posts, datetime.fromtimestamp(cutoff_utc))
+            if monitor.comments:
+                posts = monitor.add_comment_matches(subreddit_name, result.posts, posts)
+            with metrics.stage('state'):
+                posts = monitor.record_incremental(result, posts)
+                if posts:
+                    store.add_rollups(rollup_rows(posts, self.assign_discussions(posts)))
+            if posts and self.detector is not None:
+                self.check_spikes(posts)
+        except Exception as e:
+            result.error = result.error or str(e)
+
+        interval = self.scheduler.record(subreddit_name, len(result.posts), time.time(),
+                                         since=mark[1] if mark else cutoff_utc, ok=result.ok)
+        metrics.subreddits[subreddit_name]['poll_interval_seconds'] = round(interval, 1)
+        if not result.ok:
+            print(f"  r/{subreddit_name}: Error - {result.error} (retrying in {interval:.0f}s)")
+        elif posts:
+            print(f"  r/{subreddit_name}: {len(result.posts)} new posts, {len(posts)} relevant "
+                  f"(next poll in {interval:.0f}s)")
+        if result.truncated:
+            print(f"  r/{subreddit_name}: stopped at the {monitor.fetcher.max_pages}-page limit; "
+                  f"the high-water mark stays put until a poll reaches it")
+        return posts
+
+    def seed_detector(self):
+        """Load the detector's baseline from the stored hourly rollups"""
+        detector = self.detector
+        if detector.bucket_seconds != ROLLUP_PERIODS['hour']:
+            return
+        since_utc = time.time() - detector.baseline_buckets * detector.bucket_seconds
+        rows = self.monitor.state_store.rollups('hour', since_utc, set(self.monitor.subreddits))
+        for bucket, _, kind, name, count in rows:
+            if kind in ('keyword', 'competitor'):
+                detector.seed(kind, name, bucket, count)
+
+    def check_spikes(self, posts):
+        """Count new matches towards their patterns' rates and alert on any spike"""
+        now = time.time()
+        with self.monitor.metrics.stage('alerts'):
+            spikes = [spike for post in sorted(posts, key=lambda post: post.get('created_utc') or 0)
+                      for spike in self.detector.observe(post, now)]
+        for spike in spikes:
+            self.monitor.send_alert(spike)
+
+    def assign_discussions(self, posts):
+        """Return IDs of the posts that open a new discussion (None when dedup is off)"""
+        if not self.deduplicator:
+            return None
+        deduplicator = self.deduplicator
+        opened = set()
+        for post in sorted(posts, key=lambda post: post.get('created_utc') or 0):
+            discussions = deduplicator.discussions
+            deduplicator.assign(post)
+            if deduplicator.discussions > discussions:
+                opened.add(post['id'])
+        metrics = self.monitor.metrics
+        metrics.gauge('unique_discussions', deduplicator.discussions)
+        metrics.gauge('duplicate_crossposts', deduplicator.crossposts)
+        metrics.gauge('duplicate_exact', deduplicator.exact_duplicates)
+        metrics.gauge('duplicate_near', deduplicator.near_duplicates)
+        return opened
+
+    def report(self):
+        """Render (and email) the usual report from the stored window plus the recent rollups"""
+        monitor = self.monitor
+        print(f"\n📄 Generating report at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}...")
+        with monitor.metrics.stage('state'):
+            posts = monitor.load_stored_posts(days_back=self.days_back)
+            monitor.covered_since = monitor.stored_coverage()
+        if monitor.dedup:
+            with monitor.metrics.stage('dedup'):
+                posts = Deduplicator().assign_all(posts)
+
+        if monitor.profile_index:
+            stats_by_profile = monitor.profile_stats(posts)
+            monitor.report_profiles(stats_by_profile)
+            if monitor.export_dir:
+                monitor.export_dataset(posts, stats_by_profile)
+            return
+        with monitor.metrics.stage('aggregate'):
+            stats = MatchColumns.from_posts(posts, monitor.matcher)
+        windows = monitor.window_stats(stats)
+        recent = monitor.recent_activity()
+        monitor.deliver_report(monitor.render_report(stats, recent=recent, windows=windows))
+        if monitor.export_dir:
+            monitor.export_dataset(posts, {'': stats})
@@ -0,0 +1,381 @@
+import csv
+import os
+import sqlite3
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - CSV export works without it
+    pa = pq = None
+
+FORMATS = ('auto', 'parquet', 'arrow', 'csv')
+EXTENSIONS = {'parquet': '.parquet', 'arrow': '.arrow', 'csv': '.csv'}
+# How list columns are flattened into one CSV cell
+CSV_LIST_SEPARATOR = '|'
+# IDs of the posts already in the dataset; dataset readers skip names starting with '_'
+EXPORTED_DB = '_exported_posts.db'
+
+# Column name and type of each table; the partition key (`date`) lives in the directory name
+POST_COLUMNS = (
+    ('run_id', 'string'),
+    ('post_id', 'string'),
+    ('subreddit', 'string'),
+    ('created_utc', 'float64'),
+    ('title', 'string'),
+    ('permalink', 'string'),
+    ('score', 'int64'),
+    ('num_comments', 'int64'),
+    ('matched_keywords', 'list<string>'),
+    ('matched_competitors', 'list<string>'),
+    ('comment_keywords', 'list<string>'),
+    ('comment_competitors', 'list<string>'),
+    ('competitor_sentiment', 'list<float64>'),
+    ('crosspost_parent', 'string'),
+    ('discussion', 'int64'),
+)
+AGGREGATE_COLUMNS = (
+    ('run_id', 'string'),
+    ('watchlist', 'string'),
+    ('metric', 'string'),
+    ('name', 'string'),
+    ('day', 'date'),
+    ('value', 'float64'),
+)
+
+
+def resolve_format(format='auto'):
+    """The export format to use: `auto` is Parquet when pyarrow is installed, CSV otherwise"""
+    if format not in FORMATS:
+        raise ValueError(f"Unknown export format '{format}' (expected one of {', '.join(FORMATS)})")
+    if format == 'auto':
+        return 'parquet' if pa is not None else 'csv'
+    if format != 'csv' and pa is None:
+        raise RuntimeError(f"Exporting {format.title()} files requires the 'pyarrow' package")
+    return format
+
+
+def _arrow_type(name):
+    return {
+        'string': pa.string(),
+        'int64': pa.int64(),
+        'float64': pa.float64(),
+        'date': pa.date32(),
+        'list<string>': pa.list_(pa.string()),
+        'list<float64>': pa.list_(pa.float64()),
+    }[name]
+
+
+def _csv_value(value):
+    if value is None:
+        return ''
+    if isinstance(value, (list, tuple)):
+        return CSV_LIST_SEPARATOR.join(str(item) for item in value)
+    return value
+
+
+class _PartFile:
+    """One part file being written: a Parquet, Arrow IPC or CSV stream of record batches
+
+    Data goes to a hidden temporary name, which dataset readers skip. `finish`
+    completes the file there and `commit` renames it into place, so readers
+    never see a half-written part. `abort` removes it instead.
+    """
+
+    def __init__(self, path, format, columns, schema):
+        self.path = path
+        self.format = format
+        self.columns = columns
+        directory, name = os.path.split(path)
+        os.makedirs(directory, exist_ok=True)
+        self.tmp_path = os.path.join(directory, f".{name}.tmp")
+        if format == 'parquet':
+            self._writer = pq.ParquetWriter(self.tmp_path, schema, compression='zstd')
+        elif format == 'arrow':
+            self._sink = pa.OSFile(self.tmp_path, 'wb')
+            self._writer = pa.ipc.new_file(self._sink, schema)
+        else:
+            self._file = open(self.tmp_path, 'w', encoding='utf-8', newline='')
+            self._writer = csv.writer(self._file)
+            self._writer.writerow(name for name, _ in columns)
+        self.schema = schema
+        self.finished = False
+
+    def write(self, rows):
+        if self.format == 'csv':
+            self._writer.writerows([_csv_value(value) for value in row] for row in rows)
+            return
+        arrays = [pa.array(values, type=self.schema.field(i).type) for i, values in enumerate(zip(*rows))]
+        self._writer.write_batch(pa.RecordBatch.from_arrays(arrays, schema=self.schema))
+
+    def finish(self):
+        if self.finished:
+            return
+        self.finished = True
+        if self.format == 'csv':
+            self._file.close()
+        else:
+            self._writer.close()
+            if self.format == 'arrow':
+                self._sink.close()
+
+    def commit(self):
+        self.finish()
+        os.replace(self.tmp_path, self.path)
+
+    def abort(self):
+        self.finish()
+        try:
+            os.remove(self.tmp_path)
+        except FileNotFoundError:  # already committed
+            pass
+
+
+class _PartitionedTable:
+    """Rows of one table buffered per date partition and flushed in record batches
+
+    Once `batch_size` rows are buffered in all, every partition's rows are
+    written out as one batch, so memory stays bounded however the rows are
+    spread over dates. At most `max_open` part files stay open; writing to
+    another partition finishes the least recently used one, and a later write
+    to it starts a new part. Every part stays under its temporary name until
+    `commit`.
+    """
+
+    def __init__(self, directory, format, columns, run_id, batch_size, max_open):
+        self.directory = directory
+        self.format = format
+        self.columns = columns
+        self.run_id = run_id
+        self.batch_size = batch_size
+        self.max_open = max_open
+        self.schema = (pa.schema([(name, _arrow_type(kind)) for name, kind in columns])
+                       if format != 'csv' else None)
+        self._buffers = {}
+        self._buffered = 0
+        self._open = OrderedDict()
+        self._parts = []
+        self.rows = 0
+        self.paths = []
+
+    def add(self, date, row):
+        self._buffers.setdefault(date, []).append(row)
+        self._buffered += 1
+        if self._buffered >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        for date in sorted(self._buffers):
+            self._flush(date)
+        self._buffered = 0
+
+    def _flush(self, date):
+        rows = self._buffers.pop(date, None)
+        if not rows:
+            return
+        part = self._open.pop(date, None)
+        if part is None:
+            if len(self._open) >= self.max_open:
+                _, oldest = self._open.popitem(last=False)
+                oldest.finish()
+            path = os.path.join(self.directory, f"date={date.isoformat()}",
+                                f"part-{self.run_id}-{len(self._parts) + 1:04d}{EXTENSIONS[self.format]}")
+            part = _PartFile(path, self.format, self.columns, self.schema)
+            self._parts.append(part)
+        self._open[date] = part
+        part.write(rows)
+        self.rows += len(rows)
+
+    def finish(self):
+        """Write out what is buffered and complete every part, still under its temporary name"""
+        self.flush()
+        self._open.clear()
+        for part in self._parts:
+            part.finish()
+
+    def commit(self):
+        for part in self._parts:
+            part.commit()
+        self.paths = [part.path for part in self._parts]
+
+    def abort(self):
+        self._buffers.clear()
+        self._buffered = 0
+        self._open.clear()
+        for part in self._parts:
+            part.abort()
+        self._parts = []
+
+
+class _ExportedPosts:
+    """Post IDs already written to the dataset, kept in SQLite next to the tables
+
+    New IDs are inserted in an open transaction that is committed once the
+    run's part files are in place, or rolled back if the export is aborted.
+    """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, timeout=60)
+        self.conn.execute("CREATE TABLE IF NOT EXISTS exported_posts (post_id TEXT PRIMARY KEY, run_id TEXT)")
+        self.conn.commit()
+
+    def claim(self, posts, run_id):
+        """Return the posts whose IDs were not exported before (first of any repeats) and record them"""
+        unique = {}
+        for post in posts:
+            unique.setdefault(post['id'], post)
+        post_ids = list(unique)
+        seen = set()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            seen.update(row[0] for row in self.conn.execute(
+                f"SELECT post_id FROM exported_posts WHERE post_id IN ({placeholders})", chunk))
+        new_posts = [post for post_id, post in unique.items() if post_id not in seen]
+        self.conn.executemany("INSERT INTO exported_posts VALUES (?, ?)",
+                              [(post['id'], run_id) for post in new_posts])
+        return new_posts
+
+    def commit(self):
+        self.conn.commit()
+        self.conn.close()
+
+    def abort(self):
+        # Closing without a commit rolls the transaction back
+        self.conn.close()
+
+
+class DatasetWriter:
+    """Append a run's matched posts and report aggregates to a date-partitioned dataset
+
+    Two tables are written under `directory`, Hive-style:
+
+        posts/date=YYYY-MM-DD/part-<run_id>-NNNN.parquet       by post creation day
+        aggregates/date=YYYY-MM-DD/part-<run_id>-NNNN.parquet  by report day
+
+    Every run adds new part files and never rewrites old ones, so the directory
+    accumulates history that pyarrow.dataset, DuckDB or Spark read as one table.
+    Each post is exported once, by the first run that matches it: the IDs
+    already written are kept in `_exported_posts.db`, and a post seen again
+    (from the state store, or a later crawl over an overlapping window) is
+    skipped. Posts are buffered per partition and written in record batches of
+    up to `batch_size` rows in all, which keeps memory bounded however many
+    posts stream through `add`.
+
+    Part files are written under temporary names and only renamed into place,
+    all together, by `close`; `abort` leaves the dataset as it was.
+
+    `format` is `parquet`, `arrow` (Arrow IPC files, which can be memory-mapped
+    and read without copying) or `csv`, where list columns are joined with `|`;
+    `auto` picks Parquet when pyarrow is installed and CSV otherwise.
+    """
+
+    def __init__(self, directory, format='auto', batch_size=10000, max_open=64, run_id=None):
+        self.directory = directory
+        self.format = resolve_format(format)
+        self.run_id = run_id or time.strftime('%Y%m%dT%H%M%SZ', time.gmtime()) + f"-{os.getpid()}"
+        self.posts = _PartitionedTable(os.path.join(directory, 'posts'), self.format, POST_COLUMNS,
+                                       self.run_id, batch_size, max_open)
+        self.aggregates = _PartitionedTable(os.path.join(directory, 'aggregates'), self.format,
+                                            AGGREGATE_COLUMNS, self.run_id, batch_size, max_open)
+        self.batch_size = batch_size
+        os.makedirs(directory, exist_ok=True)
+        self.exported = _ExportedPosts(os.path.join(directory, EXPORTED_DB))
+        self._pending = []
+        # Posts passed to `add` that an earlier run (or this one) already exported
+        self.skipped = 0
+
+    def add(self, post):
+        """Buffer one matched post (a PostRecord or stored post dict) unless it was exported before"""
+        self._pending.append(post)
+        if len(self._pending) >= self.batch_size:
+            self._add_pending()
+
+    def _add_pending(self):
+        posts, self._pending = self._pending, []
+        new_posts = self.exported.claim(posts, self.run_id)
+        self.skipped += len(posts) - len(new_posts)
+        for post in new_posts:
+            self._add_row(post)
+
+    def _add_row(self, post):
+        created_utc = post['created_utc']
+        discussion = post.get('discussion') if isinstance(post, dict) else post.discussion
+        self.posts.add(datetime.fromtimestamp(created_utc, timezone.utc).date(), (
+            self.run_id,
+            post['id'],
+            post['subreddit'],
+            float(created_utc),
+            post['title'],
+            post['permalink'],
+            post['score'],
+            post['num_comments'],
+            list(post['matched_keywords']),
+            list(post['matched_competitors']),
+            list(post.get('comment_keywords') or ()),
+            list(post.get('comment_competitors') or ()),
+            list(post['competitor_sentiment']) if post.get('competitor_sentiment') is not None else None,
+            post.get('crosspost_parent'),
+            discussion,
+        ))
+
+    def add_all(self, posts):
+        for post in posts:
+            self.add(post)
+
+    def add_aggregates(self, stats, watchlist='', report_date=None):
+        """Write the report's statistics from a MatchColumns, one row per (metric, name[, day])"""
+        report_date = report_date or datetime.now().date()
+        matcher = stats.matcher
+
+        def row(metric, name, value, day=None):
+            self.aggregates.add(report_date, (self.run_id, watchlist, metric, name, day, float(value)))
+
+        row('posts', '', len(stats))
+        row('discussions', '', stats.discussion_count())
+        for metric, counts in (('keyword_mentions', stats.keyword_counts()),
+                               ('keyword_discussions', stats.keyword_counts(unique=True)),
+                               ('comment_keyword_mentions', stats.keyword_counts(comments=True)),
+                               ('competitor_mentions', stats.competitor_counts()),
+                               ('competitor_discussions', stats.competitor_counts(unique=True)),
+                               ('comment_competitor_mentions', stats.competitor_counts(comments=True)),
+                               ('subreddit_posts', stats.subreddit_counts())):
+            for name, count in counts.items():
+                row(metric, name, count)
+        for day, count in stats.daily_counts().items():
+            row('daily_posts', '', count, day)
+        for pattern_id, days in stats.daily_pattern_counts().items():
+            if pattern_id < stats.competitor_offset:
+                metric, name = 'daily_keyword_mentions', matcher.keywords[pattern_id]
+            else:
+                metric, name = 'daily_competitor_mentions', matcher.competitors[
+                    pattern_id - stats.competitor_offset].title()
+            for day, count in days.items():
+                row(metric, name, count, day)
+        for name, entry in stats.competitor_sentiment().items():
+            for key, value in entry.items():
+                row(f"sentiment_{key}", name, value)
+
+    def close(self):
+        """Flush what is buffered, move every part file into place and record the exported IDs"""
+        self._add_pending()
+        self.posts.finish()
+        self.aggregates.finish()
+        self.posts.commit()
+        self.aggregates.commit()
+        # After the renames: a crash in between exports those posts again rather than losing them
+        self.exported.commit()
+
+    def abort(self):
+        """Remove every part file this run wrote and forget its post IDs"""
+        self._pending = []
+        self.posts.abort()
+        self.aggregates.abort()
+        self.exported.abort()
+
+    @property
+    def paths(self):
+        return self.posts.paths + self.aggregates.paths
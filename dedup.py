@@ -0,0 +1,227 @@
+import hashlib
+import heapq
+import string
+from itertools import chain, combinations
+
+from lazy_import import optional_module
+
+# NumPy, imported on first use; None selects the pure-Python fallback
+np = optional_module('numpy')
+
+SECONDS_PER_DAY = 86400
+SIMHASH_BITS = 64
+# Each SimHash bit gets an 8-bit counter lane in one packed integer, so adding a
+# feature's precomputed lanes counts all 64 bits in a single big-int addition
+LANE_BITS = 8
+LANE_MASK = (1 << LANE_BITS) - 1
+# Longer posts are sampled down to this many features, so no lane can overflow
+MAX_FEATURES = LANE_MASK
+# One in every lane, for broadcasting a constant to all 64 counters
+LANE_ONES = sum(1 << (LANE_BITS * bit) for bit in range(SIMHASH_BITS))
+LANE_HIGH_BIT = 1 << (LANE_BITS - 1)
+# Texts shorter than this many words are too generic ("best pre workout?") to
+# call duplicates on content alone; they are only grouped by crosspost parent
+MIN_TOKENS = 8
+WORD_CACHE_SIZE = 200_000
+HASH_MASK = (1 << SIMHASH_BITS) - 1
+
+# Punctuation becomes whitespace, so "Protein!" and "protein" are one word
+_PUNCTUATION = str.maketrans(dict.fromkeys(string.punctuation, ' '))
+# Binary digits to lane bytes and back
+_DIGIT_LANES = bytes.maketrans(b'01', b'\x00\x01')
+_LANE_DIGITS = bytes.maketrans(b'\x00\x01', b'01')
+
+
+def _hash64(text):
+    # Stable across processes and runs, unlike hash()
+    return int.from_bytes(hashlib.blake2b(text.encode('utf-8'), digest_size=8).digest(), 'big')
+
+
+def _spread(value):
+    """A 64-bit hash with each bit moved into its own counter lane"""
+    return int.from_bytes(format(value, '064b').encode('ascii').translate(_DIGIT_LANES), 'big')
+
+
+class _WordCache(dict):
+    """Word -> (64-bit hash, spread hash), computed on first lookup"""
+
+    def __missing__(self, word):
+        if len(self) >= WORD_CACHE_SIZE:
+            self.clear()
+        value = _hash64(word)
+        entry = self[word] = (value, _spread(value))
+        return entry
+
+
+_words = _WordCache()
+
+
+def _simhash_python(entries, hashes):
+    word_lanes = dict(entries)
+    pairs = {((a << 1 | a >> 63) & HASH_MASK) ^ b for a, b in zip(hashes, hashes[1:])}
+    if len(word_lanes) + len(pairs) > MAX_FEATURES:
+        # Keep the features with the smallest hashes: the same sample for two copies of a long post
+        keep = set(heapq.nsmallest(MAX_FEATURES, chain(word_lanes, pairs)))
+        word_lanes = {value: lanes for value, lanes in word_lanes.items() if value in keep}
+        pairs &= keep
+    counts = sum(word_lanes.values()) + sum(map(_spread, pairs))
+
+    # A bit is set when more than half of the features set it: bias every lane
+    # so that exactly those counters reach their lane's high bit, then read
+    # the high bits out as one byte string
+    half = (len(word_lanes) + len(pairs)) // 2
+    flags = ((counts + (LANE_HIGH_BIT - 1 - half) * LANE_ONES) >> (LANE_BITS - 1)) & LANE_ONES
+    return int(flags.to_bytes(SIMHASH_BITS, 'big').translate(_LANE_DIGITS), 2)
+
+
+def _simhash_numpy(hashes):
+    words = np.array(hashes, dtype=np.uint64)
+    pairs = ((words[:-1] << np.uint64(1)) | (words[:-1] >> np.uint64(63))) ^ words[1:]
+    features = np.unique(np.concatenate([words, pairs]))
+    if features.size > MAX_FEATURES:
+        features = np.partition(features, MAX_FEATURES - 1)[:MAX_FEATURES]
+    bits = np.unpackbits(features.astype('<u8').view(np.uint8).reshape(-1, 8), axis=1, bitorder='little')
+    majority = bits.sum(axis=0) > features.size // 2
+    return int.from_bytes(np.packbits(majority, bitorder='little').tobytes(), 'little')
+
+
+def content_signature(text):
+    """Return (content_hash, simhash) of lowercased post text, or (None, None) if it is too short
+
+    The content hash covers the text's words with punctuation and spacing
+    dropped. The SimHash is built from the distinct words and word pairs:
+    words alone would make any two posts drawing on the same small vocabulary
+    look alike, while pairs alone let a single changed word move too many
+    bits. A pair's hash is derived from its words' cached hashes, so only new
+    words are ever hashed. NumPy counts the bits when it is installed; the
+    pure-Python fallback gives the same signature.
+    """
+    tokens = text.translate(_PUNCTUATION).split()
+    if len(tokens) < MIN_TOKENS:
+        return None, None
+
+    entries = list(map(_words.__getitem__, tokens))
+    hashes = [value for value, _ in entries]
+    simhash = _simhash_numpy(hashes) if np is not None else _simhash_python(entries, hashes)
+    return _hash64(' '.join(tokens)), simhash
+
+
+class Deduplicator:
+    """Group posts into discussions by crosspost parent, exact content and SimHash
+
+    Posts are assigned in one pass. A post joins an earlier discussion when it
+    is a crosspost of (or the parent of) a post seen before, has the same
+    content hash, or has a SimHash within `max_distance` bits of one. Near
+    duplicates are found without comparing against every remembered post: the
+    64 bits are split into `max_distance + 2` blocks, so two hashes that close
+    agree exactly on at least one pair of blocks, and every post is indexed
+    under each pair's bits. A lookup is then one dict probe per pair.
+
+    Only posts created within `window_days` of the newest post seen (and at
+    most `max_entries` of them) are remembered, so memory stays bounded on
+    archive backfills. Discussion IDs are consecutive integers from 0.
+    """
+
+    def __init__(self, window_days=7, max_entries=100_000, max_distance=5):
+        self.window = window_days * SECONDS_PER_DAY
+        self.max_entries = max_entries
+        self.max_distance = max_distance
+        self.discussions = 0
+        self.posts = 0
+        self.crossposts = 0
+        self.exact_duplicates = 0
+        self.near_duplicates = 0
+
+        # key -> (discussion, sequence number of the post that last registered it)
+        self._roots = {}
+        self._hashes = {}
+        # (block pair number, the hash's bits in that pair) -> (simhash, discussion, sequence)
+        self._near_index = {}
+        blocks = max_distance + 2
+        edges = [SIMHASH_BITS * block // blocks for block in range(blocks + 1)]
+        block_masks = [((1 << (end - start)) - 1) << start for start, end in zip(edges, edges[1:])]
+        self._pair_masks = [a | b for a, b in combinations(block_masks, 2)]
+        # (created_utc, sequence, fullnames, content_hash, simhash) of every remembered post
+        self._window = []
+        self._newest = float('-inf')
+
+    @property
+    def duplicates(self):
+        return self.posts - self.discussions
+
+    def _near_keys(self, simhash):
+        return [(pair << SIMHASH_BITS) | (simhash & mask) for pair, mask in enumerate(self._pair_masks)]
+
+    def _near(self, simhash, keys):
+        for key in keys:
+            entry = self._near_index.get(key)
+            if entry is not None and bin(simhash ^ entry[0]).count('1') <= self.max_distance:
+                return entry[1]
+        return None
+
+    def _evict(self):
+        cutoff = self._newest - self.window
+        while self._window and (self._window[0][0] < cutoff or len(self._window) > self.max_entries):
+            _, sequence, fullnames, content_hash, simhash = heapq.heappop(self._window)
+            # A key registered again by a later post stays until that post leaves the window
+            for fullname in fullnames:
+                if self._roots.get(fullname, (None, None))[1] == sequence:
+                    del self._roots[fullname]
+            if content_hash is not None and self._hashes.get(content_hash, (None, None))[1] == sequence:
+                del self._hashes[content_hash]
+            if simhash is not None:
+                for key in self._near_keys(simhash):
+                    entry = self._near_index.get(key)
+                    if entry is not None and entry[2] == sequence:
+                        del self._near_index[key]
+
+    def assign(self, post):
+        """Return the discussion ID of `post` (a PostRecord or post dict) and store it on the post"""
+        sequence = self.posts
+        self.posts += 1
+        # A crosspost is found through its parent's fullname, from either side
+        fullnames = (post['id'], post.get('crosspost_parent')) if post.get('crosspost_parent') else (post['id'],)
+        content_hash = post.get('content_hash')
+        simhash = post.get('simhash')
+        near_keys = self._near_keys(simhash) if simhash is not None else ()
+
+        discussion = next((self._roots[fullname][0] for fullname in fullnames if fullname in self._roots), None)
+        if discussion is not None:
+            self.crossposts += 1
+        elif content_hash is not None and content_hash in self._hashes:
+            discussion = self._hashes[content_hash][0]
+            self.exact_duplicates += 1
+        elif simhash is not None:
+            discussion = self._near(simhash, near_keys)
+            if discussion is not None:
+                self.near_duplicates += 1
+        if discussion is None:
+            discussion = self.discussions
+            self.discussions += 1
+
+        for fullname in fullnames:
+            self._roots[fullname] = (discussion, sequence)
+        if content_hash is not None:
+            self._hashes[content_hash] = (discussion, sequence)
+        # Each key holds the latest post indexed under it; an older post it
+        # displaces is still reachable through its other block pairs
+        entry = (simhash, discussion, sequence)
+        for key in near_keys:
+            self._near_index[key] = entry
+        created_utc = post.get('created_utc') or 0
+        heapq.heappush(self._window, (created_utc, sequence, fullnames, content_hash, simhash))
+        self._newest = max(self._newest, created_utc)
+        self._evict()
+
+        if isinstance(post, dict):
+            post['discussion'] = discussion
+        else:
+            post.discussion = discussion
+        return discussion
+
+    def assign_all(self, posts):
+        """Assign every post, oldest first so each discussion is keyed to its original post"""
+        posts = sorted(posts, key=lambda post: post.get('created_utc') or 0)
+        for post in posts:
+            self.assign(post)
+        return posts
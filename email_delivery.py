@@ -0,0 +1,176 @@
+import queue
+import random
+import smtplib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email import policy
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+from email.utils import formatdate, make_msgid
+
+UNDISCLOSED_RECIPIENTS = 'undisclosed-recipients:;'
+
+
+def parse_recipients(value):
+    """Split a comma/semicolon separated address list, dropping blanks and duplicates"""
+    recipients = []
+    for address in (value or '').replace(';', ',').split(','):
+        address = address.strip()
+        if address and address not in recipients:
+            recipients.append(address)
+    return recipients
+
+
+class DeliveryResult:
+    """Outcome of one `ReportMailer.send_many` call"""
+
+    def __init__(self):
+        self.delivered = []
+        self.failed = {}
+        self.transactions = 0
+        self.retries = 0
+
+    @property
+    def ok(self):
+        return not self.failed
+
+
+class ReportMailer:
+    """Deliver HTML reports over a small pool of persistent, authenticated SMTP sessions
+
+    Each report's MIME message is serialised once and sent to its recipients
+    in batches of up to `batch_size` RCPT TOs per transaction (the To header
+    then reads "undisclosed-recipients"). Batches go out in parallel, at most
+    `connections` at a time, each on a session that stays logged in between
+    messages until `close()`. Recipients refused with a 4xx, or caught in a
+    dropped connection, are retried with jittered backoff; 5xx refusals are
+    final.
+    """
+
+    def __init__(self, host, port=587, username=None, password=None, sender=None, starttls=True,
+                 connections=2, batch_size=50, max_retries=2, backoff=1.0, timeout=30):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender or username
+        self.starttls = starttls
+        self.connections = max(1, connections)
+        self.batch_size = max(1, batch_size)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.connections_opened = 0
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+
+    def build_message(self, html, subject, to=UNDISCLOSED_RECIPIENTS):
+        """Serialise a report once, ready to hand to any number of transactions"""
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = subject
+        msg['From'] = self.sender
+        msg['To'] = to
+        msg['Date'] = formatdate(localtime=True)
+        msg['Message-ID'] = make_msgid()
+        msg.attach(MIMEText(html, 'html'))
+        return msg.as_bytes(policy=policy.SMTP)
+
+    def _connect(self):
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            server.ehlo()
+            if self.starttls:
+                server.starttls()  # Enable encryption
+                server.ehlo()
+            if self.username and self.password:
+                server.login(self.username, self.password)
+        except Exception:
+            server.close()
+            raise
+        with self._lock:
+            self.connections_opened += 1
+        return server
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    @staticmethod
+    def _discard(server):
+        try:
+            server.quit()
+        except (smtplib.SMTPException, OSError):
+            server.close()
+
+    def _send_batch(self, message, recipients):
+        """Run one transaction; returns {recipient: (code or None, error)} for those not accepted"""
+        try:
+            server = self._checkout()
+        except (smtplib.SMTPException, OSError) as e:
+            return {recipient: (getattr(e, 'smtp_code', None), str(e)) for recipient in recipients}
+
+        try:
+            refused = server.sendmail(self.sender, recipients, message)
+        except smtplib.SMTPRecipientsRefused as e:
+            refused = e.recipients
+        except (smtplib.SMTPException, OSError) as e:
+            # The session may be unusable now; drop it and let the retry open a fresh one
+            self._discard(server)
+            code = getattr(e, 'smtp_code', None)
+            return {recipient: (code, str(e)) for recipient in recipients}
+
+        self._idle.put(server)
+        return {recipient: (code, response.decode('utf-8', 'replace'))
+                for recipient, (code, response) in refused.items()}
+
+    def send(self, html, subject, recipients):
+        """Deliver one report to `recipients`; returns a DeliveryResult"""
+        return self.send_many([(html, subject, recipients)])
+
+    def send_many(self, reports):
+        """Deliver several reports, each given as (html, subject, recipients)"""
+        result = DeliveryResult()
+        pending = []
+        for html, subject, recipients in reports:
+            recipients = list(dict.fromkeys(recipients))
+            to = recipients[0] if len(recipients) == 1 else UNDISCLOSED_RECIPIENTS
+            message = self.build_message(html, subject, to)
+            pending += [(message, recipients[i:i + self.batch_size])
+                        for i in range(0, len(recipients), self.batch_size)]
+
+        with ThreadPoolExecutor(max_workers=self.connections) as executor:
+            for attempt in range(self.max_retries + 1):
+                if attempt:
+                    time.sleep(random.uniform(0, self.backoff * 2 ** (attempt - 1)))
+                outcomes = executor.map(lambda job: self._send_batch(*job), pending)
+
+                retry = []
+                for (message, batch), failures in zip(pending, outcomes):
+                    result.transactions += 1
+                    result.delivered += [recipient for recipient in batch if recipient not in failures]
+                    transient = []
+                    for recipient, (code, error) in failures.items():
+                        if (code is None or code < 500) and attempt < self.max_retries:
+                            transient.append(recipient)
+                        else:
+                            result.failed[recipient] = f"{code} {error}" if code else error
+                    if transient:
+                        retry.append((message, transient))
+
+                if not retry:
+                    break
+                result.retries += sum(len(batch) for _, batch in retry)
+                pending = retry
+        return result
+
+    def close(self):
+        """Log out of every idle session"""
+        while True:
+            try:
+                server = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._discard(server)
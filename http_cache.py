@@ -0,0 +1,217 @@
+import hashlib
+import json
+import os
+import time
+from collections import OrderedDict
+
+
+class CacheMiss(Exception):
+    """Raised in replay mode when a URL has never been cached"""
+
+
+class CachedResponse:
+    """Minimal stand-in for requests.Response served from the on-disk cache"""
+
+    from_cache = True
+
+    def __init__(self, url, status_code, headers, content):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode('utf-8')
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class ResponseCache:
+    """On-disk HTTP response cache keyed by URL
+
+    Fresh entries (younger than `ttl` seconds) are served without touching the
+    network. Stale entries are revalidated with If-None-Match/If-Modified-Since
+    and refreshed on a 304. The directory is kept under `max_bytes` by evicting
+    the least recently used entries. In `replay` mode the cache never goes to
+    the network: every entry is served regardless of age and a miss raises
+    CacheMiss.
+    """
+
+    def __init__(self, directory='.reddit_cache', ttl=3600, max_bytes=256 * 1024 * 1024,
+                 replay=False):
+        self.directory = directory
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.replay = replay
+        self.hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        # key -> total bytes of its files, least recently used first; loaded on first store
+        self._entries = None
+        self._total = 0
+        os.makedirs(directory, exist_ok=True)
+
+    @staticmethod
+    def _key(url):
+        return hashlib.sha256(url.encode('utf-8')).hexdigest()
+
+    def _paths(self, url):
+        base = os.path.join(self.directory, self._key(url))
+        return base + '.meta.json', base + '.body'
+
+    def _load_meta(self, url):
+        meta_path, _ = self._paths(url)
+        try:
+            with open(meta_path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _load(self, url, meta):
+        """The cached response, or None if its body has gone missing"""
+        _, body_path = self._paths(url)
+        try:
+            with open(body_path, 'rb') as f:
+                content = f.read()
+            # Touch both files so a later process sees this entry as recently used
+            for path in self._paths(url):
+                os.utime(path)
+        except OSError:
+            self._forget(url)
+            return None
+        if self._entries is not None and self._key(url) in self._entries:
+            self._entries.move_to_end(self._key(url))
+        self.hits += 1
+        return CachedResponse(url, meta['status_code'], meta['headers'], content)
+
+    def lookup(self, url):
+        """Return a CachedResponse if the entry can be served without the network, else None"""
+        meta = self._load_meta(url)
+        if meta is None:
+            if self.replay:
+                raise CacheMiss(f"Not in replay cache: {url}")
+            self.misses += 1
+            return None
+
+        if self.replay or time.time() - meta['stored_at'] < self.ttl:
+            response = self._load(url, meta)
+            if response is None:
+                if self.replay:
+                    raise CacheMiss(f"Not in replay cache: {url}")
+                self.misses += 1
+            return response
+        return None
+
+    def conditional_headers(self, url):
+        """Validators for revalidating a stale entry, if the server gave us any"""
+        meta = self._load_meta(url)
+        headers = {}
+        if meta:
+            if meta.get('etag'):
+                headers['If-None-Match'] = meta['etag']
+            if meta.get('last_modified'):
+                headers['If-Modified-Since'] = meta['last_modified']
+        return headers
+
+    def update(self, url, response):
+        """Store a fresh 200 or refresh an entry on 304; returns the response to use
+
+        A 304 is returned as is when the entry it revalidates has disappeared;
+        the caller has to fetch the page again without validators.
+        """
+        if response.status_code == 304:
+            meta = self._load_meta(url)
+            if meta is not None:
+                meta['stored_at'] = time.time()
+                try:
+                    self._write_meta(url, meta)
+                except OSError:
+                    pass
+                cached = self._load(url, meta)
+                if cached is not None:
+                    self.revalidations += 1
+                    return cached
+            return response
+
+        if response.status_code == 200:
+            try:
+                self._store(url, response)
+            except OSError:
+                self._forget(url)
+        return response
+
+    def _write_meta(self, url, meta):
+        meta_path, _ = self._paths(url)
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, meta_path)
+
+    def _store(self, url, response):
+        _, body_path = self._paths(url)
+        tmp_path = body_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(response.content)
+        os.replace(tmp_path, body_path)
+
+        self._write_meta(url, {
+            'url': url,
+            'status_code': response.status_code,
+            'headers': {'Content-Type': response.headers.get('Content-Type', 'application/json')},
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'stored_at': time.time(),
+        })
+        self._track(url)
+        self.evict()
+
+    def _scan(self):
+        """Size up the entries already on disk, least recently used first"""
+        entries = {}
+        for name in os.listdir(self.directory):
+            if name.endswith('.tmp'):
+                continue
+            key = name.split('.', 1)[0]
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except FileNotFoundError:
+                continue
+            size, used = entries.get(key, (0, 0))
+            entries[key] = (size + stat.st_size, max(used, stat.st_mtime))
+        self._entries = OrderedDict((key, size) for key, (size, _) in
+                                    sorted(entries.items(), key=lambda item: item[1][1]))
+        self._total = sum(self._entries.values())
+
+    def _forget(self, url):
+        """Drop an entry's files (whatever is left of them) and its size"""
+        for path in self._paths(url):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        if self._entries is not None:
+            self._total -= self._entries.pop(self._key(url), 0)
+
+    def _track(self, url):
+        if self._entries is None:
+            self._scan()
+            return
+        key = self._key(url)
+        size = sum(os.path.getsize(path) for path in self._paths(url))
+        self._total += size - self._entries.pop(key, 0)
+        self._entries[key] = size
+
+    def evict(self):
+        """Drop least recently used entries until the cache fits in max_bytes"""
+        if self._entries is None:
+            self._scan()
+        while self._total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            for suffix in ('.meta.json', '.body'):
+                try:
+                    os.remove(os.path.join(self.directory, key + suffix))
+                except FileNotFoundError:
+                    pass
+            self._total -= size
@@ -0,0 +1,187 @@
+import re
+
+from brand_variants import BrandVariantIndex, normalize_text
+
+# Up to this many patterns, one substring test per pattern is faster than the
+# regex scan (see benchmarks/bench_matcher.py)
+LOOP_MAX_PATTERNS = 100
+
+
+class KeywordMatcher:
+    """Compiled multi-pattern matcher for keywords and competitor brands
+
+    All patterns are folded into a single trie-shaped regex and the text is
+    scanned once from left to right. Each regex hit is the longest pattern
+    starting at that position; shorter patterns that are prefixes of it come
+    from a table built once at compile time, and patterns overlapping a hit
+    are picked up by re-anchoring the regex inside the hit's span.
+
+    Small pattern sets (at most LOOP_MAX_PATTERNS, without word boundaries or
+    brand typos) are matched with a plain substring test per pattern instead,
+    which is quicker until there are around a hundred patterns; the regex is
+    still used when mention offsets are asked for.
+
+    With `brand_variants` each competitor is treated as a canonical brand and
+    its precomputed spelling variants (see BrandVariantIndex) are folded into
+    the same regex, all resolving to the brand's ID; text is Unicode-normalised
+    first and each brand is reported at most once per text.
+    """
+
+    def __init__(self, keywords, competitors, word_boundaries=False, brand_variants=False):
+        self.keywords = list(keywords)
+        self.competitors = list(competitors)
+        self.word_boundaries = word_boundaries
+        self.brand_variants = brand_variants
+
+        # Lowercased pattern -> [(is_competitor, position in source list), ...]
+        self._targets = {}
+        for index, kw in enumerate(self.keywords):
+            self._targets.setdefault(kw.lower(), []).append((False, index))
+        for index, comp in enumerate(self.competitors):
+            self._targets.setdefault(comp.lower(), []).append((True, index))
+
+        # Patterns that only count as whole words (brand typos)
+        self._whole_word = set()
+        if brand_variants:
+            reserved = {kw.lower() for kw in self.keywords}
+            for variant, index, whole_word in BrandVariantIndex(self.competitors, reserved).variants:
+                targets = self._targets.setdefault(variant, [])
+                if (True, index) not in targets:
+                    targets.append((True, index))
+                if whole_word:
+                    self._whole_word.add(variant)
+
+        self._prefixes = self._build_prefix_table(self._targets)
+        self._regex = self._compile(self._targets, word_boundaries)
+        self._loop_patterns = None
+        if len(self._targets) <= LOOP_MAX_PATTERNS and not word_boundaries and not self._whole_word:
+            self._loop_patterns = [pattern for pattern in self._targets if pattern]
+
+    @staticmethod
+    def _build_trie(patterns):
+        trie = {}
+        for pattern in patterns:
+            node = trie
+            for char in pattern:
+                node = node.setdefault(char, {})
+            node[''] = True
+        return trie
+
+    @classmethod
+    def _trie_to_regex(cls, node):
+        terminal = '' in node
+        branches = [re.escape(char) + cls._trie_to_regex(child)
+                    for char, child in sorted(node.items()) if char]
+
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else f"(?:{'|'.join(branches)})"
+        # Greedy optional group: prefer extending the match, fall back to here
+        return f"(?:{body})?" if terminal else body
+
+    @classmethod
+    def _compile(cls, targets, word_boundaries):
+        patterns = [p for p in targets if p]
+        if not patterns:
+            return None
+        body = cls._trie_to_regex(cls._build_trie(patterns))
+        lead = r'(?<!\w)' if word_boundaries else ''
+        return re.compile(f"{lead}({body})")
+
+    @staticmethod
+    def _build_prefix_table(targets):
+        """Map every pattern to the patterns that are prefixes of it (itself included)"""
+        table = {}
+        for pattern in targets:
+            table[pattern] = [pattern[:i] for i in range(1, len(pattern) + 1)
+                              if pattern[:i] in targets]
+        return table
+
+    def find_hits(self, text, starts=None):
+        """Return the set of lowercased patterns found in already-lowercased text
+
+        With a `starts` list, every occurrence is also appended to it as
+        (pattern, start offset).
+        """
+        if self._loop_patterns is not None and starts is None:
+            return {pattern for pattern in self._loop_patterns if pattern in text}
+        if self._regex is None:
+            return set()
+
+        hits = set()
+        pos = 0
+        while True:
+            m = self._regex.search(text, pos)
+            if m is None:
+                return hits
+            self._record(text, m.start(), m.group(1), hits, starts)
+
+            # Overlapping patterns can only start inside the span already matched
+            span_end = m.end()
+            inner = m.start() + 1
+            while inner < span_end:
+                m = self._regex.match(text, inner)
+                if m is not None:
+                    self._record(text, inner, m.group(1), hits, starts)
+                    span_end = max(span_end, m.end())
+                inner += 1
+            pos = span_end
+
+    def _record(self, text, start, longest, hits, starts=None):
+        for pattern in self._prefixes[longest]:
+            if self.word_boundaries or pattern in self._whole_word:
+                end = start + len(pattern)
+                if end < len(text) and (text[end].isalnum() or text[end] == '_'):
+                    continue
+                # The regex only checks the leading boundary when word_boundaries is on
+                if start and not self.word_boundaries and (text[start - 1].isalnum() or text[start - 1] == '_'):
+                    continue
+            hits.add(pattern)
+            if starts is not None:
+                starts.append((pattern, start))
+
+    def match_ids(self, text, spans=None):
+        """Return (keyword_ids, competitor_ids) for already-lowercased text
+
+        IDs are positions in the configured keyword and competitor lists, sorted,
+        with repeats for patterns listed more than once. With a `spans` list,
+        every competitor mention is appended to it as (competitor ID, start, end)
+        offsets into the text as `normalized` returns it.
+        """
+        text = self.normalized(text)
+        starts = [] if spans is not None else None
+        keyword_slots = []
+        competitor_slots = []
+        for pattern in self.find_hits(text, starts):
+            for is_competitor, index in self._targets[pattern]:
+                (competitor_slots if is_competitor else keyword_slots).append(index)
+
+        keyword_slots.sort()
+        if self.brand_variants:
+            # Several spellings of one brand in a text are one mention
+            competitor_slots = set(competitor_slots)
+        if starts:
+            for pattern, start in starts:
+                for is_competitor, index in self._targets[pattern]:
+                    if is_competitor:
+                        spans.append((index, start, start + len(pattern)))
+        return tuple(keyword_slots), tuple(sorted(competitor_slots))
+
+    def normalized(self, text):
+        """The form of already-lowercased text that patterns are matched against"""
+        return normalize_text(text) if self.brand_variants else text
+
+    def match(self, text):
+        """Return (matched_keywords, matched_competitors) for already-lowercased text
+
+        The lists keep the order (and any repeats) of the configured keyword and
+        competitor lists, exactly as the per-keyword substring loop produced them.
+        """
+        keyword_ids, competitor_ids = self.match_ids(text)
+        return self.keyword_names(keyword_ids), self.competitor_names(competitor_ids)
+
+    def keyword_names(self, keyword_ids):
+        return [self.keywords[i] for i in keyword_ids]
+
+    def competitor_names(self, competitor_ids):
+        return [self.competitors[i] for i in competitor_ids]
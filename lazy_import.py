@@ -0,0 +1,28 @@
+import importlib
+import importlib.util
+
+
+class _LazyModule:
+    """Stand-in for a module that is imported the first time one of its attributes is used"""
+
+    def __init__(self, name):
+        self._module_name = name
+
+    def __getattr__(self, attr):
+        value = getattr(importlib.import_module(self._module_name), attr)
+        # Later lookups of the same attribute no longer reach __getattr__
+        setattr(self, attr, value)
+        return value
+
+
+def optional_module(name):
+    """A lazily imported stand-in for module `name`, or None if it isn't installed
+
+    Only the module's spec is looked up here. The import itself, which for
+    numpy takes longer than loading the rest of the monitor, waits until code
+    that needs the module runs, so `--help`, `--query` and configuration
+    errors never pay for it.
+    """
+    if importlib.util.find_spec(name) is None:
+        return None
+    return _LazyModule(name)
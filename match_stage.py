@@ -0,0 +1,169 @@
+import json
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+from dedup import content_signature
+from keyword_matcher import KeywordMatcher
+from post_record import PostRecord, post_fullname
+from sentiment import mention_windows
+
+# Compiled in each worker process by _init_worker
+_worker_matcher = None
+_worker_window_chars = None
+_worker_signatures = True
+
+
+def _init_worker(keywords, competitors, word_boundaries, brand_variants, window_chars=None, signatures=True):
+    global _worker_matcher, _worker_window_chars, _worker_signatures
+    _worker_matcher = KeywordMatcher(keywords, competitors, word_boundaries=word_boundaries,
+                                     brand_variants=brand_variants)
+    _worker_window_chars = window_chars
+    _worker_signatures = signatures
+
+
+def match_batch(matcher, batch, window_chars=None, signatures=True):
+    """Match a batch of raw posts (JSON strings/bytes or `data` dicts)
+
+    Returns compact tuples for the matching posts only, in batch order:
+    (name, created_utc, title, score, num_comments, subreddit, keyword_ids,
+    competitor_ids, permalink, crosspost_parent, content_hash, simhash,
+    mentions). With `window_chars`, `mentions` holds the text around each
+    competitor mention for sentiment scoring (see mention_windows), else None.
+    Without `signatures` (no duplicate detection), content_hash and simhash
+    are None.
+    """
+    results = []
+    for raw in batch:
+        post_data = raw if isinstance(raw, dict) else json.loads(raw)
+        # Archive dumps wrap nothing; listings wrap posts as {'kind': 't3', 'data': {...}}
+        post_data = post_data.get('data', post_data)
+
+        text_to_search = f"{post_data.get('title', '')} {post_data.get('selftext', '')}".lower()
+        spans = [] if window_chars else None
+        keyword_ids, competitor_ids = matcher.match_ids(text_to_search, spans)
+        if keyword_ids or competitor_ids:
+            mentions = None
+            if spans:
+                mentions = mention_windows(matcher.normalized(text_to_search), spans, competitor_ids,
+                                           window_chars)
+            # Signatures for duplicate detection, computed here while the text is at hand
+            content_hash, simhash = content_signature(text_to_search) if signatures else (None, None)
+            results.append((
+                post_fullname(post_data),
+                float(post_data.get('created_utc') or 0),
+                post_data.get('title', ''),
+                post_data.get('score', 0),
+                post_data.get('num_comments', 0),
+                post_data.get('subreddit', ''),
+                keyword_ids,
+                competitor_ids,
+                post_data.get('permalink', ''),
+                post_data.get('crosspost_parent'),
+                content_hash,
+                simhash,
+                mentions,
+            ))
+    return results
+
+
+def _match_batch_in_worker(batch):
+    return match_batch(_worker_matcher, batch, _worker_window_chars, _worker_signatures)
+
+
+class MatchStage:
+    """Keyword matching as a separate stage that can fan out to a process pool
+
+    Posts are grouped into batches; each worker compiles its own copy of the
+    pattern set once and returns compact tuples for matching posts only. Results
+    come back in input order. With `processes=0` everything runs in-process,
+    which is cheaper for small runs such as a single weekly crawl. The pool is
+    started on first use and reused for every later call (one per subreddit in
+    a crawl) until `close`; a MatchStage also works as a context manager.
+
+    With a SentimentScorer, the text around competitor mentions is cut out
+    while matching (in the workers too) and each batch's mentions are scored
+    together in this process as the batch comes back.
+
+    Content signatures for duplicate detection are only computed with
+    `signatures` set, i.e. when a Deduplicator will use them.
+    """
+
+    def __init__(self, matcher, processes=0, batch_size=2000, sentiment=None, signatures=True):
+        self.matcher = matcher
+        self.processes = os.cpu_count() if processes is None else processes
+        self.batch_size = batch_size
+        self.sentiment = sentiment
+        self.signatures = signatures
+        self._executor = None
+
+    @property
+    def executor(self):
+        """The worker pool, started on first use"""
+        if self._executor is None:
+            window_chars = self.sentiment.window_chars if self.sentiment is not None else None
+            initargs = (self.matcher.keywords, self.matcher.competitors, self.matcher.word_boundaries,
+                        self.matcher.brand_variants, window_chars, self.signatures)
+            self._executor = ProcessPoolExecutor(max_workers=self.processes, initializer=_init_worker,
+                                                 initargs=initargs)
+        return self._executor
+
+    def close(self):
+        """Shut the worker pool down, if one was started"""
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _batches(self, posts):
+        posts = iter(posts)
+        while True:
+            batch = list(islice(posts, self.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def _to_record(self, result, subreddit_name=None):
+        (name, created_utc, title, score, num_comments, subreddit, keyword_ids, competitor_ids, path,
+         crosspost_parent, content_hash, simhash, mentions) = result
+        record = PostRecord(name, created_utc, title, score, num_comments, subreddit_name or subreddit,
+                            keyword_ids, competitor_ids, path, self.matcher,
+                            crosspost_parent=crosspost_parent, content_hash=content_hash, simhash=simhash)
+        record.mentions = mentions
+        return record
+
+    def _records(self, results, subreddit_name=None):
+        records = [self._to_record(result, subreddit_name) for result in results]
+        if self.sentiment is not None:
+            self.sentiment.score_records(records)
+        return records
+
+    def match(self, posts, subreddit_name=None):
+        """Yield a PostRecord for every matching post, preserving input order"""
+        window_chars = self.sentiment.window_chars if self.sentiment is not None else None
+        if not self.processes:
+            for batch in self._batches(posts):
+                yield from self._records(match_batch(self.matcher, batch, window_chars, self.signatures),
+                                         subreddit_name)
+            return
+
+        executor = self.executor
+        # Keep a bounded number of batches in flight so memory stays flat
+        pending = deque()
+        try:
+            for batch in self._batches(posts):
+                pending.append(executor.submit(_match_batch_in_worker, batch))
+                if len(pending) >= self.processes * 2:
+                    yield from self._records(pending.popleft().result(), subreddit_name)
+            while pending:
+                yield from self._records(pending.popleft().result(), subreddit_name)
+        finally:
+            # A caller that stops early leaves no batches queued for the next call
+            for future in pending:
+                future.cancel()
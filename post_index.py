@@ -0,0 +1,174 @@
+import sqlite3
+import time
+from collections import defaultdict
+
+from aggregation import SECONDS_PER_DAY, MatchColumns
+from post_record import PERMALINK_PREFIX, post_fullname
+
+
+def fts_query(term):
+    """Quote a term or phrase for FTS5: words match whole, a trailing `*` matches a prefix"""
+    prefix = term.endswith('*')
+    phrase = '"' + term.rstrip('*').replace('"', '""') + '"'
+    return phrase + '*' if prefix else phrase
+
+
+class QueryResult:
+    """Counts and top posts for one `PostIndex.query`"""
+
+    def __init__(self, term):
+        self.term = term
+        self.count = 0
+        self.by_subreddit = {}
+        self.by_day = {}
+        self.top_posts = []
+        self.elapsed = 0.0
+
+
+class PostIndex:
+    """SQLite FTS5 full-text index of every fetched post, matched or not
+
+    Post text and metadata live in a plain table (indexed by creation time),
+    and an external-content FTS5 table indexes titles and selftext over it,
+    filled by a trigger so each post's text is stored once. Posts seen again
+    only have their score and comment count refreshed.
+
+    `query` answers ad-hoc term or phrase lookups over a date range; `posts`
+    streams stored posts back in their listing shape so the regular matcher
+    can be run over them for a report without crawling again.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS posts (
+            id               INTEGER PRIMARY KEY,
+            post_id          TEXT NOT NULL UNIQUE,
+            subreddit        TEXT NOT NULL,
+            created_utc      REAL NOT NULL,
+            score            INTEGER NOT NULL,
+            num_comments     INTEGER NOT NULL,
+            permalink        TEXT NOT NULL,
+            title            TEXT NOT NULL,
+            selftext         TEXT NOT NULL,
+            crosspost_parent TEXT
+        );
+        CREATE INDEX IF NOT EXISTS posts_created ON posts (created_utc);
+        CREATE VIRTUAL TABLE IF NOT EXISTS posts_fts USING fts5(
+            title, selftext, content='posts', content_rowid='id',
+            tokenize='unicode61 remove_diacritics 2'
+        );
+        CREATE TRIGGER IF NOT EXISTS posts_indexed AFTER INSERT ON posts BEGIN
+            INSERT INTO posts_fts (rowid, title, selftext) VALUES (new.id, new.title, new.selftext);
+        END;
+    """
+
+    COLUMNS = ('post_id', 'subreddit', 'created_utc', 'score', 'num_comments', 'permalink',
+               'title', 'selftext', 'crosspost_parent')
+
+    def __init__(self, path='reddit_monitor_index.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        # Every fetched page is its own transaction; the index can be rebuilt, so skip the per-commit fsync
+        self.conn.execute("PRAGMA journal_mode = WAL")
+        self.conn.execute("PRAGMA synchronous = NORMAL")
+        self.conn.executescript(self.SCHEMA)
+
+    def post_count(self):
+        return self.conn.execute("SELECT count(*) FROM posts").fetchone()[0]
+
+    def add(self, listing_posts):
+        """Index fetched posts (listing `data` dicts); returns how many were new"""
+        rows = [(post_fullname(post), post.get('subreddit', ''), post['created_utc'],
+                 post.get('score', 0), post.get('num_comments', 0), post.get('permalink', ''),
+                 post.get('title', ''), post.get('selftext', ''), post.get('crosspost_parent'))
+                for post in listing_posts]
+        with self.conn:
+            added = self.conn.executemany(
+                "INSERT OR IGNORE INTO posts (post_id, subreddit, created_utc, score, num_comments, permalink, "
+                "title, selftext, crosspost_parent) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows).rowcount
+            if added < len(rows):
+                # Posts seen before only get their engagement refreshed
+                self.conn.executemany(
+                    "UPDATE posts SET score = ?, num_comments = ? "
+                    "WHERE post_id = ? AND (score != ? OR num_comments != ?)",
+                    [(row[3], row[4], row[0], row[3], row[4]) for row in rows])
+        return added
+
+    @staticmethod
+    def _range(since_utc, until_utc, subreddits):
+        clauses, params = [], []
+        if since_utc is not None:
+            clauses.append("posts.created_utc >= ?")
+            params.append(since_utc)
+        if until_utc is not None:
+            clauses.append("posts.created_utc < ?")
+            params.append(until_utc)
+        if subreddits:
+            subreddits = list(subreddits)
+            # Listings carry Reddit's casing ('Fitness'), configured names may not
+            clauses.append(f"posts.subreddit COLLATE NOCASE IN ({','.join('?' * len(subreddits))})")
+            params.extend(subreddits)
+        return ''.join(f" AND {clause}" for clause in clauses), params
+
+    def query(self, term, since_utc=None, until_utc=None, subreddits=None, top=10):
+        """Count posts mentioning `term` per subreddit and UTC day, and fetch the `top` most engaging"""
+        start = time.perf_counter()
+        result = QueryResult(term)
+        where, params = self._range(since_utc, until_utc, subreddits)
+        match = "FROM posts_fts JOIN posts ON posts.id = posts_fts.rowid WHERE posts_fts MATCH ?" + where
+        params = [fts_query(term)] + params
+        if since_utc is not None or until_utc is not None:
+            # Posts are mostly added in time order, so the range's ids span little more than the range;
+            # FTS5 skips postings outside it instead of decoding every match and filtering by date after
+            low, high = self.id_range(since_utc, until_utc)
+            if low is None:
+                result.elapsed = time.perf_counter() - start
+                return result
+            match += " AND posts_fts.rowid BETWEEN ? AND ?"
+            params += [low, high]
+
+        by_subreddit = defaultdict(int)
+        by_day = defaultdict(int)
+        for subreddit, day, count in self.conn.execute(
+                f"SELECT posts.subreddit, CAST(posts.created_utc / {SECONDS_PER_DAY} AS INTEGER), count(*) {match} "
+                "GROUP BY 1, 2", params):
+            by_subreddit[subreddit] += count
+            by_day[MatchColumns.day_to_date(day)] += count
+        result.count = sum(by_subreddit.values())
+        result.by_subreddit = dict(sorted(by_subreddit.items(), key=lambda x: x[1], reverse=True))
+        result.by_day = dict(sorted(by_day.items()))
+
+        if top and result.count:
+            rows = self.conn.execute(
+                f"SELECT post_id, posts.subreddit, created_utc, score, num_comments, permalink, posts.title "
+                f"{match} ORDER BY score + num_comments DESC LIMIT ?", params + [top])
+            result.top_posts = [{'id': post_id, 'subreddit': subreddit, 'created_utc': created_utc,
+                                 'score': score, 'num_comments': num_comments,
+                                 'permalink': PERMALINK_PREFIX + permalink, 'title': title}
+                                for post_id, subreddit, created_utc, score, num_comments, permalink, title in rows]
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def id_range(self, since_utc=None, until_utc=None):
+        """Return the lowest and highest id of the posts created in a date range, (None, None) if none"""
+        where, params = self._range(since_utc, until_utc, None)
+        return self.conn.execute(f"SELECT min(id), max(id) FROM posts WHERE 1{where}", params).fetchone()
+
+    def oldest(self, subreddits=None):
+        """Return {subreddit: created_utc of its oldest indexed post}, subreddits compared case-insensitively"""
+        where, params = self._range(None, None, subreddits)
+        return dict(self.conn.execute(
+            f"SELECT subreddit, min(created_utc) FROM posts WHERE 1{where} GROUP BY subreddit COLLATE NOCASE",
+            params))
+
+    def posts(self, since_utc=None, until_utc=None, subreddits=None):
+        """Yield stored posts in a date range, oldest first, shaped like listing `data` dicts"""
+        where, params = self._range(since_utc, until_utc, subreddits)
+        rows = self.conn.execute(
+            f"SELECT {', '.join(self.COLUMNS)} FROM posts WHERE 1{where} ORDER BY created_utc", params)
+        for post_id, subreddit, created_utc, score, num_comments, permalink, title, selftext, parent in rows:
+            yield {'name': post_id, 'subreddit': subreddit, 'created_utc': created_utc, 'score': score,
+                   'num_comments': num_comments, 'permalink': permalink, 'title': title,
+                   'selftext': selftext, 'crosspost_parent': parent}
+
+    def close(self):
+        self.conn.close()
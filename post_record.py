@@ -0,0 +1,121 @@
+import sys
+
+from dedup import content_signature
+
+PERMALINK_PREFIX = 'https://reddit.com'
+
+
+def post_fullname(post_data):
+    """Reddit's fullname of a post ('t3_' + ID), which archive dumps leave out of `name`"""
+    return post_data.get('name') or f"t3_{post_data['id']}"
+
+
+class PostRecord:
+    """Compact record for one matched post
+
+    Matches are stored as integer IDs into the matcher's keyword and competitor
+    lists, subreddit names are interned, and the full permalink is only built
+    when asked for. Records also support `post['key']` lookups and `dict(post)`,
+    so code written against the old per-post dicts keeps working.
+
+    `crosspost_parent`, `content_hash` and `simhash` identify reposts of the
+    same discussion; `discussion` is set by a Deduplicator and not persisted.
+    """
+
+    __slots__ = ('id', 'created_utc', 'title', 'score', 'num_comments', 'subreddit',
+                 'keyword_ids', 'competitor_ids', 'path', 'patterns',
+                 'comment_keyword_ids', 'comment_competitor_ids',
+                 'crosspost_parent', 'content_hash', 'simhash', 'discussion',
+                 'competitor_sentiment', 'mentions')
+
+    FIELDS = ('id', 'created_utc', 'title', 'score', 'num_comments', 'subreddit',
+              'matched_keywords', 'matched_competitors', 'permalink',
+              'comment_keywords', 'comment_competitors',
+              'crosspost_parent', 'content_hash', 'simhash', 'competitor_sentiment')
+
+    def __init__(self, id, created_utc, title, score, num_comments, subreddit,
+                 keyword_ids, competitor_ids, path, patterns,
+                 comment_keyword_ids=(), comment_competitor_ids=(),
+                 crosspost_parent=None, content_hash=None, simhash=None, competitor_sentiment=None):
+        self.id = id
+        self.created_utc = created_utc
+        self.title = title
+        self.score = score
+        self.num_comments = num_comments
+        self.subreddit = sys.intern(subreddit)
+        self.keyword_ids = keyword_ids
+        self.competitor_ids = competitor_ids
+        self.path = path
+        # Shared pattern table (the KeywordMatcher) used to resolve IDs to names
+        self.patterns = patterns
+        # One entry per matching comment per pattern, rolled up from the comment tree
+        self.comment_keyword_ids = comment_keyword_ids
+        self.comment_competitor_ids = comment_competitor_ids
+        self.crosspost_parent = crosspost_parent
+        self.content_hash = content_hash
+        self.simhash = simhash
+        self.discussion = None
+        # One compound score per competitor ID, when sentiment scoring is on
+        self.competitor_sentiment = competitor_sentiment
+        # Text around each competitor mention, only held until the batch is scored
+        self.mentions = None
+
+    @classmethod
+    def from_listing(cls, post_data, subreddit_name, keyword_ids, competitor_ids, patterns, signatures=True):
+        """Build a record from a post's `data` dict in a Reddit listing
+
+        Content signatures are left as None without `signatures` (no duplicate detection).
+        """
+        content_hash, simhash = None, None
+        if signatures:
+            content_hash, simhash = content_signature(
+                f"{post_data.get('title', '')} {post_data.get('selftext', '')}".lower())
+        return cls(
+            post_fullname(post_data),
+            post_data['created_utc'],
+            post_data['title'],
+            post_data['score'],
+            post_data['num_comments'],
+            subreddit_name,
+            keyword_ids,
+            competitor_ids,
+            post_data['permalink'],
+            patterns,
+            crosspost_parent=post_data.get('crosspost_parent'),
+            content_hash=content_hash,
+            simhash=simhash,
+        )
+
+    @property
+    def matched_keywords(self):
+        return self.patterns.keyword_names(self.keyword_ids)
+
+    @property
+    def matched_competitors(self):
+        return self.patterns.competitor_names(self.competitor_ids)
+
+    @property
+    def comment_keywords(self):
+        return self.patterns.keyword_names(self.comment_keyword_ids)
+
+    @property
+    def comment_competitors(self):
+        return self.patterns.competitor_names(self.comment_competitor_ids)
+
+    @property
+    def permalink(self):
+        return PERMALINK_PREFIX + self.path
+
+    def keys(self):
+        return self.FIELDS
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self.FIELDS else default
+
+    def __repr__(self):
+        return f"PostRecord(id={self.id!r}, subreddit={self.subreddit!r}, title={self.title!r})"
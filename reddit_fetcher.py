@@ -0,0 +1,515 @@
+import asyncio
+import itertools
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.utils import parsedate_to_datetime
+
+DEFAULT_BASE_URL = 'https://www.reddit.com'
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
+    'Accept': 'application/json',
+    'Accept-Language': 'en-US,en;q=0.5',
+    'Accept-Encoding': 'gzip, deflate',
+    'DNT': '1',
+    'Connection': 'keep-alive',
+    'Upgrade-Insecure-Requests': '1',
+}
+
+# Transient statuses worth retrying; anything else is handed back as is
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504})
+
+
+class TokenBucket:
+    """Token-bucket rate limiter shared by sync and async callers
+
+    `rate` tokens are added per second up to `capacity`. Callers take a token
+    and wait only for as long as the bucket is actually empty; a waiting caller
+    re-checks after sleeping, so rate changes apply to requests already queued.
+
+    The server's own view of the budget can be fed back with `observe` (requests
+    remaining in the current window and seconds until it resets): the rate is
+    then set to spread what is left over the rest of the window, and reverts to
+    the configured rate once the window has rolled over. Callers `release` a
+    token's request once it has completed so requests still in flight, which
+    the server has not counted yet, are held back from the remaining budget.
+    `pause` holds every caller back, e.g. for a Retry-After.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = self.base_rate = float(rate)
+        self.capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._window_end = None
+        self._paused_until = 0.0
+        self._in_flight = 0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        if self._window_end is not None and now >= self._window_end:
+            # The server's window has rolled over; use the configured pace until it reports again
+            self.rate = self.base_rate
+            self._window_end = None
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def _take(self):
+        """Take a token if one is free (returns 0), else return how long to wait before trying again"""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                self._in_flight += 1
+                return 0.0
+            wait = (1 - self._tokens) / self.rate
+            if self._window_end is not None:
+                # Wake at the window reset at the latest; the rate may change there
+                wait = min(wait, max(self._window_end - now, 0.001))
+            return wait
+
+    def acquire(self):
+        """Wait for a token; returns the seconds spent waiting"""
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            time.sleep(wait)
+            waited += wait
+
+    async def acquire_async(self):
+        waited = 0.0
+        while True:
+            wait = self._take()
+            if not wait:
+                return waited
+            await asyncio.sleep(wait)
+            waited += wait
+
+    def release(self):
+        """Mark one acquired request as completed"""
+        with self._lock:
+            self._in_flight = max(self._in_flight - 1, 0)
+
+    def observe(self, remaining, reset):
+        """Adapt to `remaining` requests allowed in the `reset` seconds left in the server's window
+
+        Called while the reporting request still holds its token, so the other
+        requests in flight are the ones the server may not have counted yet.
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._window_end = now + reset
+            remaining -= max(self._in_flight - 1, 0)
+            if remaining < 1:
+                # Window spent: hold new requests until it resets
+                self._tokens = min(self._tokens, 0.0)
+                self._paused_until = max(self._paused_until, self._window_end)
+                return
+            # Tokens already on hand are part of what is left, not extra; spread the rest
+            self._tokens = min(self._tokens, remaining)
+            spare = max(remaining - max(self._tokens, 0.0), 1.0)
+            self.rate = spare / max(reset, 1.0)
+
+    def pause(self, seconds):
+        """Hold every caller back for `seconds`"""
+        with self._lock:
+            self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+
+class SubredditFetch:
+    """Posts collected from one subreddit plus what it cost to collect them"""
+
+    def __init__(self, subreddit_name, since_utc=None):
+        self.subreddit_name = subreddit_name
+        # The window cutoff asked for (paging may stop sooner, at a high-water mark)
+        self.since_utc = since_utc
+        self.posts = []
+        self.pages = 0
+        self.bytes = 0
+        self.status = None
+        self.error = None
+        # Wall-clock seconds for the whole subreddit, and how much of it was rate-limit/retry waiting
+        self.elapsed = 0.0
+        self.waited = 0.0
+        self.retries = 0
+        # Paging stopped at max_pages with older posts still to come
+        self.truncated = False
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    @property
+    def newest(self):
+        """The newest post fetched (listings are newest first), or None"""
+        return self.posts[0] if self.posts else None
+
+    @property
+    def complete(self):
+        """Whether every page back to the cutoff (or high-water mark) was fetched"""
+        return self.ok and not self.truncated
+
+    def covered_since(self, now=None):
+        """The time from which this fetch saw every post: the cutoff if complete, else its oldest post"""
+        if self.complete:
+            return self.since_utc
+        return self.posts[-1]['created_utc'] if self.posts else (now or time.time())
+
+
+class CommentFetch:
+    """Comment bodies collected for one post plus what they cost to fetch"""
+
+    def __init__(self, post_id):
+        self.post_id = post_id
+        self.comments = []
+        self.requests = 0
+        self.bytes = 0
+        self.truncated = False
+        self.error = None
+        self.waited = 0.0
+        self.retries = 0
+
+    @property
+    def ok(self):
+        return self.error is None
+
+
+class RedditFetcher:
+    """Fetch subreddit listings over a pooled keep-alive session
+
+    Listings are paginated with Reddit's `after` cursor (up to 100 items per
+    page) and paging stops at the first page that reaches back past the cutoff.
+    Pacing follows the x-ratelimit-* headers of each response, and 429s, 5xx
+    and connection errors are retried with jittered exponential backoff (or
+    after the server's Retry-After).
+    """
+
+    PAGE_SIZE = 100
+    MAX_BACKOFF = 60.0
+
+    def __init__(self, base_url=None, rate=None, burst=None, concurrency=None, timeout=30,
+                 max_pages=None, cache=None, max_retries=None, backoff=None):
+        self.base_url = (base_url or os.getenv('REDDIT_BASE_URL', DEFAULT_BASE_URL)).rstrip('/')
+        self.concurrency = int(concurrency or os.getenv('REDDIT_CONCURRENCY', '4'))
+        self.max_pages = int(max_pages or os.getenv('REDDIT_MAX_PAGES', '10'))
+        self.timeout = timeout
+        self.cache = cache
+        self.max_retries = int(max_retries if max_retries is not None else os.getenv('REDDIT_MAX_RETRIES', '4'))
+        self.backoff = float(backoff or os.getenv('REDDIT_RETRY_BACKOFF', '1.0'))
+        # Log every request URL; the daemon turns this off to keep its log readable
+        self.verbose = True
+
+        # Default budget matches the old fixed 2 second sleep (30 requests/minute)
+        rate = float(rate or os.getenv('REDDIT_RATE_LIMIT', '0.5'))
+        burst = int(burst or os.getenv('REDDIT_RATE_BURST', '10'))
+        self.rate_limiter = TokenBucket(rate, burst)
+
+        self._session = None
+        self._session_lock = threading.Lock()
+
+    @property
+    def session(self):
+        """Pooled keep-alive session, created (and requests imported) on first use"""
+        if self._session is None:
+            with self._session_lock:
+                if self._session is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+
+                    session = requests.Session()
+                    session.headers.update(DEFAULT_HEADERS)
+                    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.concurrency)
+                    session.mount('http://', adapter)
+                    session.mount('https://', adapter)
+                    self._session = session
+        return self._session
+
+    def listing_url(self, subreddit_name, limit, after=None):
+        url = f"{self.base_url}/r/{subreddit_name}/new.json?limit={min(limit, self.PAGE_SIZE)}"
+        if after:
+            url += f"&after={after}"
+        return url
+
+    def _cached(self, url):
+        """Serve a page from the response cache without spending rate-limit budget"""
+        return self.cache.lookup(url) if self.cache else None
+
+    def _get(self, url):
+        headers = self.cache.conditional_headers(url) if self.cache else None
+        if self.verbose:
+            print(f"🔍 Debug - Fetching from: {url}")
+        response = self.session.get(url, headers=headers, timeout=self.timeout)
+        self._observe_limits(response)
+        if not self.cache:
+            return response
+        response = self.cache.update(url, response)
+        if headers and response.status_code == 304:
+            # The entry it revalidated went missing in the meantime: fetch the page outright
+            response = self.session.get(url, timeout=self.timeout)
+            self._observe_limits(response)
+            response = self.cache.update(url, response)
+        return response
+
+    def _attempt(self, url):
+        """One GET; connection errors come back as (None, error) so they can be retried"""
+        import requests
+
+        try:
+            return self._get(url), None
+        except requests.RequestException as e:
+            return None, e
+        finally:
+            self.rate_limiter.release()
+
+    def _observe_limits(self, response):
+        """Feed Reddit's x-ratelimit-remaining/-reset headers back into the token bucket"""
+        remaining = response.headers.get('x-ratelimit-remaining')
+        reset = response.headers.get('x-ratelimit-reset')
+        if remaining is None or reset is None:
+            return
+        try:
+            self.rate_limiter.observe(float(remaining), float(reset))
+        except ValueError:
+            pass
+
+    def _retry_delay(self, response, attempt):
+        """Seconds to wait before retrying, or None if this result should be used as is"""
+        if attempt >= self.max_retries:
+            return None
+        if response is not None and response.status_code not in RETRY_STATUSES:
+            return None
+
+        retry_after = _retry_after(response) if response is not None else None
+        if retry_after is not None:
+            # Retry-After applies to the client, not just this request
+            self.rate_limiter.pause(retry_after)
+            return retry_after + random.uniform(0, self.backoff)
+        # Full jitter keeps concurrent retries from arriving in lockstep
+        return random.uniform(0, min(self.MAX_BACKOFF, self.backoff * 2 ** attempt))
+
+    def _request(self, url, result):
+        """GET `url` through the cache, rate limiter and retry policy
+
+        Waiting and retries are charged to `result` (a SubredditFetch or
+        CommentFetch). The last response is returned even if it is still an
+        error status; a connection error on the last attempt is raised.
+        """
+        response = self._cached(url)
+        if response is not None:
+            return response
+        for attempt in itertools.count():
+            result.waited += self.rate_limiter.acquire()
+            response, error = self._attempt(url)
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            result.retries += 1
+            result.waited += delay
+            time.sleep(delay)
+
+    async def _request_async(self, url, result, loop, executor, semaphore=None):
+        """`_request` for the event loop; `semaphore` (if given) bounds requests in flight"""
+        response = self._cached(url)
+        if response is not None:
+            return response
+        for attempt in itertools.count():
+            result.waited += await self.rate_limiter.acquire_async()
+            if semaphore is None:
+                response, error = await loop.run_in_executor(executor, self._attempt, url)
+            else:
+                async with semaphore:
+                    response, error = await loop.run_in_executor(executor, self._attempt, url)
+            delay = self._retry_delay(response, attempt)
+            if delay is None:
+                if error is not None:
+                    raise error
+                return response
+            result.retries += 1
+            result.waited += delay
+            await asyncio.sleep(delay)
+
+    def _consume_page(self, result, response, cutoff_utc, stop_name=None):
+        """Record one listing page; return the `after` cursor, or None when paging is done
+
+        Paging also stops at `stop_name`, the fullname of the newest post a
+        previous run already processed (the subreddit's high-water mark).
+        """
+        result.pages += 1
+        result.status = response.status_code
+        if not getattr(response, 'from_cache', False):
+            result.bytes += int(response.headers.get('Content-Length') or len(response.content))
+
+        if response.status_code != 200:
+            result.error = f"HTTP {response.status_code}"
+            return None
+
+        listing = response.json()['data']
+        children = listing['children']
+        for child in children:
+            if stop_name and child['data'].get('name') == stop_name:
+                return None
+            # Posts before the cutoff are only on the last page; don't hand them on
+            if child['data']['created_utc'] >= cutoff_utc:
+                result.posts.append(child['data'])
+
+        # Listings are newest first, so the last post on a page is its oldest
+        if not children or children[-1]['data']['created_utc'] < cutoff_utc:
+            return None
+        after = listing.get('after')
+        if after and result.pages >= self.max_pages:
+            result.truncated = True
+            return None
+        return after
+
+    @staticmethod
+    def _resume_point(subreddit_name, cutoff_utc, high_water):
+        """Combine the window cutoff with a stored (fullname, created_utc) high-water mark"""
+        mark = (high_water or {}).get(subreddit_name)
+        if not mark:
+            return cutoff_utc, None
+        fullname, created_utc = mark
+        return max(cutoff_utc, created_utc), fullname
+
+    def fetch_subreddit(self, subreddit_name, cutoff_utc, limit=PAGE_SIZE, high_water=None):
+        """Page through one subreddit's `new` listing back to `cutoff_utc`"""
+        result = SubredditFetch(subreddit_name, cutoff_utc)
+        cutoff_utc, stop_name = self._resume_point(subreddit_name, cutoff_utc, high_water)
+        after = None
+        start = time.perf_counter()
+        try:
+            while True:
+                url = self.listing_url(subreddit_name, limit, after)
+                response = self._request(url, result)
+                after = self._consume_page(result, response, cutoff_utc, stop_name)
+                if not after:
+                    break
+        except Exception as e:
+            result.error = str(e)
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def fetch_all(self, subreddit_names, cutoff_utc, limit=PAGE_SIZE, high_water=None):
+        """Fetch subreddits one after another; yields a SubredditFetch per subreddit"""
+        for name in subreddit_names:
+            yield self.fetch_subreddit(name, cutoff_utc, limit, high_water)
+
+    async def fetch_all_async(self, subreddit_names, cutoff_utc, limit=PAGE_SIZE, high_water=None):
+        """Fetch subreddits concurrently, at most `concurrency` requests in flight at once
+
+        Pages of one subreddit are still fetched in order because each needs the
+        previous page's cursor. Returns a list of SubredditFetch in input order.
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def fetch_one(name):
+                result = SubredditFetch(name, cutoff_utc)
+                name_cutoff, stop_name = self._resume_point(name, cutoff_utc, high_water)
+                after = None
+                start = time.perf_counter()
+                try:
+                    while True:
+                        url = self.listing_url(name, limit, after)
+                        response = await self._request_async(url, result, loop, executor, semaphore)
+                        after = self._consume_page(result, response, name_cutoff, stop_name)
+                        if not after:
+                            break
+                except Exception as e:
+                    result.error = str(e)
+                result.elapsed = time.perf_counter() - start
+                return result
+
+            return await asyncio.gather(*(fetch_one(name) for name in subreddit_names))
+
+    def comments_url(self, post_id, depth, limit):
+        return f"{self.base_url}/comments/{post_id}.json?depth={depth}&limit={limit}&sort=top"
+
+    @staticmethod
+    def _walk_comments(result, listing, depth, max_depth, max_comments):
+        """Collect comment bodies depth-first, honouring the depth and count caps"""
+        for child in listing.get('data', {}).get('children', []):
+            if child.get('kind') != 't1':
+                # 'more' stubs would need extra requests; count them as truncation
+                result.truncated = True
+                continue
+            if len(result.comments) >= max_comments:
+                result.truncated = True
+                return
+            data = child['data']
+            result.comments.append(data.get('body', ''))
+            replies = data.get('replies')
+            if replies:
+                if depth + 1 >= max_depth:
+                    result.truncated = True
+                else:
+                    RedditFetcher._walk_comments(result, replies, depth + 1, max_depth, max_comments)
+
+    def _consume_comments(self, result, response, max_depth, max_comments):
+        result.requests += 1
+        if not getattr(response, 'from_cache', False):
+            result.bytes += int(response.headers.get('Content-Length') or len(response.content))
+        if response.status_code != 200:
+            result.error = f"HTTP {response.status_code}"
+            return
+        # The response is [post listing, comment listing]
+        self._walk_comments(result, response.json()[1], 0, max_depth, max_comments)
+
+    async def fetch_comments_async(self, post_ids, max_depth=3, max_comments=200, max_bytes=None):
+        """Fetch comment trees for several posts, at most `concurrency` at once
+
+        Once `max_bytes` have been spent no further trees are started. Returns a
+        list of CommentFetch in input order (unfetched posts have error 'budget').
+        """
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(self.concurrency)
+        spent = [0]
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            async def fetch_one(post_id):
+                result = CommentFetch(post_id)
+                async with semaphore:
+                    if max_bytes is not None and spent[0] >= max_bytes:
+                        result.error = 'budget'
+                        return result
+                    url = self.comments_url(post_id, max_depth, max_comments)
+                    try:
+                        # The semaphore is already held for the whole tree
+                        response = await self._request_async(url, result, loop, executor)
+                        self._consume_comments(result, response, max_depth, max_comments)
+                    except Exception as e:
+                        result.error = str(e)
+                    spent[0] += result.bytes
+                    return result
+
+            return await asyncio.gather(*(fetch_one(post_id) for post_id in post_ids))
+
+    def close(self):
+        if self._session is not None:
+            self._session.close()
+
+
+def _retry_after(response):
+    """Seconds from a Retry-After header (delta-seconds or HTTP date), or None"""
+    value = response.headers.get('Retry-After')
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
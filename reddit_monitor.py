@@ -1,46 +1,41 @@
-import praw
+import argparse
+import asyncio
 from datetime import datetime, timedelta
 import json
-from collections import defaultdict
 import os
+import time
 from dotenv import load_dotenv
 
-import smtplib
-from email.mime.multipart import MIMEMultipart
-from email.mime.text import MIMEText
+from keyword_matcher import KeywordMatcher
+from reddit_fetcher import RedditFetcher
+from state_store import StateStore
+from post_index import PostIndex
+from sentiment import SentimentCache, SentimentScorer, load_lexicon
+from http_cache import ResponseCache
+from report_renderer import ReportRenderer
+from aggregation import MatchColumns, RollupView, WindowStats
+from match_stage import MatchStage
+from post_record import PostRecord, post_fullname
+from dedup import Deduplicator
+from run_metrics import RunMetrics
 
 # Load environment variables
 load_dotenv()
 
 class SimpleRedditMonitor:
-    def __init__(self):
+    def __init__(self, word_boundaries=False, async_fetch=False, concurrency=None, state_path=None,
+                 cache_dir=None, cache_ttl=3600, replay=False, match_processes=0,
+                 comments=False, comment_posts=20, comment_depth=3, comment_limit=200,
+                 comment_budget_kb=None, metrics_path=None, prometheus_path=None, metrics_history=None, profiles=None,
+                 brand_variants=True, dedup=True, alert_webhook=None, alert_email=False,
+                 index_path=None, sentiment=False, sentiment_cache=None, sentiment_lexicon=None,
+                 export_dir=None, export_format='auto', report_windows=(7,)):
         """Initialize with environment variables for security"""
-                
-                # Reddit configuration from env (read-only access)
-        self.reddit = praw.Reddit(
-            client_id=os.getenv('REDDIT_CLIENT_ID'),
-            client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
-            user_agent=os.getenv('REDDIT_USER_AGENT', 'WeeklyReportBot/1.0'),
-            username=None,  # No username for read-only
-            password=None   # No password for read-only
-        )
         
-        # ADD DEBUG CODE:
-        print(f"🔍 Debug - Client ID length: {len(os.getenv('REDDIT_CLIENT_ID', ''))}")
-        print(f"🔍 Debug - Client Secret length: {len(os.getenv('REDDIT_CLIENT_SECRET', ''))}")
-        print(f"🔍 Debug - User Agent: {os.getenv('REDDIT_USER_AGENT', 'NOT SET')}")
-        
-        # Test Reddit connection
-        try:
-            print(f"🔍 Debug - Testing Reddit connection...")
-            test_user = self.reddit.user.me()
-            print(f"🔍 Debug - Reddit connection successful! User: {test_user}")
-        except Exception as e:
-            print(f"🔍 Debug - Reddit connection failed: {e}")
-                
-
-        
-    
+        # The praw client is only built on first use; the JSON API path never needs it
+        self._reddit = None
+        # Likewise the SMTP sessions, which then stay open for every report of the run
+        self._mailer = None
         
         # Fitness/nutrition keywords to monitor
         self.keywords = [
@@ -55,19 +50,154 @@ class SimpleRedditMonitor:
             'muscle cramps', 'fatigue', 'endurance', 'beetroot', 'cordyceps',
         ]
         
-        # Specific competitors to track
+        # Specific competitors to track, one canonical name per brand; spacing and
+        # hyphen variants, plurals and typos are generated (see brand_variants)
         self.competitor_brands = [
-            'puresport', 'pure sport',
-            'marchon', 'marchon',
-            'xendurance', 'x-endurance', 'xendurance',
-            'esn', 'esn supplements',
-            'myprotein', 'my protein',
-            'cadence', 'cadence nutrition', 'gold standard'
+            'pure sport',
+            'marchon',
+            'x endurance',
+            'esn',
+            'my protein',
+            'cadence',
+            'gold standard',
         ]
         
         # Relevant fitness subreddits (smaller list for testing)
         self.subreddits = ['AskReddit']
+
+        # Watchlist profiles replace the lists above: their subreddits are fetched once
+        # and every profile is matched in the same pass through one combined index
+        self.profile_index = None
+        if profiles:
+            from watchlists import ProfileIndex
+            
+            self.profile_index = ProfileIndex(profiles, word_boundaries=word_boundaries,
+                                              brand_variants=brand_variants)
+            self.keywords = self.profile_index.keywords
+            self.competitor_brands = self.profile_index.competitors
+            self.subreddits = self.profile_index.subreddits
+
+        # Compile all keywords and competitors once so each post is scanned in a single pass
+        if self.profile_index:
+            self.matcher = self.profile_index.matcher
+        else:
+            self.matcher = KeywordMatcher(self.keywords, self.competitor_brands,
+                                          word_boundaries=word_boundaries, brand_variants=brand_variants)
+        
+        # Opt-in offline sentiment of the text around competitor mentions, scored while matching
+        # and cached by post content across runs
+        self.sentiment = None
+        if sentiment:
+            self.sentiment = SentimentScorer(load_lexicon(sentiment_lexicon) if sentiment_lexicon else None,
+                                             cache=SentimentCache(sentiment_cache or 'reddit_monitor_sentiment.db'))
+        self.match_stage = MatchStage(self.matcher, processes=match_processes, sentiment=self.sentiment,
+                                      signatures=dedup)
+
+        # Optional on-disk response cache (replay mode serves only from it, fully offline)
+        self.response_cache = None
+        if cache_dir or replay:
+            self.response_cache = ResponseCache(cache_dir or '.reddit_cache', ttl=cache_ttl, replay=replay)
+
+        # Pooled HTTP session and rate limiter for the public JSON API
+        self.fetcher = RedditFetcher(concurrency=concurrency, cache=self.response_cache)
+        self.async_fetch = async_fetch
+        self.fetch_stats = {}
+
+        # Opt-in comment monitoring: how many threads to expand per subreddit and how far
+        self.comments = comments
+        self.comment_posts = comment_posts
+        self.comment_depth = comment_depth
+        self.comment_limit = comment_limit
+        self.comment_budget_kb = comment_budget_kb
+        self.comment_stats = {}
+
+        # Streaming HTML report renderer
+        self.renderer = ReportRenderer()
+        
+        # Trailing windows (in days) the report covers; posts are gathered once for the longest,
+        # and with more than one window the report adds per-window trends
+        self.report_windows = sorted(set(report_windows))
+        # Time from which the posts behind the next report are complete (see WindowStats)
+        self.covered_since = None
+        
+        # Count crossposts and reposts across subreddits as one discussion
+        self.dedup = dedup
+
+        # Optional persistent state for incremental (e.g. hourly) runs
+        self.state_store = StateStore(state_path) if state_path else None
+        
+        # Optional full-text index of every fetched post, matched or not, for ad-hoc queries
+        self.post_index = PostIndex(index_path) if index_path else None
+
+        # Optional columnar export of every run's matched posts and aggregates, appended to a
+        # date-partitioned dataset (Parquet when pyarrow is installed, CSV otherwise)
+        self.export_dir = export_dir
+        self.export_format = export_format
+        if export_dir:
+            from dataset_export import resolve_format
+            
+            self.export_format = resolve_format(export_format)
+
+        # Stage timings and counters; a JSON summary is written after every run
+        self.metrics = RunMetrics()
+        self.metrics_path = metrics_path
+        self.prometheus_path = prometheus_path
+        # JSON Lines file every finished run's summary is appended to
+        self.metrics_history = metrics_history
+        
+        # Where the daemon's spike alerts go besides the log: a webhook URL and/or EMAIL_TO
+        self.alert_webhook = alert_webhook
+        self.alert_email = alert_email
     
+    @property
+    def reddit(self):
+        """Read-only praw client, created (and praw imported) on first access"""
+        if self._reddit is None:
+            import praw
+            
+            # Reddit configuration from env (read-only access)
+            self._reddit = praw.Reddit(
+                client_id=os.getenv('REDDIT_CLIENT_ID'),
+                client_secret=os.getenv('REDDIT_CLIENT_SECRET'),
+                user_agent=os.getenv('REDDIT_USER_AGENT', 'WeeklyReportBot/1.0'),
+                username=None,  # No username for read-only
+                password=None   # No password for read-only
+            )
+        return self._reddit
+
+    @property
+    def mailer(self):
+        """SMTP delivery pool, created (and smtplib imported) on first access"""
+        if self._mailer is None:
+            from email_delivery import ReportMailer
+            
+            # SMTP configuration from env
+            self._mailer = ReportMailer(
+                os.getenv('SMTP_SERVER', 'smtp.office365.com'),
+                int(os.getenv('SMTP_PORT', '587')),
+                username=os.getenv('EMAIL_FROM'),
+                password=os.getenv('EMAIL_PASSWORD'),
+                starttls=os.getenv('SMTP_STARTTLS', '1') not in ('0', 'false', 'no'),
+                connections=int(os.getenv('SMTP_CONNECTIONS', '2')),
+                batch_size=int(os.getenv('SMTP_BATCH_SIZE', '50')),
+            )
+        return self._mailer
+
+    def check_connection(self):
+        """Print credential diagnostics and probe Reddit with user.me()"""
+        print(f"🔍 Debug - Client ID length: {len(os.getenv('REDDIT_CLIENT_ID', ''))}")
+        print(f"🔍 Debug - Client Secret length: {len(os.getenv('REDDIT_CLIENT_SECRET', ''))}")
+        print(f"🔍 Debug - User Agent: {os.getenv('REDDIT_USER_AGENT', 'NOT SET')}")
+        
+        try:
+            print(f"🔍 Debug - Testing Reddit connection...")
+            test_user = self.reddit.user.me()
+            print(f"🔍 Debug - Reddit connection successful! User: {test_user}")
+            return True
+        except Exception as e:
+            print(f"🔍 Debug - Reddit connection failed: {e}")
+            return False
+
     def validate_config(self):
         """Validate that all required environment variables are set"""
         required_vars = [
@@ -82,257 +212,823 @@ class SimpleRedditMonitor:
         print("✅ All required environment variables are set")
         return True
 
-    def search_reddit_posts(self, days_back=7, limit_per_subreddit=50):
+    def search_reddit_posts(self, days_back=7, limit_per_subreddit=100):
         """Search Reddit for posts using direct JSON API (no auth required)"""
-        import requests
-        import time
-        
         all_posts = []
         cutoff_date = datetime.now() - timedelta(days=days_back)
+        cutoff_utc = cutoff_date.timestamp()
         
         print(f"Searching {len(self.subreddits)} subreddits for posts from the last {days_back} days...")
         
-        for subreddit_name in self.subreddits:
+        # Incremental runs stop paging at each subreddit's stored high-water mark
+        high_water = None
+        if self.state_store:
+            high_water = {name: self.state_store.get_high_water(name) for name in self.subreddits}
+        
+        # Requests are paced by the fetcher's token bucket rather than a fixed sleep
+        if self.async_fetch:
+            with self.metrics.stage('fetch'):
+                results = asyncio.run(self.fetcher.fetch_all_async(
+                    self.subreddits, cutoff_utc, limit_per_subreddit, high_water))
+        else:
+            # Subreddits are fetched lazily, so only time spent producing each one counts as fetch
+            results = self.metrics.timed('fetch', self.fetcher.fetch_all(
+                self.subreddits, cutoff_utc, limit_per_subreddit, high_water))
+        
+        self.fetch_stats = {}
+        self.comment_stats = {}
+        coverage = {}
+        for result in results:
+            subreddit_name = result.subreddit_name
+            # A failed or truncated fetch leaves the days before its oldest post short; a
+            # complete one adds to the stored matches without changing how far back they reach
+            coverage[subreddit_name] = None if self.state_store and result.complete else result.covered_since()
+            self.fetch_stats[subreddit_name] = {'pages': result.pages, 'bytes': result.bytes,
+                                                'posts': len(result.posts)}
+            self.metrics.record_fetch(result)
             try:
-                # Use Reddit's public JSON API
-                url = f"https://www.reddit.com/r/{subreddit_name}/new.json?limit={limit_per_subreddit}"
-                headers = {
-                    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
-                    'Accept': 'application/json',
-                    'Accept-Language': 'en-US,en;q=0.5',
-                    'Accept-Encoding': 'gzip, deflate',
-                    'DNT': '1',
-                    'Connection': 'keep-alive',
-                    'Upgrade-Insecure-Requests': '1',
-                }
-                
-                print(f"🔍 Debug - Fetching from: {url}")
-                response = requests.get(url, headers=headers)
-                
-                if response.status_code != 200:
-                    print(f"  r/{subreddit_name}: Error - HTTP {response.status_code}")
-                    continue
-                    
-                data = response.json()
-                posts_found = 0
-                
-                # Parse the JSON response
-                for post in data['data']['children']:
-                    post_data = post['data']
-                    post_date = datetime.fromtimestamp(post_data['created_utc'])
-                    
-                    if post_date < cutoff_date:
-                        continue
-                    
-                    # Check if any keywords or competitor brands match
-                    text_to_search = f"{post_data['title']} {post_data.get('selftext', '')}".lower()
-                    matched_keywords = [kw for kw in self.keywords if kw.lower() in text_to_search]
-                    matched_competitors = [comp for comp in self.competitor_brands if comp.lower() in text_to_search]
-                    
-                    if matched_keywords or matched_competitors:
-                        post_info = {
-                            'title': post_data['title'],
-                            'score': post_data['score'],
-                            'num_comments': post_data['num_comments'],
-                            'subreddit': subreddit_name,
-                            'matched_keywords': matched_keywords,
-                            'matched_competitors': matched_competitors,
-                            'permalink': f"https://reddit.com{post_data['permalink']}"
-                        }
-                        all_posts.append(post_info)
-                        posts_found += 1
+                if self.post_index:
+                    self.index_posts(result.posts)
+                # Keep whatever pages arrived before an error
+                posts = self.extract_matching_posts(subreddit_name, result.posts, cutoff_date)
+                if self.comments:
+                    posts = self.add_comment_matches(subreddit_name, result.posts, posts)
+                if self.state_store:
+                    with self.metrics.stage('state'):
+                        posts = self.record_incremental(result, posts)
+                all_posts.extend(posts)
+                cost = f"{result.pages} pages, {result.bytes / 1024:.1f} KB"
+                if result.retries:
+                    cost += f", {result.retries} retries"
+                if result.truncated:
+                    cost += f", stopped at the {self.fetcher.max_pages}-page limit"
                 
-                print(f"  r/{subreddit_name}: {posts_found} relevant posts")
-                time.sleep(2)  # Longer delay to avoid rate limits
-
+                if not result.ok:
+                    print(f"  r/{subreddit_name}: Error - {result.error} ({len(posts)} relevant posts, {cost})")
+                else:
+                    print(f"  r/{subreddit_name}: {len(posts)} relevant posts ({cost})")
                         
             except Exception as e:
                 print(f"  r/{subreddit_name}: Error - {e}")
+                coverage[subreddit_name] = time.time()
                 continue
         
-        print(f"\n📊 Total posts found: {len(all_posts)}")
+        if self.state_store:
+            # The report is built from the stored matches, which reach back further than this run
+            for name, covered_since in self.state_store.get_coverage(coverage).items():
+                coverage[name] = max(coverage[name] or covered_since, covered_since)
+        self.covered_since = max((value for value in coverage.values() if value is not None), default=None)
+        
+        total_pages = sum(stats['pages'] for stats in self.fetch_stats.values())
+        total_bytes = sum(stats['bytes'] for stats in self.fetch_stats.values())
+        print(f"\n📊 Total posts found: {len(all_posts)} ({total_pages} pages, {total_bytes / 1024:.1f} KB downloaded)")
+        if self.response_cache:
+            cache = self.response_cache
+            print(f"🗃️  Cache: {cache.hits} hits, {cache.misses} misses, {cache.revalidations} revalidated")
+            self.metrics.count('cache_hits', cache.hits)
+            self.metrics.count('cache_misses', cache.misses)
+            self.metrics.count('cache_revalidations', cache.revalidations)
+        self.report_sentiment()
         return all_posts
+
+    def extract_matching_posts(self, subreddit_name, listing_posts, cutoff_date):
+        """Match fetched listing posts against keywords and competitors"""
+        recent_posts = (post_data for post_data in listing_posts
+                        if datetime.fromtimestamp(post_data['created_utc']) >= cutoff_date)
+        
+        # Check if any keywords or competitor brands match
+        with self.metrics.stage('match'):
+            posts = list(self.match_stage.match(recent_posts, subreddit_name))
+        self.metrics.count('posts_scanned', len(listing_posts))
+        self.metrics.count('posts_matched', len(posts))
+        return posts
     
-    def generate_simple_report(self, posts):
-        """Generate a simple HTML report"""
-        report_date = datetime.now().strftime("%Y-%m-%d")
+    def report_sentiment(self):
+        """Log how many competitor mentions were scored and how many came from the cache"""
+        if self.sentiment:
+            print(f"💭 Sentiment: {self.sentiment.scored} mentions scored, "
+                  f"{self.sentiment.cache_hits} from cache")
+    
+    def index_posts(self, listing_posts):
+        """Add fetched posts to the full-text index; returns how many were new"""
+        with self.metrics.stage('index'):
+            added = self.post_index.add(listing_posts)
+        self.metrics.count('posts_indexed', added)
+        return added
+    
+    def search_index(self, days_back=7):
+        """Match the indexed posts of the last `days_back` days instead of crawling
         
-        # Count mentions
-        keyword_counts = defaultdict(int)
-        competitor_counts = defaultdict(int)
-        
-        for post in posts:
-            for keyword in post['matched_keywords']:
-                keyword_counts[keyword] += 1
-            for competitor in post['matched_competitors']:
-                competitor_counts[competitor.title()] += 1
-        
-        # Create HTML report
-        html = f"""
-        <!DOCTYPE html>
-        <html>
-        <head>
-            <title>Reddit Fitness Monitor - {report_date}</title>
-            <style>
-                body {{ font-family: Arial, sans-serif; margin: 40px; background-color: #f5f6fa; }}
-                .container {{ max-width: 1000px; margin: 0 auto; }}
-                h1 {{ color: #2c3e50; text-align: center; }}
-                .section {{ background: white; margin: 20px 0; padding: 20px; border-radius: 10px; }}
-                .post {{ border-left: 4px solid #3498db; padding: 10px; margin: 10px 0; background: #f8f9fa; }}
-            </style>
-        </head>
-        <body>
-            <div class="container">
-                <h1>🏋️ Reddit Fitness Monitor Report</h1>
-                <div class="section">
-                    <h2>📊 Summary</h2>
-                    <p><strong>Report Date:</strong> {report_date}</p>
-                    <p><strong>Posts Found:</strong> {len(posts)}</p>
-                    <p><strong>Subreddits Monitored:</strong> {', '.join(self.subreddits)}</p>
-                </div>
-                
-                <div class="section">
-                    <h2>🎯 Target Competitor Mentions</h2>
+        The current keywords and competitors are matched against the stored
+        text, so the result is what a crawl would have found, and patterns
+        added since the posts were fetched apply to them too.
         """
+        cutoff_utc = (datetime.now() - timedelta(days=days_back)).timestamp()
+        scanned = 0
         
-        if competitor_counts:
-            for comp, count in sorted(competitor_counts.items(), key=lambda x: x[1], reverse=True):
-                html += f"<p><strong>{comp}:</strong> {count} mentions</p>"
-        else:
-            html += "<p>No competitor mentions found this week.</p>"
+        def listing_posts():
+            nonlocal scanned
+            for post_data in self.post_index.posts(since_utc=cutoff_utc, subreddits=self.subreddits):
+                scanned += 1
+                yield post_data
         
-        html += """
-                </div>
-                
-                <div class="section">
-                    <h2>📝 Top Keywords</h2>
-        """
+        # The index holds whatever was fetched; nothing before a subreddit's oldest post
+        oldest = self.post_index.oldest(self.subreddits).values()
+        self.covered_since = max(max(oldest, default=cutoff_utc), cutoff_utc)
+        print(f"Searching the index for posts from the last {days_back} days in {len(self.subreddits)} subreddits...")
+        # Reading rows out of SQLite is interleaved with matching and timed with it
+        with self.metrics.stage('match'):
+            posts = list(self.match_stage.match(listing_posts()))
+        self.metrics.count('posts_scanned', scanned)
+        self.metrics.count('posts_matched', len(posts))
+        print(f"\n📊 Total posts found: {len(posts)} (of {scanned} indexed)")
+        self.report_sentiment()
+        return posts
+    
+    def run_query(self, terms, start_date=None, end_date=None, top=10):
+        """Print counts and top posts for each term or phrase in the full-text index"""
+        since_utc = start_date.timestamp() if start_date else None
+        until_utc = end_date.timestamp() if end_date else None
+        window = f"{start_date.date() if start_date else 'start'} to {end_date.date() if end_date else 'now'}"
+        print(f"\n🔎 Querying {self.post_index.post_count()} indexed posts ({window})")
+        print("=" * 60)
+        for term in terms:
+            result = self.post_index.query(term, since_utc, until_utc, top=top)
+            print(f"\n\"{term}\": {result.count} posts in {len(result.by_subreddit)} subreddits "
+                  f"({result.elapsed * 1000:.1f} ms)")
+            if not result.count:
+                continue
+            print("  By subreddit: " + ", ".join(f"r/{name} {count}" for name, count in result.by_subreddit.items()))
+            print("  By day: " + ", ".join(f"{day} {count}" for day, count in result.by_day.items()))
+            print("  Top posts:")
+            for post in result.top_posts:
+                print(f"    ⬆️ {post['score']} 💬 {post['num_comments']}  r/{post['subreddit']}: "
+                      f"{post['title'][:80]}\n      {post['permalink']}")
+    
+    def add_comment_matches(self, subreddit_name, listing_posts, matched_posts):
+        """Fetch comment trees for the busiest threads and roll their hits into the posts"""
+        # Candidates are the most-commented recent posts, matched or not
+        candidates = sorted((p for p in listing_posts if p.get('num_comments')),
+                            key=lambda p: p['num_comments'], reverse=True)[:self.comment_posts]
+        if not candidates:
+            return matched_posts
         
-        for keyword, count in sorted(keyword_counts.items(), key=lambda x: x[1], reverse=True)[:10]:
-            html += f"<p><strong>{keyword}:</strong> {count} mentions</p>"
+        # The byte budget is shared by every subreddit in the run
+        budget = None
+        if self.comment_budget_kb:
+            budget = self.comment_budget_kb * 1024 - sum(s['bytes'] for s in self.comment_stats.values())
+            if budget <= 0:
+                print(f"  r/{subreddit_name}: 💬 comment budget spent, skipping comments")
+                return matched_posts
+        with self.metrics.stage('comments'):
+            fetches = asyncio.run(self.fetcher.fetch_comments_async(
+                [p['id'] for p in candidates], self.comment_depth, self.comment_limit, budget))
         
-        html += """
-                </div>
-                
-                <div class="section">
-                    <h2>🔥 Sample Posts</h2>
+        by_id = {post['id']: post for post in matched_posts}
+        added = []
+        comment_hits = 0
+        for post_data, fetch in zip(candidates, fetches):
+            self.comment_stats[post_fullname(post_data)] = {'requests': fetch.requests, 'bytes': fetch.bytes,
+                                                     'comments': len(fetch.comments),
+                                                     'truncated': fetch.truncated, 'error': fetch.error}
+            keyword_ids, competitor_ids = [], []
+            for body in fetch.comments:
+                comment_keywords, comment_competitors = self.matcher.match_ids(body.lower())
+                keyword_ids.extend(comment_keywords)
+                competitor_ids.extend(comment_competitors)
+            if not (keyword_ids or competitor_ids):
+                continue
+            comment_hits += len(keyword_ids) + len(competitor_ids)
+            
+            record = by_id.get(post_fullname(post_data))
+            if record is None:
+                # Thread only matched through its comments
+                record = PostRecord.from_listing(post_data, subreddit_name, (), (), self.matcher,
+                                                 signatures=self.dedup)
+                added.append(record)
+            record.comment_keyword_ids = tuple(keyword_ids)
+            record.comment_competitor_ids = tuple(competitor_ids)
+        
+        spent = sum(fetch.bytes for fetch in fetches)
+        fetched = sum(1 for fetch in fetches if fetch.requests)
+        self.metrics.count('comment_requests', sum(fetch.requests for fetch in fetches))
+        self.metrics.count('comment_retries', sum(fetch.retries for fetch in fetches))
+        self.metrics.count('comment_bytes', spent)
+        self.metrics.count('comments_scanned', sum(len(fetch.comments) for fetch in fetches))
+        print(f"  r/{subreddit_name}: 💬 {sum(len(f.comments) for f in fetches)} comments from "
+              f"{fetched} threads, {comment_hits} hits ({spent / 1024:.1f} KB)")
+        return matched_posts + added
+
+    def record_incremental(self, result, posts):
+        """Persist new matches and advance the high-water mark; return only unseen posts"""
+        store = self.state_store
+        seen = store.seen_ids(post['id'] for post in posts)
+        new_posts = [post for post in posts if post['id'] not in seen]
+        store.add_matches(new_posts)
+        
+        # Stored matches are complete from the first complete fetch's cutoff on, as long as each
+        # later fetch pages back to the previous mark. One whose cutoff is newer than that mark
+        # leaves a gap, so coverage restarts at its cutoff; an incomplete one changes nothing
+        # unless there is no earlier history at all.
+        mark = store.get_high_water(result.subreddit_name)
+        if result.complete and result.since_utc is not None:
+            if mark is None or mark[1] < result.since_utc:
+                store.set_coverage(result.subreddit_name, result.since_utc)
+        elif mark is None:
+            store.set_coverage(result.subreddit_name, result.covered_since())
+        
+        # Only move the mark after a complete fetch. After a failed page, or when
+        # paging stopped at max_pages, the posts between the old mark and the oldest
+        # one fetched were never seen; the next run pages back down to the old mark.
+        # Without an old mark there is nothing to page back to (a first fetch of a long
+        # window can always stop at max_pages), so the gap is left to the coverage.
+        newest = result.newest
+        if newest is not None and (result.complete or (mark is None and result.ok)):
+            store.set_high_water(result.subreddit_name, post_fullname(newest), newest['created_utc'])
+        return new_posts
+
+    def stored_coverage(self):
+        """Time from which the state store's matches are complete for every monitored subreddit"""
+        return max(self.state_store.get_coverage(self.subreddits).values(), default=None)
+
+    def load_stored_posts(self, days_back=7):
+        """Load matched posts for the report window from the state store"""
+        cutoff_utc = (datetime.now() - timedelta(days=days_back)).timestamp()
+        return self.state_store.matches_since(cutoff_utc, set(self.subreddits))
+    
+    def deduplicate(self, posts, deduplicator=None):
+        """Group crossposts and (near-)duplicate reposts into discussions; returns posts oldest first"""
+        deduplicator = deduplicator or Deduplicator()
+        with self.metrics.stage('dedup'):
+            posts = deduplicator.assign_all(posts)
+        self.report_duplicates(deduplicator)
+        return posts
+
+    def report_duplicates(self, deduplicator):
+        self.metrics.count('unique_discussions', deduplicator.discussions)
+        self.metrics.count('duplicate_crossposts', deduplicator.crossposts)
+        self.metrics.count('duplicate_exact', deduplicator.exact_duplicates)
+        self.metrics.count('duplicate_near', deduplicator.near_duplicates)
+        if deduplicator.duplicates:
+            print(f"🔁 {deduplicator.duplicates} duplicates ({deduplicator.crossposts} crossposts, "
+                  f"{deduplicator.exact_duplicates} reposts, {deduplicator.near_duplicates} near-duplicates): "
+                  f"{deduplicator.discussions} unique discussions")
+
+    def recent_activity(self, hours=24):
+        """Hourly rollups of the last `hours` from the state store, or None if there are none"""
+        if not self.state_store:
+            return None
+        since_utc = (int(time.time()) // 3600 - hours + 1) * 3600
+        rows = self.state_store.rollups('hour', since_utc, set(self.subreddits))
+        return RollupView(rows, 'hour') if rows else None
+
+    @property
+    def report_days(self):
+        """Days of posts a report needs: its longest window"""
+        return self.report_windows[-1]
+    
+    def window_stats(self, stats):
+        """Per-window counts of a MatchColumns for a multi-window report, or None for a single window"""
+        if len(self.report_windows) < 2:
+            return None
+        with self.metrics.stage('aggregate'):
+            return WindowStats(stats, self.report_windows, covered_since=self.covered_since)
+    
+    def render_report(self, posts, profile=None, recent=None, windows=None):
+        """Render the HTML report (from posts or a MatchColumns aggregate) as an iterator of chunks
+        
+        With a watchlist `profile`, `posts` must already be that profile's selection.
+        `recent` adds a section from the daemon's hourly rollups (a RollupView), and
+        `windows` (a WindowStats of the same posts) adds trends over several windows.
         """
+        report_date = datetime.now().strftime("%Y-%m-%d")
+        matcher = profile.matcher if profile else self.matcher
+        stats = posts if isinstance(posts, MatchColumns) else MatchColumns.from_posts(posts, matcher)
+        if profile:
+            return self.renderer.render(stats, report_date, profile.subreddits, watchlist=profile.name,
+                                        windows=windows)
+        return self.renderer.render(stats, report_date, self.subreddits, recent=recent, windows=windows)
+
+    def profile_stats(self, posts):
+        """Aggregate each watchlist profile's share of `posts` (matched with the combined index)"""
+        with self.metrics.stage('aggregate'):
+            return {profile.name: MatchColumns.from_posts(self.profile_index.select(profile, posts),
+                                                          profile.matcher)
+                    for profile in self.profile_index.profiles}
+
+    def report_profiles(self, stats_by_profile, subject='Reddit Fitness Report', windowed=True):
+        """Save and send one report per watchlist profile
         
-        # Show top posts by engagement
-        top_posts = sorted(posts, key=lambda x: x['score'] + x['num_comments'], reverse=True)[:10]
-        
-        for post in top_posts:
-            matches = ', '.join(post['matched_keywords'] + post['matched_competitors'])
-            html += f"""
-                <div class="post">
-                    <h4><a href="{post['permalink']}" target="_blank">{post['title']}</a></h4>
-                    <p>r/{post['subreddit']} | ⬆️ {post['score']} | 💬 {post['num_comments']}</p>
-                    <p><strong>Matches:</strong> {matches}</p>
-                </div>
-            """
-        
-        html += f"""
-                </div>
-            </div>
-        </body>
-        </html>
+        A profile without its own recipients goes to EMAIL_TO. With `windowed`,
+        multi-window reports get their trends.
         """
+        report_date = datetime.now().strftime('%Y-%m-%d')
+        for profile in self.profile_index.profiles:
+            stats = stats_by_profile[profile.name]
+            print(f"\n📄 Generating report for watchlist '{profile.name}' ({len(stats)} posts)...")
+            filename = f"reddit_fitness_report_{report_date}_{profile.slug}.html"
+            windows = self.window_stats(stats) if windowed else None
+            self.deliver_report(self.render_report(stats, profile, windows=windows),
+                                f"{subject} - {profile.name} - {report_date}", profile.recipients or None,
+                                filename)
+
+    def generate_simple_report(self, posts, recent=None):
+        """Generate a simple HTML report"""
+        stats = posts if isinstance(posts, MatchColumns) else MatchColumns.from_posts(posts, self.matcher)
+        return ''.join(self.render_report(stats, recent=recent, windows=self.window_stats(stats)))
+
+    def deliver_report(self, html_report, subject=None, recipients=None, filename=None):
+        """Render the report (an iterator of chunks) once, streaming it to a local file, then email it
         
-        return html
+        The email body is read back from the saved file, and only when email is configured.
+        """
+        filename = self.save_report_locally(html_report, filename)
+        if filename is None:
+            print("⚠️  Report was not saved, skipping email")
+            return False
+        return self.send_email_report(self._read_report(filename), subject, recipients)
+    
+    @staticmethod
+    def _read_report(filename, chunk_size=1 << 16):
+        """Yield a saved report back in chunks"""
+        with open(filename, encoding='utf-8') as f:
+            yield from iter(lambda: f.read(chunk_size), '')
 
-    def save_report_locally(self, html_report):
-        """Save the report to a local HTML file"""
-        filename = f"reddit_fitness_report_{datetime.now().strftime('%Y-%m-%d')}.html"
+    def save_report_locally(self, html_report, filename=None):
+        """Save the report (a string or an iterator of chunks) to a local HTML file"""
+        filename = filename or f"reddit_fitness_report_{datetime.now().strftime('%Y-%m-%d')}.html"
         
         try:
-            with open(filename, 'w', encoding='utf-8') as f:
-                f.write(html_report)
+            # Chunks are rendered as they are written, so this times rendering too
+            with self.metrics.stage('render'), open(filename, 'w', encoding='utf-8') as f:
+                if isinstance(html_report, str):
+                    f.write(html_report)
+                else:
+                    # Stream chunks straight to disk
+                    for chunk in html_report:
+                        f.write(chunk)
             print(f"✅ Report saved as: {filename}")
             return filename
         except Exception as e:
             print(f"❌ Error saving report: {e}")
             return None
     
-    def send_email_report(self, html_report, subject=None):
-        """Send the HTML report via email"""
+    def send_email_report(self, html_report, subject=None, recipients=None):
+        """Send the HTML report (a string or an iterator of chunks) via email
         
+        Goes to `recipients`, or to every address in the comma-separated EMAIL_TO.
+        """
         # Email configuration from environment variables
         email_from = os.getenv('EMAIL_FROM')
         email_password = os.getenv('EMAIL_PASSWORD')
         email_to = os.getenv('EMAIL_TO')
-        smtp_server = os.getenv('SMTP_SERVER', 'smtp.office365.com')
-        smtp_port = int(os.getenv('SMTP_PORT', '587'))
         
-        if not all([email_from, email_password, email_to]):
+        if not all([email_from, email_password, recipients or email_to]):
             print("⚠️  Email credentials not configured, skipping email")
             return False
         
+        # Imported here so runs that never send email don't pay for smtplib
+        from email_delivery import parse_recipients
+        recipients = recipients or parse_recipients(email_to)
+        
         try:
-            # Create message
-            msg = MIMEMultipart('alternative')
-            msg['Subject'] = subject or f"Reddit Fitness Report - {datetime.now().strftime('%Y-%m-%d')}"
-            msg['From'] = email_from
-            msg['To'] = email_to
+            subject = subject or f"Reddit Fitness Report - {datetime.now().strftime('%Y-%m-%d')}"
             
-            # Add HTML content
-            html_part = MIMEText(html_report, 'html')
-            msg.attach(html_part)
+            # The MIME body is built once per report, so it has to be materialised in one piece
+            if not isinstance(html_report, str):
+                with self.metrics.stage('render'):
+                    html_report = ''.join(html_report)
             
             # Send email
-            print(f"📧 Sending email report to {email_to}...")
+            shown = ', '.join(recipients) if len(recipients) <= 3 else f"{len(recipients)} recipients"
+            print(f"📧 Sending email report to {shown}...")
             
-            with smtplib.SMTP(smtp_server, smtp_port) as server:
-                server.starttls()  # Enable encryption
-                server.login(email_from, email_password)
-                server.send_message(msg)
+            opened = self.mailer.connections_opened
+            with self.metrics.stage('email'):
+                result = self.mailer.send(html_report, subject, recipients)
+            self.metrics.count('emails_sent', len(result.delivered))
+            self.metrics.count('email_errors', len(result.failed))
+            self.metrics.count('email_retries', result.retries)
+            self.metrics.count('smtp_connections', self.mailer.connections_opened - opened)
             
+            for recipient, error in result.failed.items():
+                print(f"❌ Error sending email to {recipient}: {error}")
+            if not result.ok:
+                return False
             print("✅ Email sent successfully!")
             return True
             
         except Exception as e:
             print(f"❌ Error sending email: {e}")
+            self.metrics.count('email_errors')
             return False
     
-    def run_report(self):
+    def send_alert(self, spike):
+        """Log a spike and deliver it to the configured webhook and email recipients"""
+        print(f"🚨 Spike - {spike.describe()}")
+        self.metrics.count('alerts')
+        if self.alert_webhook:
+            from spike_alerts import send_webhook
+            
+            try:
+                send_webhook(self.alert_webhook, spike)
+            except Exception as e:
+                print(f"❌ Error posting alert to webhook: {e}")
+                self.metrics.count('alert_errors')
+        if self.alert_email:
+            self.send_email_report(self.renderer.render_alert(spike),
+                                   f"Reddit Fitness Alert - {spike.display_name} spike - "
+                                   f"{datetime.now().strftime('%Y-%m-%d %H:%M')}")
+    
+    def dataset_writer(self):
+        """A DatasetWriter appending to the export directory, or None when not exporting"""
+        if not self.export_dir:
+            return None
+        from dataset_export import DatasetWriter
+        return DatasetWriter(self.export_dir, self.export_format)
+
+    def export_dataset(self, posts, stats_by_watchlist, writer=None):
+        """Append matched posts and each report's aggregates ({watchlist: MatchColumns}) to the export
+        
+        `writer` is one that posts were already streamed into, as backfills do.
+        """
+        writer = writer or self.dataset_writer()
+        try:
+            with self.metrics.stage('export'):
+                writer.add_all(posts)
+                for watchlist, stats in stats_by_watchlist.items():
+                    writer.add_aggregates(stats, watchlist)
+                writer.close()
+        except Exception as e:
+            writer.abort()
+            print(f"❌ Error exporting dataset: {e}")
+            self.metrics.count('export_errors')
+            return False
+        self.metrics.count('posts_exported', writer.posts.rows)
+        self.metrics.count('posts_already_exported', writer.skipped)
+        print(f"🧮 Exported {writer.posts.rows} new posts ({writer.skipped} exported before) and "
+              f"{writer.aggregates.rows} aggregate rows to {self.export_dir} ({writer.format}, "
+              f"{len(writer.paths)} files)")
+        return True
+
+    def write_metrics(self, verbose=True):
+        """Write the run summary as JSON (and a Prometheus textfile if configured)
+        
+        A finished run is also appended to the metrics history, if one is
+        configured; the daemon's periodic snapshots of a run still going are not.
+        """
+        path = self.metrics_path or f"reddit_fitness_report_{datetime.now().strftime('%Y-%m-%d')}_metrics.json"
+        
+        if self.sentiment:
+            self.metrics.gauge('sentiment_scored', self.sentiment.scored)
+            self.metrics.gauge('sentiment_cache_hits', self.sentiment.cache_hits)
+        try:
+            self.metrics.write_json(path)
+            if verbose:
+                print(f"📈 Run metrics saved as: {path}")
+            if self.prometheus_path:
+                self.metrics.write_prometheus(self.prometheus_path)
+                if verbose:
+                    print(f"📈 Prometheus metrics written to: {self.prometheus_path}")
+            if self.metrics_history and self.metrics.finished is not None:
+                self.metrics.append_jsonl(self.metrics_history)
+                if verbose:
+                    print(f"📈 Run appended to metrics history: {self.metrics_history}")
+        except Exception as e:
+            print(f"❌ Error saving run metrics: {e}")
+    
+    def close(self):
+        """Log out of SMTP, stop match workers and release HTTP and database connections"""
+        if self._mailer is not None:
+            self._mailer.close()
+        self.match_stage.close()
+        self.fetcher.close()
+        if self.state_store:
+            self.state_store.close()
+        if self.post_index:
+            self.post_index.close()
+        if self.sentiment:
+            self.sentiment.cache.close()
+
+    def run_report(self, from_index=False):
         """Execute the report process"""
         print(f"\n🚀 Starting Simple Reddit Monitor at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         print("=" * 60)
         
+        self.metrics = RunMetrics('report')
+        self.metrics.count('patterns', len(self.keywords) + len(self.competitor_brands))
         try:
-            # Validate configuration
-            self.validate_config()
+            if from_index:
+                # Everything comes from the local index; Reddit is never contacted
+                posts = self.search_index(days_back=self.report_days)
+            else:
+                # Validate configuration
+                self.validate_config()
+                
+                # Search Reddit
+                posts = self.search_reddit_posts(days_back=self.report_days)
+            
+            # Incremental runs report on everything stored for the window, not just this run's finds
+            if self.state_store and not from_index:
+                with self.metrics.stage('state'):
+                    posts = self.load_stored_posts(days_back=self.report_days)
+                print(f"🗄️  {len(posts)} matched posts in the state store for the last {self.report_days} days")
+            
+            if self.dedup:
+                posts = self.deduplicate(posts)
+            
+            if self.profile_index:
+                # Every watchlist gets its own report from the one crawl
+                stats_by_profile = self.profile_stats(posts)
+                self.report_profiles(stats_by_profile)
+                if self.export_dir:
+                    self.export_dataset(posts, stats_by_profile)
+                self.metrics.finish()
+                print(f"\n🎉 Report completed successfully!")
+                print("=" * 60)
+                return
             
-            # Search Reddit
-            posts = self.search_reddit_posts(days_back=7)
             if not posts:
                 print("⚠️  No relevant posts found this week")
                 # Still generate and send empty report
-                html_report = self.generate_simple_report([])
-                self.save_report_locally(html_report)
-                self.send_email_report(html_report, "Reddit Fitness Report - No Posts Found")
+                self.deliver_report(self.render_report([]), "Reddit Fitness Report - No Posts Found")
+                self.metrics.finish()
                 return
             
-            # Generate Report
+            # Generate the report, save it locally and email it
             print("\n📄 Generating report...")
-            html_report = self.generate_simple_report(posts)
+            with self.metrics.stage('aggregate'):
+                stats = MatchColumns.from_posts(posts, self.matcher)
+            windows = self.window_stats(stats)
+            # Hourly rollups are there when a daemon has been filling the same state store
+            recent = self.recent_activity()
+            self.deliver_report(self.render_report(stats, recent=recent, windows=windows))
             
-            # Save Report Locally
-            self.save_report_locally(html_report)
-            
-            # Send Email Report
-            self.send_email_report(html_report)
+            if self.export_dir:
+                self.export_dataset(posts, {'': stats})
             
+            self.metrics.finish()
             print(f"\n🎉 Report completed successfully!")
             print("=" * 60)
             
         except Exception as e:
+            self.metrics.finish('failed')
             print(f"❌ Error during report generation: {e}")
             raise
+        finally:
+            self.write_metrics()
+
+    def run_backfill(self, paths, start_date=None, end_date=None):
+        """Run the keyword/competitor analysis over archived submission dumps"""
+        print(f"\n📦 Starting backfill over {len(paths)} archive file(s) at {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        print("=" * 60)
+        
+        # zstandard comes with it; only backfills read archive dumps
+        from archive_source import ArchiveSource
+
+        source = ArchiveSource(
+            paths, self.subreddits,
+            start_utc=start_date.timestamp() if start_date else None,
+            end_utc=end_date.timestamp() if end_date else None,
+        )
+        
+        self.metrics = RunMetrics('backfill')
+        self.metrics.count('patterns', len(self.keywords) + len(self.competitor_brands))
+        # Matched posts stream into the export as they go by rather than being kept
+        writer = self.dataset_writer()
+        try:
+            # Only the report's top posts are kept as objects; everything else is columnar
+            stats = MatchColumns(self.matcher, keep_top=self.renderer.top_posts)
+            profiles = self.profile_index.profiles if self.profile_index else ()
+            stats_by_profile = {profile.name: MatchColumns(profile.matcher, keep_top=self.renderer.top_posts)
+                                for profile in profiles}
+            # Dumps are roughly chronological, so a rolling window catches reposts as they stream past
+            deduplicator = Deduplicator() if self.dedup else None
+            # Reading and decompressing the dumps is interleaved with matching and timed with it
+            with self.metrics.stage('match'):
+                for post in self.match_stage.match(source.lines()):
+                    if source.accepts(post):
+                        if deduplicator:
+                            deduplicator.assign(post)
+                        stats.add(post)
+                        if writer:
+                            writer.add(post)
+                        for profile in profiles:
+                            for record in self.profile_index.select(profile, (post,)):
+                                stats_by_profile[profile.name].add(record)
+            self.metrics.count('lines_read', source.lines_read)
+            self.metrics.count('bytes', source.bytes_read)
+            self.metrics.count('posts_scanned', source.lines_passed)
+            self.metrics.count('posts_matched', len(stats))
+            
+            print(f"  Read {source.lines_read} lines ({source.bytes_read / 1024 / 1024:.1f} MB), "
+                  f"{source.lines_passed} passed the subreddit/date filter")
+            print(f"\n📊 Total posts found: {len(stats)}")
+            if deduplicator:
+                self.report_duplicates(deduplicator)
+            self.report_sentiment()
+            
+            if self.profile_index:
+                # Trailing windows are relative to today, which means nothing for an archive
+                self.report_profiles(stats_by_profile, "Reddit Fitness Report - Backfill", windowed=False)
+            else:
+                print("\n📄 Generating report...")
+                self.deliver_report(self.render_report(stats), "Reddit Fitness Report - Backfill")
+            if writer:
+                self.export_dataset((), stats_by_profile or {'': stats}, writer)
+            self.metrics.finish()
+            print(f"\n🎉 Backfill completed successfully!")
+            print("=" * 60)
+        except Exception:
+            self.metrics.finish('failed')
+            if writer:
+                writer.abort()
+            raise
+        finally:
+            self.write_metrics()
+
+    def run_daemon(self, min_interval=60, max_interval=1800, report_every=7 * 86400, detector=None):
+        """Poll every subreddit until stopped, reporting every `report_every` seconds and on SIGUSR1
+        
+        With a SpikeDetector, every new match is checked for mention spikes as it arrives.
+        """
+        from daemon import MonitorDaemon, PollScheduler
+        
+        self.validate_config()
+        scheduler = PollScheduler(self.subreddits, min_interval, max_interval)
+        MonitorDaemon(self, scheduler, report_every=report_every, detector=detector).run()
+
+def report_windows(value):
+    """Parse a comma-separated list of report windows in days"""
+    try:
+        windows = [int(days) for days in value.split(',') if days.strip()]
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid report windows: {value!r}")
+    if not windows or min(windows) < 1:
+        raise argparse.ArgumentTypeError(f"report windows must be whole numbers of days: {value!r}")
+    return windows
+
 
 def main():
     """Main function"""
-    monitor = SimpleRedditMonitor()
-    monitor.run_report()
+    parser = argparse.ArgumentParser(description="Weekly Reddit fitness monitor")
+    parser.add_argument('--check-connection', action='store_true',
+                        help="check Reddit credentials with a user.me() probe and exit")
+    parser.add_argument('--async-fetch', action='store_true',
+                        help="fetch subreddits concurrently instead of one after another")
+    parser.add_argument('--concurrency', type=int, default=None,
+                        help="maximum concurrent requests in async mode (default: $REDDIT_CONCURRENCY or 4)")
+    parser.add_argument('--state-db', default=os.getenv('REDDIT_STATE_DB'),
+                        help="SQLite state file; enables incremental runs that only fetch new posts")
+    parser.add_argument('--cache-dir', default=os.getenv('REDDIT_CACHE_DIR'),
+                        help="cache Reddit responses on disk in this directory")
+    parser.add_argument('--cache-ttl', type=int, default=int(os.getenv('REDDIT_CACHE_TTL', '3600')),
+                        help="seconds before a cached response is revalidated (default: 3600)")
+    parser.add_argument('--replay', action='store_true',
+                        help="serve everything from the response cache and never touch the network")
+    parser.add_argument('--match-processes', type=int, default=0,
+                        help="match posts in a pool of N worker processes (default: 0, in-process)")
+    parser.add_argument('--comments', action='store_true',
+                        help="also fetch and match comment trees of the busiest recent threads")
+    parser.add_argument('--comment-posts', type=int, default=20,
+                        help="threads per subreddit to expand with --comments (default: 20)")
+    parser.add_argument('--comment-depth', type=int, default=3,
+                        help="maximum comment reply depth (default: 3)")
+    parser.add_argument('--comment-limit', type=int, default=200,
+                        help="maximum comments per thread (default: 200)")
+    parser.add_argument('--comment-budget-kb', type=int, default=None,
+                        help="stop starting new comment fetches once this many KB were downloaded")
+    parser.add_argument('--metrics-json', default=os.getenv('REDDIT_METRICS_JSON'),
+                        help="write the JSON run summary here (default: next to the HTML report)")
+    parser.add_argument('--metrics-prom', default=os.getenv('REDDIT_METRICS_PROM'),
+                        help="also write run metrics as a Prometheus node_exporter textfile")
+    parser.add_argument('--metrics-history', default=os.getenv('REDDIT_METRICS_HISTORY'),
+                        help="append every finished run's JSON summary to this JSON Lines file")
+    parser.add_argument('--profiles', default=os.getenv('REDDIT_PROFILES'),
+                        help="JSON or YAML watchlist profiles; one crawl, one report per profile")
+    parser.add_argument('--exact-brands', action='store_true',
+                        help="match competitor names only as written, without spelling variants or typos")
+    parser.add_argument('--no-dedup', action='store_true',
+                        help="count crossposts and reposts separately instead of as one discussion")
+    parser.add_argument('--sentiment', action='store_true',
+                        help="score the text around competitor mentions offline and break mentions down "
+                             "into positive, negative and neutral in the report")
+    parser.add_argument('--sentiment-cache', default=os.getenv('REDDIT_SENTIMENT_CACHE'),
+                        help="with --sentiment: SQLite file of scores kept across runs "
+                             "(default: reddit_monitor_sentiment.db)")
+    parser.add_argument('--sentiment-lexicon', default=os.getenv('REDDIT_SENTIMENT_LEXICON'),
+                        help="with --sentiment: VADER-style lexicon file (token<TAB>valence) "
+                             "to use instead of the built-in one")
+    parser.add_argument('--export-dir', default=os.getenv('REDDIT_EXPORT_DIR'),
+                        help="also append matched posts and report aggregates to a date-partitioned "
+                             "columnar dataset in this directory")
+    parser.add_argument('--export-format', choices=('auto', 'parquet', 'arrow', 'csv'),
+                        default=os.getenv('REDDIT_EXPORT_FORMAT', 'auto'),
+                        help="with --export-dir: file format; auto is Parquet when pyarrow is installed, "
+                             "CSV otherwise (default: auto)")
+    parser.add_argument('--windows', type=report_windows,
+                        default=report_windows(os.getenv('REDDIT_REPORT_WINDOWS', '7')),
+                        help="comma-separated trailing report windows in days, e.g. 7,30,90; posts are gathered "
+                             "once for the longest and the report adds trends per window (default: 7)")
+    parser.add_argument('--subreddits', default=None,
+                        help="comma-separated subreddits to monitor instead of the built-in list")
+    parser.add_argument('--import', dest='import_paths', nargs='+', metavar='FILE',
+                        help="analyse Pushshift-style JSONL dumps (.jsonl, .gz or .zst) instead of crawling")
+    parser.add_argument('--since', type=lambda s: datetime.strptime(s, '%Y-%m-%d'),
+                        help="with --import or --query: only posts created on or after this date (YYYY-MM-DD)")
+    parser.add_argument('--until', type=lambda s: datetime.strptime(s, '%Y-%m-%d'),
+                        help="with --import or --query: only posts created before this date (YYYY-MM-DD)")
+    parser.add_argument('--index-db', default=os.getenv('REDDIT_INDEX_DB'),
+                        help="SQLite full-text index that every fetched post is added to, matched or not")
+    parser.add_argument('--query', dest='query_terms', action='append', metavar='TERM',
+                        help="print counts and top posts for a term or phrase (trailing * for a prefix) "
+                             "from --index-db and exit; repeatable")
+    parser.add_argument('--query-top', type=int, default=10,
+                        help="with --query: top posts to list per term (default: 10)")
+    parser.add_argument('--from-index', action='store_true',
+                        help="build the weekly report by matching the posts in --index-db instead of crawling")
+    parser.add_argument('--daemon', action='store_true',
+                        help="keep running: poll each subreddit on an adaptive interval and store matches "
+                             "as they arrive (state in --state-db, default reddit_monitor_state.db)")
+    parser.add_argument('--poll-min', type=float, default=60,
+                        help="with --daemon: shortest poll interval in seconds, for busy subreddits (default: 60)")
+    parser.add_argument('--poll-max', type=float, default=1800,
+                        help="with --daemon: longest poll interval in seconds, for quiet ones (default: 1800)")
+    parser.add_argument('--report-every', type=float, default=168,
+                        help="with --daemon: hours between reports, 0 for only on SIGUSR1 (default: 168)")
+    parser.add_argument('--alert-z', type=float, default=4.0,
+                        help="with --daemon: alert when an hour's mentions are this many standard deviations "
+                             "above the last week's (default: 4, 0 to disable)")
+    parser.add_argument('--alert-ratio', type=float, default=None,
+                        help="with --daemon: alert when an hour's mentions reach this multiple of the weekly mean")
+    parser.add_argument('--alert-min-count', type=int, default=5,
+                        help="with --daemon: never alert on fewer mentions than this in an hour (default: 5)")
+    parser.add_argument('--alert-webhook', default=os.getenv('REDDIT_ALERT_WEBHOOK'),
+                        help="POST spike alerts as JSON to this URL")
+    parser.add_argument('--alert-email', action='store_true',
+                        help="also email spike alerts to EMAIL_TO")
+    parser.add_argument('--no-alerts', action='store_true',
+                        help="with --daemon: don't check for mention spikes")
+    args = parser.parse_args()
+    if args.profiles and args.subreddits:
+        parser.error("--subreddits cannot be combined with --profiles (each profile lists its own)")
+    if args.daemon and args.import_paths:
+        parser.error("--daemon cannot be combined with --import")
+    if args.daemon and args.match_processes:
+        # A process pool per poll would cost more than the few posts each poll matches
+        parser.error("--daemon matches in-process; drop --match-processes")
+    if args.daemon and not args.no_alerts and not (args.alert_z or args.alert_ratio):
+        parser.error("set --alert-z or --alert-ratio, or turn spike checks off with --no-alerts")
+    if (args.query_terms or args.from_index) and not args.index_db:
+        parser.error("--query and --from-index need --index-db (or REDDIT_INDEX_DB)")
+    if args.from_index and (args.daemon or args.import_paths):
+        parser.error("--from-index cannot be combined with --daemon or --import")
+    if args.daemon and not args.state_db:
+        args.state_db = 'reddit_monitor_state.db'
+    
+    profiles = None
+    if args.profiles:
+        from watchlists import load_profiles
+        profiles = load_profiles(args.profiles)
+
+    monitor = SimpleRedditMonitor(async_fetch=args.async_fetch, concurrency=args.concurrency,
+                                  state_path=args.state_db, cache_dir=args.cache_dir,
+                                  cache_ttl=args.cache_ttl, replay=args.replay,
+                                  match_processes=args.match_processes, comments=args.comments,
+                                  comment_posts=args.comment_posts, comment_depth=args.comment_depth,
+                                  comment_limit=args.comment_limit,
+                                  comment_budget_kb=args.comment_budget_kb,
+                                  metrics_path=args.metrics_json, prometheus_path=args.metrics_prom,
+                                  metrics_history=args.metrics_history,
+                                  profiles=profiles, brand_variants=not args.exact_brands,
+                                  dedup=not args.no_dedup, alert_webhook=args.alert_webhook,
+                                  alert_email=args.alert_email, index_path=args.index_db,
+                                  sentiment=args.sentiment, sentiment_cache=args.sentiment_cache,
+                                  sentiment_lexicon=args.sentiment_lexicon, export_dir=args.export_dir,
+                                  export_format=args.export_format, report_windows=args.windows)
+    if args.check_connection:
+        raise SystemExit(0 if monitor.check_connection() else 1)
+    
+    if args.subreddits:
+        monitor.subreddits = [name.strip() for name in args.subreddits.split(',') if name.strip()]
+    
+    try:
+        if args.query_terms:
+            monitor.run_query(args.query_terms, args.since, args.until, args.query_top)
+        elif args.daemon:
+            detector = None
+            if not args.no_alerts:
+                from spike_alerts import SpikeDetector
+                
+                detector = SpikeDetector(z_threshold=args.alert_z or None, ratio_threshold=args.alert_ratio,
+                                         min_count=args.alert_min_count)
+            monitor.run_daemon(args.poll_min, args.poll_max, args.report_every * 3600, detector)
+        elif args.import_paths:
+            monitor.run_backfill(args.import_paths, args.since, args.until)
+        else:
+            monitor.run_report(from_index=args.from_index)
+    finally:
+        monitor.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,297 @@
+import heapq
+from datetime import datetime, timezone
+from html import escape
+
+# Templates are bound str.format methods built once at import; every
+# interpolated value is HTML-escaped by the caller
+HEAD = """
+        <!DOCTYPE html>
+        <html>
+        <head>
+            <title>Reddit Fitness Monitor - {report_date}</title>
+            <style>
+                body {{ font-family: Arial, sans-serif; margin: 40px; background-color: #f5f6fa; }}
+                .container {{ max-width: 1000px; margin: 0 auto; }}
+                h1 {{ color: #2c3e50; text-align: center; }}
+                .section {{ background: white; margin: 20px 0; padding: 20px; border-radius: 10px; }}
+                .post {{ border-left: 4px solid #3498db; padding: 10px; margin: 10px 0; background: #f8f9fa; }}
+                .trends th, .trends td {{ padding: 4px 12px; text-align: right; }}
+                .trends th:first-child, .trends td:first-child {{ text-align: left; }}
+            </style>
+        </head>
+        <body>
+            <div class="container">
+                <h1>🏋️ Reddit Fitness Monitor Report</h1>
+                <div class="section">
+                    <h2>📊 Summary</h2>
+                    <p><strong>Report Date:</strong> {report_date}</p>{watchlist}
+                    <p><strong>Posts Found:</strong> {post_count}</p>
+                    <p><strong>Subreddits Monitored:</strong> {subreddits}</p>
+                </div>
+        """.format
+
+SECTION_START = """
+                <div class="section">
+                    <h2>{heading}</h2>
+        """.format
+
+SECTION_END = """
+                </div>
+        """
+
+WATCHLIST_ROW = "\n                    <p><strong>Watchlist:</strong> {name}</p>".format
+
+COUNT_ROW = "<p><strong>{name}:</strong> {count} mentions</p>".format
+
+UNIQUE_COUNT_ROW = "<p><strong>{name}:</strong> {count} mentions in {unique} discussions</p>".format
+
+BREAKDOWN_ROW = "<p><strong>{label}:</strong> {values}</p>".format
+
+SENTIMENT_ROW = ("<p><strong>{name}:</strong> 👍 {positive} positive, 👎 {negative} negative, "
+                 "😐 {neutral} neutral (average {mean:+.2f})</p>").format
+
+TREND_TABLE_START = """
+                    <table class="trends">
+                        <tr><th></th>{headers}<th>Daily, last {days} days</th></tr>""".format
+
+TREND_HEADER = "<th>{days} days</th>".format
+
+TREND_PARTIAL_HEADER = '<th title="Posts were only fetched for the last {covered} days">{days} days*</th>'.format
+
+TREND_ROW = """
+                        <tr><td><strong>{name}</strong></td>{cells}<td>{sparkline}</td></tr>""".format
+
+TREND_CELL = "<td>{count}{change}</td>".format
+
+TREND_CHANGE = ' <small title="vs the {days} days before">{arrow} {change}</small>'.format
+
+TREND_TABLE_END = """
+                    </table>
+        """
+
+SPARKLINE = ('<svg xmlns="http://www.w3.org/2000/svg" width="{width}" height="{height}" '
+             'viewBox="0 0 {width} {height}"><polyline fill="none" stroke="#3498db" stroke-width="1.5" '
+             'points="{points}"/></svg>').format
+
+POST = """
+                <div class="post">
+                    <h4><a href="{permalink}" target="_blank">{title}</a></h4>
+                    <p>r/{subreddit} | ⬆️ {score} | 💬 {num_comments}</p>
+                    <p><strong>Matches:</strong> {matches}</p>
+                </div>
+            """.format
+
+ALERT = """
+        <!DOCTYPE html>
+        <html>
+        <body style="font-family: Arial, sans-serif; margin: 40px;">
+            <h2>🚨 {kind} spike: {name}</h2>
+            <p><strong>{count}</strong> mentions in the {minutes} minutes from {bucket_start} UTC.</p>
+            <p>Baseline: {mean:.1f} ± {std:.1f} per {minutes} minutes (z-score {z:.1f}, {ratio:.1f}x the mean).</p>
+        </body>
+        </html>
+        """.format
+
+FOOT = """
+            </div>
+        </body>
+        </html>
+        """
+
+
+def sparkline(values, width=120, height=24):
+    """A small inline SVG line chart of `values` (e.g. daily counts), scaled to their maximum"""
+    values = list(values) or [0]
+    if len(values) == 1:
+        values *= 2
+    peak = max(values) or 1
+    step = (width - 2) / (len(values) - 1)
+    points = ' '.join(f"{1 + i * step:.1f},{height - 1 - value / peak * (height - 2):.1f}"
+                      for i, value in enumerate(values))
+    return SPARKLINE(width=width, height=height, points=points)
+
+
+class ReportRenderer:
+    """Render the HTML report as a stream of chunks, one section (or post) at a time"""
+
+    def __init__(self, top_keywords=10, top_posts=10):
+        self.top_keywords = top_keywords
+        # None renders every post instead of a top-N sample
+        self.top_posts = top_posts
+
+    def render(self, stats, report_date, subreddits, watchlist=None, recent=None, windows=None):
+        """Yield the report as HTML chunks from a MatchColumns aggregate
+
+        `recent` is an optional RollupView of the daemon's latest buckets.
+        `windows` is an optional WindowStats of the same posts, which adds a
+        trends section and lists top posts per window.
+        """
+        keyword_counts = stats.keyword_counts()
+        competitor_counts = stats.competitor_counts()
+        # Crossposts and reposts count once per discussion
+        discussions = stats.discussion_count()
+        unique_competitors = stats.competitor_counts(unique=True) if discussions < len(stats) else competitor_counts
+        post_count = f"{len(stats)} ({discussions} unique discussions)" if discussions < len(stats) else len(stats)
+
+        yield HEAD(
+            report_date=escape(report_date),
+            watchlist=WATCHLIST_ROW(name=escape(watchlist)) if watchlist else '',
+            post_count=post_count,
+            subreddits=escape(', '.join(subreddits)),
+        )
+
+        yield SECTION_START(heading='🎯 Target Competitor Mentions')
+        if competitor_counts:
+            yield ''.join(
+                COUNT_ROW(name=escape(comp), count=count) if unique_competitors[comp] == count
+                else UNIQUE_COUNT_ROW(name=escape(comp), count=count, unique=unique_competitors[comp])
+                for comp, count in sorted(competitor_counts.items(), key=lambda x: x[1], reverse=True))
+        else:
+            yield "<p>No competitor mentions found this week.</p>"
+        yield SECTION_END
+
+        sentiment = stats.competitor_sentiment()
+        if sentiment:
+            yield SECTION_START(heading='💭 Competitor Sentiment')
+            yield ''.join(
+                SENTIMENT_ROW(name=escape(comp), **counts)
+                for comp, counts in sorted(sentiment.items(),
+                                           key=lambda x: x[1]['positive'] + x[1]['negative'] + x[1]['neutral'],
+                                           reverse=True))
+            yield SECTION_END
+
+        if windows:
+            yield from self.render_trends(windows)
+
+        yield SECTION_START(heading='📝 Top Keywords')
+        top_keywords = heapq.nlargest(self.top_keywords, keyword_counts.items(), key=lambda x: x[1])
+        yield ''.join(COUNT_ROW(name=escape(keyword), count=count)
+                      for keyword, count in top_keywords)
+        yield SECTION_END
+
+        comment_competitors = stats.competitor_counts(comments=True)
+        comment_keywords = stats.keyword_counts(comments=True)
+        if comment_competitors or comment_keywords:
+            yield SECTION_START(heading='💬 Comment Mentions')
+            yield ''.join(
+                COUNT_ROW(name=escape(comp), count=count)
+                for comp, count in sorted(comment_competitors.items(), key=lambda x: x[1], reverse=True))
+            yield ''.join(
+                COUNT_ROW(name=escape(keyword), count=count)
+                for keyword, count in heapq.nlargest(self.top_keywords, comment_keywords.items(), key=lambda x: x[1]))
+            yield SECTION_END
+
+        if len(stats):
+            yield SECTION_START(heading='📅 Activity Breakdown')
+            yield BREAKDOWN_ROW(label='By subreddit', values=escape(', '.join(
+                f"r/{name}: {count}" for name, count in stats.subreddit_counts().items())))
+            if not windows:
+                # With windows the trends' sparklines show the daily series instead
+                yield BREAKDOWN_ROW(label='By day', values=escape(', '.join(
+                    f"{day:%a %d %b}: {count}" for day, count in stats.daily_counts().items())))
+            yield SECTION_END
+
+        if recent:
+            yield from self.render_recent(recent)
+
+        if windows:
+            for window in windows.windows:
+                yield SECTION_START(heading=f'🔥 Top Posts, Last {window} Days')
+                for post in windows.top_posts(window, self.top_posts):
+                    yield self.render_post(post)
+                yield SECTION_END
+        else:
+            yield SECTION_START(heading='🔥 Sample Posts')
+            for post in stats.top_posts(self.top_posts):
+                yield self.render_post(post)
+            yield SECTION_END
+
+        yield FOOT
+
+    def render_trends(self, windows):
+        """Yield the trends section: counts per window with the change from the window before, and sparklines"""
+        yield SECTION_START(heading='📈 Trends')
+        # A window reaching back past the fetched data gets its count, marked, but no change
+        headers = ''.join(TREND_HEADER(days=window) if windows.covers(window)
+                          else TREND_PARTIAL_HEADER(days=window, covered=windows.covered_days)
+                          for window in windows.windows)
+        yield TREND_TABLE_START(headers=headers, days=windows.span)
+        yield TREND_ROW(name='Matched posts', sparkline=sparkline(windows.post_series()), cells=''.join(
+            self.render_trend_cell(windows.post_count(window),
+                                   windows.post_count(window, previous=True) if windows.has_previous(window) else None,
+                                   window)
+            for window in windows.windows))
+
+        counts = {window: windows.competitor_counts(window) for window in windows.windows}
+        previous = {window: windows.competitor_counts(window, previous=True)
+                    for window in windows.windows if windows.has_previous(window)}
+        longest = counts[windows.windows[-1]]
+        for name, series in sorted(windows.competitor_series().items(), key=lambda x: longest[x[0]], reverse=True):
+            yield TREND_ROW(name=escape(name), sparkline=sparkline(series), cells=''.join(
+                self.render_trend_cell(counts[window][name],
+                                       previous[window][name] if window in previous else None, window)
+                for window in windows.windows))
+        yield TREND_TABLE_END
+
+        for window in windows.windows:
+            top_keywords = heapq.nlargest(self.top_keywords, windows.keyword_counts(window).items(),
+                                          key=lambda x: x[1])
+            yield BREAKDOWN_ROW(label=f"Top keywords, last {window} days", values=escape(', '.join(
+                f"{keyword} ({count})" for keyword, count in top_keywords)) or 'none')
+        yield SECTION_END
+
+    @staticmethod
+    def render_trend_cell(count, previous, window):
+        """A window's count, followed by its change from the window before when that is known"""
+        if previous is None or not (count or previous):
+            return TREND_CELL(count=count, change='')
+        if not previous:
+            return TREND_CELL(count=count, change=TREND_CHANGE(days=window, arrow='▲', change='new'))
+        change = (count - previous) / previous
+        arrow = '▲' if change > 0 else '▼' if change < 0 else '▶'
+        return TREND_CELL(count=count, change=TREND_CHANGE(days=window, arrow=arrow, change=f"{change:+.0%}"))
+
+    @staticmethod
+    def render_recent(recent):
+        """Yield the recent-activity section from hourly or daily rollups"""
+        bucket_format = '%H:00' if recent.period == 'hour' else '%a %d %b'
+        yield SECTION_START(heading='⏱️ Recent Activity')
+        yield BREAKDOWN_ROW(label=f"Matched posts by {recent.period} (UTC)", values=escape(', '.join(
+            f"{recent.bucket_time(bucket):{bucket_format}}: {count}"
+            for bucket, count in recent.totals('posts').items())))
+        posts = sum(recent.totals('posts').values())
+        discussions = sum(recent.totals('discussions').values())
+        if discussions < posts:
+            yield BREAKDOWN_ROW(label='Unique discussions', values=discussions)
+        competitors = recent.name_counts('competitor')
+        if competitors:
+            yield BREAKDOWN_ROW(label='Competitor mentions', values=escape(', '.join(
+                f"{name.title()}: {count}"
+                for name, count in sorted(competitors.items(), key=lambda x: x[1], reverse=True))))
+        yield SECTION_END
+
+    @staticmethod
+    def render_alert(spike):
+        """Render a Spike as a short standalone HTML email"""
+        return ALERT(
+            kind=escape(spike.kind.title()),
+            name=escape(spike.display_name),
+            count=spike.count,
+            minutes=spike.bucket_seconds // 60,
+            bucket_start=f"{datetime.fromtimestamp(spike.bucket_start, timezone.utc):%Y-%m-%d %H:%M}",
+            mean=spike.mean,
+            std=spike.std,
+            z=spike.z,
+            ratio=spike.ratio,
+        )
+
+    @staticmethod
+    def render_post(post):
+        return POST(
+            permalink=escape(post['permalink']),
+            title=escape(post['title']),
+            subreddit=escape(post['subreddit']),
+            score=post['score'],
+            num_comments=post['num_comments'],
+            matches=escape(', '.join(post['matched_keywords'] + post['matched_competitors'])),
+        )
@@ -0,0 +1,143 @@
+import json
+import os
+import time
+from contextlib import contextmanager
+
+METRIC_PREFIX = 'reddit_monitor'
+
+# Sentinel for RunMetrics.timed
+_DONE = object()
+
+
+class RunMetrics:
+    """Stage timers and counters for one run, exported as JSON or Prometheus text
+
+    `stage` times a block and adds it to that stage's total, so stages that run
+    in several pieces (matching per subreddit, rendering for disk and email)
+    accumulate. Per-subreddit fetch details are kept separately.
+    """
+
+    def __init__(self, mode='report'):
+        self.mode = mode
+        self.started = time.time()
+        self.finished = None
+        self.status = 'running'
+        self.stages = {}
+        self.counters = {}
+        self.subreddits = {}
+
+    @contextmanager
+    def stage(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter() - start
+
+    def timed(self, name, iterable):
+        """Yield from `iterable`, charging the time spent producing each item to a stage"""
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name):
+                item = next(iterator, _DONE)
+            if item is _DONE:
+                return
+            yield item
+
+    def count(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def gauge(self, name, value):
+        """Set a counter outright, for values a long-running process tracks itself"""
+        self.counters[name] = value
+
+    def record_fetch(self, result):
+        """Keep latency, status and cost of one SubredditFetch"""
+        self.subreddits[result.subreddit_name] = {
+            'seconds': round(result.elapsed, 4),
+            'rate_limit_wait_seconds': round(result.waited, 4),
+            'retries': result.retries,
+            'status': result.status,
+            'pages': result.pages,
+            'bytes': result.bytes,
+            'posts': len(result.posts),
+            'error': result.error,
+            'truncated': result.truncated,
+        }
+        self.count('pages', result.pages)
+        self.count('bytes', result.bytes)
+        self.count('posts_fetched', len(result.posts))
+        self.count('rate_limit_wait_seconds', result.waited)
+        self.count('retries', result.retries)
+        if not result.ok:
+            self.count('fetch_errors')
+        if result.truncated:
+            self.count('fetch_truncated')
+
+    def finish(self, status='ok'):
+        self.finished = time.time()
+        self.status = status
+
+    def summary(self):
+        finished = self.finished or time.time()
+        summary = {
+            'mode': self.mode,
+            'status': self.status,
+            'started': self.started,
+            'duration_seconds': round(finished - self.started, 4),
+            'stages': {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            'counters': {name: round(value, 4) if isinstance(value, float) else value
+                         for name, value in self.counters.items()},
+            'subreddits': self.subreddits,
+        }
+        match_seconds = self.stages.get('match')
+        if match_seconds:
+            summary['match_posts_per_second'] = round(self.counters.get('posts_scanned', 0) / match_seconds, 1)
+        return summary
+
+    def write_json(self, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.summary(), f, indent=2)
+        return path
+
+    def append_jsonl(self, path):
+        """Append the summary as one line of a JSON Lines history, so runs can be compared over time"""
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.summary(), separators=(',', ':')) + '\n')
+        return path
+
+    def prometheus_lines(self, prefix=METRIC_PREFIX):
+        summary = self.summary()
+        labels = f'mode="{self.mode}"'
+        lines = [
+            f"# TYPE {prefix}_last_run_timestamp_seconds gauge",
+            f"{prefix}_last_run_timestamp_seconds{{{labels}}} {self.started:.0f}",
+            f"# TYPE {prefix}_run_success gauge",
+            f"{prefix}_run_success{{{labels}}} {int(self.status == 'ok')}",
+            f"# TYPE {prefix}_run_duration_seconds gauge",
+            f"{prefix}_run_duration_seconds{{{labels}}} {summary['duration_seconds']}",
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        lines += [f'{prefix}_stage_seconds{{{labels},stage="{name}"}} {seconds}'
+                  for name, seconds in summary['stages'].items()]
+        for name, value in summary['counters'].items():
+            lines += [f"# TYPE {prefix}_{name} gauge", f"{prefix}_{name}{{{labels}}} {value}"]
+
+        for field in ('seconds', 'rate_limit_wait_seconds', 'retries', 'pages', 'bytes', 'posts', 'status'):
+            metric = f"{prefix}_subreddit_fetch_{field}"
+            lines.append(f"# TYPE {metric} gauge")
+            for name, fetch in self.subreddits.items():
+                lines.append(f'{metric}{{{labels},subreddit="{_label(name)}"}} {fetch[field] or 0}')
+        return lines
+
+    def write_prometheus(self, path, prefix=METRIC_PREFIX):
+        """Write a node_exporter textfile, replacing it atomically so scrapes never see half a file"""
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            f.write('\n'.join(self.prometheus_lines(prefix)) + '\n')
+        os.replace(tmp_path, path)
+        return path
+
+
+def _label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
@@ -0,0 +1,321 @@
+import hashlib
+import math
+import sqlite3
+import string
+from itertools import repeat
+
+from lazy_import import optional_module
+
+# NumPy, imported on first use; None selects the pure-Python fallback
+np = optional_module('numpy')
+
+# Characters of context kept either side of a competitor mention
+WINDOW_CHARS = 80
+# Compound scores at or beyond these count as positive or negative
+POSITIVE_THRESHOLD = 0.05
+NEGATIVE_THRESHOLD = -0.05
+LABELS = ('negative', 'neutral', 'positive')
+
+# A negation within this many words before a sentiment word flips (and damps) it
+NEGATION_SCOPE = 3
+NEGATION_SCALAR = -0.74
+# Squashes the summed valence into (-1, 1), as VADER's compound score does
+NORMALIZATION_ALPHA = 15
+
+# Tokens for a break (a sentence end, or between mentions) and, in a batch, the end of a window
+BREAK_TOKEN, WINDOW_END_TOKEN = '\x01', '\x00'
+# Sentence ends and newlines become breaks, other punctuation but apostrophes separates words;
+# a one-to-one table keeps translate on its fast path
+_SEPARATORS = str.maketrans({**dict.fromkeys(string.punctuation.replace("'", ''), ' '),
+                             **dict.fromkeys('.!?;\n', BREAK_TOKEN)})
+BREAK, WINDOW_END = 1, 2
+
+# Valence on VADER's -4..4 scale: general sentiment words plus the ways people
+# praise and complain about supplements, their taste and their side effects
+DEFAULT_LEXICON = {
+    # Praise
+    'love': 3.2, 'loved': 2.9, 'loving': 2.9, 'loves': 2.7, 'like': 1.5, 'liked': 1.8, 'likes': 1.8,
+    'great': 3.1, 'good': 1.9, 'awesome': 3.1, 'amazing': 2.8, 'excellent': 2.7, 'fantastic': 2.6,
+    'perfect': 2.7, 'best': 3.2, 'better': 1.9, 'favorite': 2.0, 'favourite': 2.0, 'solid': 1.6,
+    'nice': 1.8, 'recommend': 1.5, 'recommended': 1.5, 'happy': 2.7, 'impressed': 2.2, 'worth': 0.9,
+    'effective': 2.1, 'works': 1.2, 'worked': 1.2, 'quality': 1.4, 'legit': 1.6, 'reliable': 1.7,
+    'tasty': 2.1, 'delicious': 2.7, 'yummy': 2.4, 'smooth': 1.3, 'mixes': 0.8, 'clean': 1.7,
+    'affordable': 1.6, 'cheap': 0.8, 'bargain': 1.6, 'deal': 0.8, 'gains': 1.2, 'pump': 1.1,
+    'energized': 1.9, 'focused': 1.1, 'boost': 1.3, 'helped': 1.5, 'helps': 1.4, 'helpful': 1.8,
+    'fine': 0.8, 'decent': 1.0, 'enjoy': 2.2, 'enjoyed': 2.3, 'glad': 2.0, 'thanks': 1.9,
+    'superb': 3.1, 'brilliant': 2.8, 'top': 0.8, 'fast': 0.5, 'quick': 0.5, 'wow': 2.3,
+    # Complaints
+    'hate': -2.7, 'hated': -3.2, 'hates': -1.9, 'dislike': -1.6, 'bad': -2.5, 'worse': -2.1,
+    'worst': -3.1, 'awful': -2.0, 'terrible': -2.1, 'horrible': -2.5, 'poor': -2.1, 'meh': -0.6,
+    'disappointed': -1.9, 'disappointing': -2.2, 'disappointment': -2.3, 'useless': -1.8,
+    'waste': -1.8, 'wasted': -2.2, 'scam': -2.4, 'fake': -2.1, 'ripoff': -2.6, 'overpriced': -1.9,
+    'expensive': -0.9, 'pricey': -0.7, 'refund': -1.2, 'broken': -1.9, 'avoid': -1.2,
+    'gross': -2.1, 'disgusting': -2.4, 'nasty': -2.6, 'chalky': -1.5, 'clumpy': -1.4, 'clumps': -1.3,
+    'bitter': -1.2, 'artificial': -0.9, 'aftertaste': -1.1, 'bland': -1.0, 'watery': -0.8,
+    'bloated': -1.5, 'bloating': -1.5, 'nausea': -1.8, 'nauseous': -1.8, 'sick': -2.1,
+    'jitters': -1.4, 'jittery': -1.4, 'crash': -1.7, 'crashed': -1.6, 'headache': -1.8,
+    'headaches': -1.8, 'itchy': -1.0, 'tingles': -0.3, 'acne': -1.3, 'cramps': -1.4, 'cramping': -1.4,
+    'stomach': -0.4, 'diarrhea': -2.0, 'anxious': -1.0, 'insomnia': -1.4, 'recall': -1.5,
+    'contaminated': -2.4, 'underdosed': -1.8, 'proprietary': -0.6, 'sketchy': -1.6, 'shady': -1.8,
+    'problem': -1.7, 'problems': -1.7, 'issue': -0.8, 'issues': -0.9, 'annoying': -1.6,
+    'angry': -2.3, 'sucks': -1.5, 'sucked': -2.0, 'junk': -1.9, 'garbage': -2.1, 'trash': -2.0,
+}
+
+NEGATIONS = frozenset({
+    'not', 'no', 'never', 'none', 'nothing', 'nobody', 'neither', 'nor', 'without', 'hardly',
+    'cannot', 'cant', "can't", 'dont', "don't", 'doesnt', "doesn't", 'didnt', "didn't", 'isnt', "isn't",
+    'wasnt', "wasn't", 'arent', "aren't", 'werent', "weren't", 'wont', "won't", 'wouldnt', "wouldn't",
+    'shouldnt', "shouldn't", 'couldnt', "couldn't", 'aint', "ain't",
+})
+
+# Multipliers for the sentiment word right after them
+BOOSTERS = {
+    'very': 1.3, 'really': 1.3, 'super': 1.3, 'so': 1.2, 'extremely': 1.4, 'incredibly': 1.4,
+    'absolutely': 1.4, 'totally': 1.3, 'highly': 1.3, 'insanely': 1.4, 'most': 1.2,
+    'slightly': 0.6, 'somewhat': 0.7, 'kinda': 0.7, 'bit': 0.7, 'little': 0.8,
+}
+
+
+def tokenize(text):
+    """Split lowercased text into words, with sentence ends and newlines as break tokens of their own"""
+    return text.translate(_SEPARATORS).replace(BREAK_TOKEN, f" {BREAK_TOKEN} ").split()
+
+
+def load_lexicon(path):
+    """Read a VADER-style lexicon: one `token<TAB>valence[<TAB>...]` per line"""
+    lexicon = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            fields = line.rstrip('\n').split('\t')
+            if len(fields) >= 2 and fields[0] and not fields[0].startswith('#'):
+                lexicon[fields[0].lower()] = float(fields[1])
+    return lexicon
+
+
+def label(score):
+    """Return 'positive', 'negative' or 'neutral' for a compound score"""
+    if score >= POSITIVE_THRESHOLD:
+        return 'positive'
+    if score <= NEGATIVE_THRESHOLD:
+        return 'negative'
+    return 'neutral'
+
+
+def mention_windows(text, spans, competitor_ids, width=WINDOW_CHARS):
+    """Cut the text around each competitor mention, one string per entry of `competitor_ids`
+
+    `spans` are (competitor ID, start, end) from KeywordMatcher.match_ids;
+    several mentions of one competitor are joined by newlines, which the
+    scorer treats as breaks (as it does sentence ends) so a negation never
+    carries across them.
+    """
+    by_competitor = {}
+    for competitor_id, start, end in spans:
+        by_competitor.setdefault(competitor_id, []).append(text[max(start - width, 0):end + width])
+    return tuple('\n'.join(by_competitor.get(competitor_id, ())) for competitor_id in competitor_ids)
+
+
+def _window_hash(window):
+    """Cache key for a mention in a post too short for a content hash: the window's own text"""
+    return int.from_bytes(hashlib.blake2b(window.encode('utf-8'), digest_size=8).digest(), 'little')
+
+
+def _signed64(value):
+    # SQLite integers are signed
+    return value - (1 << 64) if value >= 1 << 63 else value
+
+
+class SentimentCache:
+    """Compound scores of past (post content, competitor) pairs, kept across runs in SQLite
+
+    Posts too short for a content hash are keyed by a hash of the mention
+    window instead.
+
+    Keys include the scorer's version, so changing the lexicon or window
+    rescores everything rather than mixing old and new scores.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS mention_sentiment (
+            content_hash INTEGER NOT NULL,
+            competitor   TEXT NOT NULL,
+            version      TEXT NOT NULL,
+            score        REAL NOT NULL,
+            PRIMARY KEY (content_hash, competitor, version)
+        ) WITHOUT ROWID;
+    """
+
+    def __init__(self, path='reddit_monitor_sentiment.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def get_many(self, keys, version):
+        """Return {(content_hash, competitor): score} for the cached keys among `keys`"""
+        keys = list(keys)
+        found = {}
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(keys), 400):
+            chunk = keys[i:i + 400]
+            hashes = {_signed64(content_hash): content_hash for content_hash, _ in chunk}
+            placeholders = ','.join('?' * len(hashes))
+            rows = self.conn.execute(
+                "SELECT content_hash, competitor, score FROM mention_sentiment "
+                f"WHERE version = ? AND content_hash IN ({placeholders})", [version, *hashes])
+            for content_hash, competitor, score in rows:
+                found[hashes[content_hash], competitor] = score
+        return {key: found[key] for key in keys if key in found}
+
+    def put_many(self, scores, version):
+        """Store {(content_hash, competitor): score}"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO mention_sentiment VALUES (?, ?, ?, ?)",
+                [(_signed64(content_hash), competitor, version, score)
+                 for (content_hash, competitor), score in scores.items()])
+
+    def close(self):
+        self.conn.close()
+
+
+class SentimentScorer:
+    """Offline lexicon sentiment for the text around competitor mentions
+
+    Each window's words are looked up in a valence lexicon; a word is flipped
+    and damped when one of the few words before it is a negation, and scaled
+    by a booster ("really", "slightly") right before it. The summed valence
+    is squashed to a compound score in (-1, 1) as VADER does.
+
+    Scoring works on whole batches: the windows' words are mapped to
+    vocabulary IDs in one pass, and with NumPy the negation and booster rules
+    and the per-window sums are array operations over the whole batch; the
+    pure-Python fallback gives the same scores. With a SentimentCache, scores
+    are kept by post content hash, so a post seen again in a later run (or
+    crossposted with the same text) is never scored twice.
+    """
+
+    def __init__(self, lexicon=None, window_chars=WINDOW_CHARS, cache=None):
+        self.lexicon = dict(DEFAULT_LEXICON if lexicon is None else lexicon)
+        self.window_chars = window_chars
+        self.cache = cache
+        self.scored = 0
+        self.cache_hits = 0
+
+        # Vocabulary ID 0 is every word the tables don't know, then the two separators
+        words = sorted(set(self.lexicon) | NEGATIONS | set(BOOSTERS))
+        self._vocabulary = {word: i for i, word in enumerate(words, start=WINDOW_END + 1)}
+        self._vocabulary[BREAK_TOKEN] = BREAK
+        self._vocabulary[WINDOW_END_TOKEN] = WINDOW_END
+        size = len(words) + WINDOW_END + 1
+        self._valence = [0.0] * size
+        self._negation = [False] * size
+        self._booster = [1.0] * size
+        for word, i in self._vocabulary.items():
+            self._valence[i] = self.lexicon.get(word, 0.0)
+            self._negation[i] = word in NEGATIONS
+            self._booster[i] = BOOSTERS.get(word, 1.0)
+        if np is not None:
+            self._valence = np.array(self._valence)
+            self._negation = np.array(self._negation)
+            self._booster = np.array(self._booster)
+
+        digest = hashlib.blake2b(digest_size=8)
+        for word in words:
+            digest.update(f"{word}\t{self._valence[self._vocabulary[word]]}\t{word in NEGATIONS}\t"
+                          f"{BOOSTERS.get(word, 1.0)}\n".encode('utf-8'))
+        digest.update(str(window_chars).encode('ascii'))
+        self.version = digest.hexdigest()
+
+    def score_windows(self, windows):
+        """Return one compound score per window string (already lowercased)"""
+        if not windows:
+            return []
+        vocabulary = self._vocabulary
+        if np is not None:
+            # One tokenizing pass and one lookup pass over the whole batch
+            end = f" {WINDOW_END_TOKEN} "
+            tokens = tokenize(end.join(windows) + end)
+            ids = np.fromiter(map(vocabulary.get, tokens, repeat(0)), dtype=np.int64, count=len(tokens))
+            return self._score_numpy(ids, len(windows))
+        return [self._score_python([vocabulary.get(token, 0) for token in tokenize(window)])
+                for window in windows]
+
+    def _score_python(self, ids):
+        total = 0.0
+        for position, token_id in enumerate(ids):
+            valence = self._valence[token_id]
+            if not valence:
+                continue
+            if position:
+                valence *= self._booster[ids[position - 1]]
+            for back in range(max(position - NEGATION_SCOPE, 0), position):
+                if ids[back] == BREAK:
+                    continue
+                if self._negation[ids[back]] and BREAK not in ids[back + 1:position]:
+                    valence *= NEGATION_SCALAR
+                    break
+            total += valence
+        return total / math.sqrt(total * total + NORMALIZATION_ALPHA)
+
+    def _score_numpy(self, ids, window_count):
+        ends = ids == WINDOW_END
+        window = np.cumsum(ends) - ends
+        # Segments end at breaks and at window ends; the rules never reach across them
+        segment = np.cumsum(ends | (ids == BREAK))
+
+        valence = self._valence[ids]
+        negation = self._negation[ids]
+        negated = np.zeros(len(ids), dtype=bool)
+        for back in range(1, NEGATION_SCOPE + 1):
+            negated[back:] |= negation[:-back] & (segment[back:] == segment[:-back])
+        scale = np.where(negated, NEGATION_SCALAR, 1.0)
+        scale[1:] *= np.where(segment[1:] == segment[:-1], self._booster[ids[:-1]], 1.0)
+
+        totals = np.bincount(window, weights=valence * scale, minlength=window_count)
+        return (totals / np.sqrt(totals * totals + NORMALIZATION_ALPHA)).tolist()
+
+    def score_records(self, records):
+        """Score the competitor mention windows carried by a batch of PostRecords
+
+        Sets each record's `competitor_sentiment` (one score per competitor ID)
+        and drops its windows.
+        """
+        # Posts too short for a content hash are keyed by the text of each mention window
+        keys = {}
+        for record in records:
+            if record.mentions:
+                for competitor, window in zip(record.matched_competitors, record.mentions):
+                    key = record.content_hash if record.content_hash is not None else _window_hash(window)
+                    keys[key, competitor] = None
+        cached = self.cache.get_many(keys, self.version) if self.cache is not None and keys else {}
+
+        scored_records = []
+        pending = []
+        windows = []
+        for record in records:
+            if not record.mentions:
+                continue
+            scored_records.append(record)
+            scores = []
+            for competitor, window in zip(record.matched_competitors, record.mentions):
+                key = record.content_hash if record.content_hash is not None else _window_hash(window)
+                score = cached.get((key, competitor))
+                if score is None:
+                    pending.append((record, len(scores), (key, competitor)))
+                    windows.append(window)
+                else:
+                    self.cache_hits += 1
+                scores.append(score)
+            record.competitor_sentiment = scores
+            record.mentions = None
+
+        fresh = {}
+        for (record, position, key), score in zip(pending, self.score_windows(windows)):
+            record.competitor_sentiment[position] = score
+            fresh[key] = score
+        self.scored += len(windows)
+        for record in scored_records:
+            record.competitor_sentiment = tuple(record.competitor_sentiment)
+        if fresh and self.cache is not None:
+            self.cache.put_many(fresh, self.version)
+        return records
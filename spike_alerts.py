@@ -0,0 +1,214 @@
+import math
+from array import array
+
+SECONDS_PER_HOUR = 3600
+
+
+class Spike:
+    """A surge in mentions of one keyword or competitor within the current bucket"""
+
+    def __init__(self, kind, name, bucket_start, bucket_seconds, count, mean, std, z, ratio):
+        self.kind = kind
+        self.name = name
+        self.bucket_start = bucket_start
+        self.bucket_seconds = bucket_seconds
+        self.count = count
+        self.mean = mean
+        self.std = std
+        self.z = z
+        self.ratio = ratio
+
+    @property
+    def display_name(self):
+        return self.name.title() if self.kind == 'competitor' else self.name
+
+    def describe(self):
+        return (f"{self.display_name}: {self.count} mentions in {self.bucket_seconds // 60:g} min "
+                f"(baseline {self.mean:.1f} ± {self.std:.1f}, z={self.z:.1f}, {self.ratio:.1f}x)")
+
+    def as_dict(self):
+        return {'kind': self.kind, 'name': self.name, 'bucket_start': self.bucket_start,
+                'bucket_seconds': self.bucket_seconds, 'count': self.count,
+                'baseline_mean': round(self.mean, 3), 'baseline_std': round(self.std, 3),
+                'z': round(self.z, 2), 'ratio': round(self.ratio, 2)}
+
+
+class _Series:
+    """Ring buffer of one pattern's bucket counts with running sums of the completed buckets"""
+
+    __slots__ = ('counts', 'bucket', 'first', 'base_sum', 'base_sumsq', 'trigger', 'alerted')
+
+    def __init__(self, size, bucket, first):
+        self.counts = array('q', bytes(8 * size))
+        self.bucket = bucket
+        self.first = first
+        self.base_sum = 0
+        self.base_sumsq = 0
+        # Count at which the current bucket becomes a spike; None until worked out
+        self.trigger = None
+        self.alerted = None
+
+
+class SpikeDetector:
+    """Rolling mention counts per keyword and competitor, checked against their own baseline
+
+    Each pattern keeps a ring of `baseline_buckets` completed buckets plus the
+    current one, with a running sum and sum of squares of the completed
+    buckets, so the baseline mean and standard deviation never need a scan.
+    The baseline only changes when a bucket ends, so the count that would
+    make the current bucket a spike is worked out once per bucket and a
+    mention costs an increment and a comparison. Moving on to a new bucket
+    retires one old bucket per bucket passed (at most the ring's length), so
+    updates stay constant-time.
+
+    The current bucket is a spike once it holds at least `min_count` mentions
+    and either its z-score reaches `z_threshold` or its ratio to the baseline
+    mean reaches `ratio_threshold` (pass None to disable either). The
+    standard deviation and mean are floored at one mention so a pattern with
+    a flat or empty history does not alert on its first few hits, and nothing
+    fires until the detector has watched for `min_baseline` buckets (a
+    pattern first seen after that has a baseline of zeros). Each pattern
+    alerts at most once per bucket.
+    """
+
+    def __init__(self, bucket_seconds=SECONDS_PER_HOUR, baseline_buckets=168, z_threshold=4.0,
+                 ratio_threshold=None, min_count=5, min_baseline=24):
+        if z_threshold is None and ratio_threshold is None:
+            raise ValueError("Set a z-score threshold, a ratio threshold, or both")
+        self.bucket_seconds = bucket_seconds
+        self.baseline_buckets = baseline_buckets
+        self.z_threshold = z_threshold
+        self.ratio_threshold = ratio_threshold
+        self.min_count = min_count
+        self.min_baseline = min_baseline
+        self._size = baseline_buckets + 1
+        self._series = {}
+        # First bucket the detector saw anything in: every pattern's history starts there
+        self._first = None
+        self.events = 0
+        self.spikes = 0
+
+    def __len__(self):
+        return len(self._series)
+
+    def _series_for(self, kind, name, bucket):
+        """Return the pattern's series, moved forward to `bucket` if that is newer"""
+        series = self._series.get((kind, name))
+        if series is None:
+            if self._first is None or bucket < self._first:
+                self._first = bucket
+            series = self._series[kind, name] = _Series(self._size, bucket, self._first)
+        elif bucket > series.bucket:
+            self._advance(series, bucket)
+        return series
+
+    def _advance(self, series, bucket):
+        """Move `series` forward to `bucket`, folding finished buckets into the baseline"""
+        counts, size = series.counts, self._size
+        series.trigger = None
+        if bucket - series.bucket >= size:
+            # Everything in the ring is older than the new baseline window
+            for i in range(size):
+                counts[i] = 0
+            series.base_sum = series.base_sumsq = 0
+            series.bucket = bucket
+            return
+        while series.bucket < bucket:
+            finished = counts[series.bucket % size]
+            series.base_sum += finished
+            series.base_sumsq += finished * finished
+            series.bucket += 1
+            # The slot for the new bucket holds the one that just left the window
+            slot = series.bucket % size
+            expired = counts[slot]
+            series.base_sum -= expired
+            series.base_sumsq -= expired * expired
+            counts[slot] = 0
+
+    def _baseline(self, series):
+        """Return (buckets of history, mean, standard deviation) of the completed buckets"""
+        history = min(series.bucket - series.first, self.baseline_buckets)
+        if not history:
+            return 0, 0.0, 0.0
+        mean = series.base_sum / history
+        return history, mean, math.sqrt(max(series.base_sumsq / history - mean * mean, 0.0))
+
+    def _trigger(self, series):
+        history, mean, std = self._baseline(series)
+        if history < self.min_baseline:
+            return math.inf
+        thresholds = []
+        if self.z_threshold is not None:
+            thresholds.append(math.ceil(mean + self.z_threshold * max(std, 1.0)))
+        if self.ratio_threshold is not None:
+            thresholds.append(math.ceil(self.ratio_threshold * max(mean, 1.0)))
+        return max(self.min_count, min(thresholds))
+
+    def add(self, kind, name, created_utc, count=1, now=None):
+        """Count `count` mentions at `created_utc`; return a Spike if this tips its bucket into one
+
+        Mentions older than the current bucket still count towards the
+        baseline. With `now`, only a bucket that is current at `now` (or just
+        ended) can alert, so replaying history never sends stale alerts.
+        """
+        self.events += 1
+        bucket = int(created_utc // self.bucket_seconds)
+        series = self._series_for(kind, name, bucket)
+        if bucket < series.bucket:
+            if bucket > series.bucket - self._size and bucket >= series.first:
+                slot = bucket % self._size
+                old = series.counts[slot]
+                series.counts[slot] = old + count
+                series.base_sum += count
+                series.base_sumsq += (old + count) ** 2 - old * old
+                series.trigger = None
+            return None
+
+        slot = bucket % self._size
+        current = series.counts[slot] = series.counts[slot] + count
+        trigger = series.trigger
+        if trigger is None:
+            trigger = series.trigger = self._trigger(series)
+        if current < trigger or series.alerted == bucket:
+            return None
+        if now is not None and bucket < int(now // self.bucket_seconds) - 1:
+            return None
+
+        series.alerted = bucket
+        self.spikes += 1
+        _, mean, std = self._baseline(series)
+        return Spike(kind, name, bucket * self.bucket_seconds, self.bucket_seconds, current, mean, std,
+                     (current - mean) / max(std, 1.0), current / max(mean, 1.0))
+
+    def observe(self, post, now=None):
+        """Count every keyword and competitor a matched post mentions; returns the spikes it set off"""
+        created_utc = post.get('created_utc') or 0
+        spikes = []
+        for keyword in post['matched_keywords']:
+            spike = self.add('keyword', keyword, created_utc, now=now)
+            if spike:
+                spikes.append(spike)
+        for competitor in post['matched_competitors']:
+            spike = self.add('competitor', competitor, created_utc, now=now)
+            if spike:
+                spikes.append(spike)
+        return spikes
+
+    def seed(self, kind, name, bucket_start, count):
+        """Load a past bucket's count (e.g. from the hourly rollups) without alerting
+
+        Buckets must be seeded oldest first.
+        """
+        bucket = int(bucket_start // self.bucket_seconds)
+        series = self._series_for(kind, name, bucket)
+        series.counts[bucket % self._size] += count
+
+
+def send_webhook(url, spike, timeout=10):
+    """POST a spike as JSON to `url` (e.g. a local chat or pager relay)"""
+    # Imported here so runs that never alert don't pay for requests
+    import requests
+
+    response = requests.post(url, json=spike.as_dict(), timeout=timeout)
+    response.raise_for_status()
+    return response.status_code
@@ -0,0 +1,125 @@
+import json
+import sqlite3
+import time
+
+
+class StateStore:
+    """SQLite-backed state for incremental runs
+
+    Keeps a per-subreddit high-water mark (fullname and `created_utc` of the
+    newest post seen) and every post that has already matched, so later runs
+    only fetch what is new and reports can be rebuilt without crawling. The
+    time from which each subreddit's stored matches are complete is kept too,
+    so a report can tell which of its windows the data fully covers.
+
+    The daemon also keeps hourly and daily rollups: per bucket, subreddit and
+    pattern counts that grow with the number of buckets, not posts.
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS high_water (
+            subreddit   TEXT PRIMARY KEY,
+            fullname    TEXT NOT NULL,
+            created_utc REAL NOT NULL,
+            updated_at  REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS matched_posts (
+            post_id     TEXT PRIMARY KEY,
+            subreddit   TEXT NOT NULL,
+            created_utc REAL NOT NULL,
+            data        TEXT NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS matched_posts_created ON matched_posts (created_utc);
+        CREATE TABLE IF NOT EXISTS coverage (
+            subreddit     TEXT PRIMARY KEY,
+            covered_since REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS rollups (
+            period      TEXT NOT NULL,
+            bucket      INTEGER NOT NULL,
+            subreddit   TEXT NOT NULL,
+            kind        TEXT NOT NULL,
+            name        TEXT NOT NULL,
+            count       INTEGER NOT NULL,
+            PRIMARY KEY (period, bucket, subreddit, kind, name)
+        );
+    """
+
+    def __init__(self, path='reddit_monitor_state.db'):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.executescript(self.SCHEMA)
+
+    def get_high_water(self, subreddit):
+        """Return (fullname, created_utc) of the newest post seen, or None"""
+        row = self.conn.execute(
+            "SELECT fullname, created_utc FROM high_water WHERE subreddit = ?",
+            (subreddit,)).fetchone()
+        return tuple(row) if row else None
+
+    def set_high_water(self, subreddit, fullname, created_utc):
+        with self.conn:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO high_water VALUES (?, ?, ?, ?)",
+                (subreddit, fullname, created_utc, time.time()))
+
+    def get_coverage(self, subreddits=None):
+        """Return {subreddit: time from which its stored matches are complete}"""
+        rows = self.conn.execute("SELECT subreddit, covered_since FROM coverage")
+        return {subreddit: covered_since for subreddit, covered_since in rows
+                if subreddits is None or subreddit in subreddits}
+
+    def set_coverage(self, subreddit, covered_since):
+        with self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO coverage VALUES (?, ?)", (subreddit, covered_since))
+
+    def seen_ids(self, post_ids):
+        """Return the subset of post_ids that have already been matched"""
+        post_ids = list(post_ids)
+        seen = set()
+        # Stay under SQLite's bound-parameter limit
+        for i in range(0, len(post_ids), 500):
+            chunk = post_ids[i:i + 500]
+            placeholders = ','.join('?' * len(chunk))
+            seen.update(row[0] for row in self.conn.execute(
+                f"SELECT post_id FROM matched_posts WHERE post_id IN ({placeholders})", chunk))
+        return seen
+
+    def add_matches(self, posts):
+        """Store matched posts (dicts or PostRecords with 'id', 'subreddit' and 'created_utc')"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO matched_posts VALUES (?, ?, ?, ?)",
+                [(p['id'], p['subreddit'], p['created_utc'], json.dumps(dict(p))) for p in posts])
+
+    def matches_since(self, cutoff_utc, subreddits=None):
+        """Return stored matched posts created at or after cutoff_utc, oldest first"""
+        rows = self.conn.execute(
+            "SELECT subreddit, data FROM matched_posts WHERE created_utc >= ? ORDER BY created_utc",
+            (cutoff_utc,))
+        return [json.loads(data) for subreddit, data in rows
+                if subreddits is None or subreddit in subreddits]
+
+    def add_rollups(self, rows):
+        """Add (period, bucket, subreddit, kind, name, count) rows onto the stored counts"""
+        with self.conn:
+            self.conn.executemany(
+                "INSERT INTO rollups VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (period, bucket, subreddit, kind, name) DO UPDATE SET count = count + excluded.count",
+                rows)
+
+    def rollups(self, period, since_utc, subreddits=None):
+        """Return (bucket, subreddit, kind, name, count) rows of buckets starting at or after since_utc"""
+        rows = self.conn.execute(
+            "SELECT bucket, subreddit, kind, name, count FROM rollups "
+            "WHERE period = ? AND bucket >= ? ORDER BY bucket",
+            (period, since_utc))
+        return [tuple(row) for row in rows if subreddits is None or row[1] in subreddits]
+
+    def prune_rollups(self, period, before_utc):
+        """Drop `period` buckets that start before before_utc"""
+        with self.conn:
+            self.conn.execute("DELETE FROM rollups WHERE period = ? AND bucket < ?", (period, before_utc))
+
+    def close(self):
+        self.conn.close()
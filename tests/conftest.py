@@ -0,0 +1,24 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+# The monitor's modules live at the repository root, the HTTP and SMTP stubs under benchmarks/
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from reddit_stub import RedditStub  # noqa: E402
+from smtp_sink import SMTPSink  # noqa: E402
+
+
+@pytest.fixture
+def stub():
+    with RedditStub() as stub:
+        yield stub
+
+
+@pytest.fixture
+def sink():
+    with SMTPSink() as sink:
+        yield sink
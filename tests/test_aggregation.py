@@ -0,0 +1,178 @@
+import random
+from collections import Counter, defaultdict
+from datetime import datetime, timezone
+
+import pytest
+
+import aggregation
+from aggregation import SECONDS_PER_DAY, MatchColumns, WindowStats
+from keyword_matcher import KeywordMatcher
+from sentiment import LABELS, label
+
+KEYWORDS = ['creatine', 'protein', 'sleep', 'hydration', 'pre workout']
+COMPETITORS = ['myprotein', 'optimum nutrition', 'esn']
+TODAY = 20_000
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    """Run each test with NumPy and with the pure-Python fallback"""
+    if request.param == 'python':
+        monkeypatch.setattr(aggregation, 'np', None)
+    return request.param
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(KEYWORDS, COMPETITORS)
+
+
+def make_posts(count=400, days=60, seed=3):
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        competitors = rng.sample(COMPETITORS, rng.randint(0, 2))
+        posts.append({
+            'id': f"t3_{i}",
+            'subreddit': rng.choice(['fitness', 'running', 'nutrition']),
+            'created_utc': (TODAY - rng.randrange(days)) * SECONDS_PER_DAY + rng.randrange(SECONDS_PER_DAY),
+            'score': rng.randrange(100),
+            'num_comments': rng.randrange(30),
+            'matched_keywords': rng.sample(KEYWORDS, rng.randint(1, 3)),
+            'matched_competitors': competitors,
+            'competitor_sentiment': [round(rng.uniform(-1, 1), 2) for _ in competitors],
+            'discussion': rng.randrange(count // 2),
+        })
+    return posts
+
+
+def day_of(post):
+    return int(post['created_utc'] // SECONDS_PER_DAY)
+
+
+def engagement_order(posts):
+    return sorted(posts, key=lambda post: post['score'] + post['num_comments'], reverse=True)
+
+
+def test_counts_match_brute_force(engine, matcher):
+    posts = make_posts()
+    stats = MatchColumns.from_posts(posts, matcher)
+    assert len(stats) == len(posts)
+    assert stats.keyword_counts() == Counter(kw for post in posts for kw in post['matched_keywords'])
+    assert stats.competitor_counts() == Counter(c.title() for post in posts for c in post['matched_competitors'])
+    assert stats.subreddit_counts() == Counter(post['subreddit'] for post in posts)
+    assert stats.discussion_count() == len({post['discussion'] for post in posts})
+    assert stats.keyword_counts(unique=True) == Counter(
+        kw for kw, _ in {(kw, post['discussion']) for post in posts for kw in post['matched_keywords']})
+
+    daily = Counter(MatchColumns.day_to_date(day_of(post)) for post in posts)
+    assert stats.daily_counts() == dict(sorted(daily.items()))
+    creatine = Counter(MatchColumns.day_to_date(day_of(post)) for post in posts
+                       if 'creatine' in post['matched_keywords'])
+    assert stats.daily_pattern_counts()[KEYWORDS.index('creatine')] == creatine
+
+
+def test_top_posts_match_a_stable_sort(engine, matcher):
+    posts = make_posts()
+    stats = MatchColumns.from_posts(posts, matcher)
+    assert stats.top_posts(10) == engagement_order(posts)[:10]
+    assert stats.top_posts(None) == engagement_order(posts)
+    kept = MatchColumns.from_posts(posts, matcher, keep_top=10)
+    assert kept.top_posts(10) == engagement_order(posts)[:10]
+    with pytest.raises(ValueError):
+        kept.top_posts(11)
+
+
+def test_competitor_sentiment(engine, matcher):
+    posts = make_posts()
+    expected = defaultdict(lambda: dict.fromkeys(LABELS, 0))
+    sums = defaultdict(float)
+    for post in posts:
+        for competitor, score in zip(post['matched_competitors'], post['competitor_sentiment']):
+            expected[competitor.title()][label(score)] += 1
+            sums[competitor.title()] += score
+    result = MatchColumns.from_posts(posts, matcher).competitor_sentiment()
+    assert set(result) == set(expected)
+    for name, entry in result.items():
+        assert {key: entry[key] for key in LABELS} == expected[name]
+        assert entry['mean'] == pytest.approx(sums[name] / sum(expected[name].values()))
+
+
+def test_undeduplicated_posts_are_their_own_discussion(engine, matcher):
+    posts = make_posts(count=20)
+    for post in posts:
+        del post['discussion']
+    assert MatchColumns.from_posts(posts, matcher).discussion_count() == 20
+
+
+def test_empty_columns(engine, matcher):
+    stats = MatchColumns(matcher)
+    assert stats.keyword_counts() == {}
+    assert stats.daily_counts() == {}
+    assert stats.daily_pattern_counts() == {}
+    assert stats.competitor_sentiment() == {}
+    assert stats.top_posts(5) == []
+
+
+@pytest.mark.parametrize('windows, span', [((7, 30), None), ((7, 30), 60), ((1, 14), 40)])
+def test_window_stats_match_brute_force(engine, matcher, windows, span):
+    posts = make_posts(days=70)
+    # A post stamped after today (clock skew) counts towards today
+    posts[0]['created_utc'] = (TODAY + 1) * SECONDS_PER_DAY + 5
+    stats = MatchColumns.from_posts(posts, matcher)
+    window_stats = WindowStats(stats, windows, today=TODAY, span=span)
+
+    def in_window(post, window, previous):
+        age = TODAY - min(day_of(post), TODAY)
+        start = window if previous else 0
+        return start <= age < start + window and age < window_stats.span
+
+    for window in windows:
+        for previous in (False, True):
+            if previous and 2 * window > window_stats.span:
+                continue
+            selected = [post for post in posts if in_window(post, window, previous)]
+            assert window_stats.post_count(window, previous) == len(selected)
+            assert window_stats.keyword_counts(window, previous) == Counter(
+                kw for post in selected for kw in post['matched_keywords'])
+            assert window_stats.competitor_counts(window, previous) == Counter(
+                c.title() for post in selected for c in post['matched_competitors'])
+        selected = [post for post in posts if in_window(post, window, False)]
+        assert window_stats.top_posts(window, 5) == engagement_order(selected)[:5]
+
+    series = window_stats.post_series()
+    assert len(series) == window_stats.span
+    assert sum(series) == sum(1 for post in posts if TODAY - min(day_of(post), TODAY) < window_stats.span)
+    esn = window_stats.competitor_series()['Esn']
+    assert sum(esn) == sum('esn' in post['matched_competitors'] for post in posts
+                           if TODAY - min(day_of(post), TODAY) < window_stats.span)
+
+
+def test_previous_window_needs_the_span_to_reach_it(engine, matcher):
+    stats = MatchColumns.from_posts(make_posts(), matcher)
+    window_stats = WindowStats(stats, (7, 30), today=TODAY)
+    assert window_stats.span == 30
+    assert window_stats.has_previous(7)
+    assert not window_stats.has_previous(30)
+    assert WindowStats(stats, (7, 30), today=TODAY, span=60).has_previous(30)
+
+
+def test_coverage_hides_uncovered_windows(engine, matcher):
+    stats = MatchColumns.from_posts(make_posts(), matcher)
+    # Complete from mid-way through the day 20 days ago: that day is partial
+    covered_since = (TODAY - 20) * SECONDS_PER_DAY + 3600
+    window_stats = WindowStats(stats, (7, 30), today=TODAY, span=60, covered_since=covered_since)
+    assert window_stats.covered_days == 20
+    assert window_stats.covers(7) and window_stats.covers(7, previous=True)
+    assert window_stats.has_previous(7)
+    assert not window_stats.covers(30)
+    assert not window_stats.has_previous(30)
+
+    # Covering from exactly midnight includes that day
+    window_stats = WindowStats(stats, (7,), today=TODAY, covered_since=(TODAY - 6) * SECONDS_PER_DAY)
+    assert window_stats.covered_days == 7
+    assert window_stats.covers(7) and not window_stats.has_previous(7)
+
+
+def test_day_to_date():
+    assert MatchColumns.day_to_date(TODAY) == datetime.fromtimestamp(TODAY * SECONDS_PER_DAY, timezone.utc).date()
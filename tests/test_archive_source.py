@@ -0,0 +1,73 @@
+import gzip
+import json
+
+import pytest
+
+import archive_source
+from archive_source import ArchiveSource
+
+START = 1_700_000_000
+DAY = 86400
+
+
+def dump_lines():
+    posts = [
+        {'id': 'a', 'subreddit': 'Fitness', 'created_utc': START, 'title': 'creatine'},
+        {'id': 'b', 'subreddit': 'running', 'created_utc': START + DAY, 'title': 'electrolytes'},
+        # Older dumps store the timestamp as a string
+        {'id': 'c', 'subreddit': 'fitness', 'created_utc': str(START + 2 * DAY), 'title': 'pre workout'},
+        {'id': 'd', 'subreddit': 'nutrition', 'created_utc': START + 3 * DAY, 'title': 'protein'},
+        # A crosspost of an r/fitness post: the nested object gets it past the screen, not past accepts
+        {'id': 'e', 'subreddit': 'memes', 'created_utc': START + DAY, 'title': 'gym meme',
+         'crosspost_parent_list': [{'subreddit': 'fitness', 'created_utc': START}]},
+    ]
+    return [json.dumps(post).encode() + b'\n' for post in posts]
+
+
+def write(path, compress=None):
+    data = b''.join(dump_lines())
+    if compress == 'gz':
+        data = gzip.compress(data)
+    elif compress == 'zst':
+        zstandard = pytest.importorskip('zstandard')
+        data = zstandard.ZstdCompressor().compress(data)
+    path.write_bytes(data)
+    return str(path)
+
+
+def accepted_ids(source):
+    return [post['id'] for post in map(json.loads, source.lines()) if source.accepts(post)]
+
+
+@pytest.mark.parametrize('name, compress', [('RS.jsonl', None), ('RS.jsonl.gz', 'gz'), ('RS.zst', 'zst')])
+def test_reads_every_format(tmp_path, name, compress):
+    source = ArchiveSource([write(tmp_path / name, compress)])
+    assert [json.loads(line)['id'] for line in source.lines()] == ['a', 'b', 'c', 'd', 'e']
+    assert source.lines_read == source.lines_passed == 5
+    assert source.bytes_read == sum(map(len, dump_lines()))
+
+
+def test_filters_by_subreddit_case_insensitively(tmp_path):
+    source = ArchiveSource([write(tmp_path / 'RS.jsonl')], subreddits=['FITNESS', 'running'])
+    assert accepted_ids(source) == ['a', 'b', 'c']
+    # The crosspost got through the byte-level screen and was dropped by the exact filter
+    assert (source.lines_read, source.lines_passed) == (5, 4)
+
+
+def test_filters_by_date_range(tmp_path):
+    source = ArchiveSource([write(tmp_path / 'RS.jsonl')], start_utc=START + DAY, end_utc=START + 3 * DAY)
+    assert accepted_ids(source) == ['b', 'c', 'e']
+
+
+def test_reads_several_files_in_order(tmp_path):
+    paths = [write(tmp_path / 'RS_1.jsonl'), write(tmp_path / 'RS_2.jsonl.gz', 'gz')]
+    source = ArchiveSource(paths, subreddits=['nutrition'])
+    assert accepted_ids(source) == ['d', 'd']
+    assert source.lines_read == 10
+
+
+def test_zst_without_zstandard_says_what_is_missing(tmp_path, monkeypatch):
+    monkeypatch.setattr(archive_source, 'zstandard', None)
+    (tmp_path / 'RS.zst').write_bytes(b'')
+    with pytest.raises(RuntimeError, match='zstandard'):
+        list(ArchiveSource([str(tmp_path / 'RS.zst')]).lines())
@@ -0,0 +1,70 @@
+import asyncio
+import time
+
+from reddit_fetcher import RedditFetcher, TokenBucket
+from reddit_monitor import SimpleRedditMonitor
+from run_metrics import RunMetrics
+
+
+def fetcher_for(stub, concurrency=4):
+    fetcher = RedditFetcher(base_url=stub.base_url, rate=1000, backoff=0.01, concurrency=concurrency)
+    fetcher.verbose = False
+    return fetcher
+
+
+def fetch(fetcher, post_ids, **kwargs):
+    return asyncio.run(fetcher.fetch_comments_async(post_ids, **kwargs))
+
+
+def test_walks_the_tree_to_max_depth(stub):
+    # Three replies per comment: 3 + 9 + 27 comments in the first three levels
+    [result] = fetch(fetcher_for(stub), ['abc'], max_depth=3)
+    assert result.ok and result.requests == 1
+    assert len(result.comments) == 39
+    # Deeper replies and 'more' stubs were left out
+    assert result.truncated
+    assert result.bytes > 0
+
+
+def test_whole_tree_is_not_truncated(stub):
+    stub.comment_depth = 1
+    [result] = fetch(fetcher_for(stub), ['abc'], max_depth=3)
+    assert len(result.comments) == 3
+    assert not result.truncated
+
+
+def test_max_comments_caps_each_tree(stub):
+    results = fetch(fetcher_for(stub), ['a', 'b', 'c'], max_depth=5, max_comments=10)
+    assert [len(result.comments) for result in results] == [10, 10, 10]
+    assert all(result.truncated for result in results)
+    assert [result.post_id for result in results] == ['a', 'b', 'c']
+
+
+def test_byte_budget_stops_new_trees(stub):
+    results = fetch(fetcher_for(stub, concurrency=1), ['a', 'b', 'c'], max_depth=2, max_bytes=1)
+    assert results[0].ok and results[0].comments
+    assert [result.error for result in results[1:]] == ['budget', 'budget']
+    assert stub.request_count == 1
+
+
+def test_threads_matching_only_in_comments_are_reported(stub):
+    now = time.time()
+    stub.listings['fitness'] = [{'kind': 't3', 'data': {
+        'id': f"p{i}", 'name': f"t3_p{i}", 'title': f"Question {i}", 'selftext': '', 'score': 1,
+        'num_comments': 10 - i, 'created_utc': now - i * 60, 'subreddit': 'fitness',
+        'permalink': f"/r/fitness/comments/p{i}/question/"}} for i in range(5)]
+    monitor = SimpleRedditMonitor(comments=True, comment_posts=3, comment_depth=2)
+    monitor.metrics = RunMetrics('report')
+    monitor.subreddits = ['fitness']
+    monitor.fetcher.base_url = stub.base_url
+    monitor.fetcher.verbose = False
+    monitor.fetcher.rate_limiter = TokenBucket(1000, 100)
+
+    posts = monitor.search_reddit_posts(days_back=1)
+    # Only the three most-commented threads were fetched, and the stub's comments always mention something
+    assert sorted(post['id'] for post in posts) == ['t3_p0', 't3_p1', 't3_p2']
+    assert all(post['matched_keywords'] == [] and post['matched_competitors'] == [] for post in posts)
+    assert all(post['comment_keywords'] or post['comment_competitors'] for post in posts)
+    assert set(monitor.comment_stats) == {'t3_p0', 't3_p1', 't3_p2'}
+    assert monitor.metrics.counters['comment_requests'] == 3
+    monitor.close()
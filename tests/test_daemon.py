@@ -0,0 +1,67 @@
+import pytest
+
+from aggregation import SECONDS_PER_DAY
+from daemon import MonitorDaemon, PollScheduler
+from reddit_monitor import SimpleRedditMonitor
+
+
+@pytest.fixture
+def scheduler():
+    return PollScheduler(['fitness', 'running'], min_interval=60, max_interval=1800, target_posts=25, now=1000)
+
+
+def test_every_subreddit_is_due_at_start(scheduler):
+    assert len(scheduler) == 2
+    assert scheduler.next_due() == (1000, 'fitness')
+    assert scheduler.pop() == 'fitness'
+    assert scheduler.pop() == 'running'
+    assert len(scheduler) == 0
+
+
+def test_interval_follows_the_posting_rate(scheduler):
+    scheduler.pop()
+    # 100 posts since the high-water mark 1000s ago: 0.1 posts/s, so 25 posts take 250s
+    assert scheduler.record('fitness', 100, now=1000, since=0) == 250
+    assert scheduler.rates['fitness'] == pytest.approx(0.1)
+    # Busy subreddits are still polled no more often than min_interval
+    scheduler.pop()
+    assert scheduler.record('running', 5000, now=1000, since=0) == 60
+    assert [scheduler.pop() for _ in range(2)] == ['running', 'fitness']
+
+
+def test_rate_is_smoothed_between_polls(scheduler):
+    scheduler.pop()
+    scheduler.record('fitness', 100, now=1000, since=0)
+    scheduler.pop()
+    # 0.3 posts/s observed since the last poll, averaged with the 0.1 seen before
+    interval = scheduler.record('fitness', 75, now=1250)
+    assert scheduler.rates['fitness'] == pytest.approx(0.2)
+    assert interval == pytest.approx(125)
+
+
+def test_quiet_and_failing_polls_back_off(scheduler):
+    scheduler.pop()
+    scheduler.record('fitness', 100, now=1000, since=0)
+    scheduler.pop()
+    assert scheduler.record('fitness', 0, now=1250) == 500
+    intervals = []
+    for poll in range(5):
+        scheduler.pop()
+        intervals.append(scheduler.record('fitness', 0, now=2000 + poll, ok=False))
+    assert intervals == [1000, 1800, 1800, 1800, 1800]
+    # A failed poll leaves the rate and the last successful poll alone
+    assert scheduler.last_polled['fitness'] == 1250
+
+
+def test_first_poll_without_a_mark_backs_off(scheduler):
+    scheduler.pop()
+    assert scheduler.record('fitness', 10, now=1000) == 120
+    assert scheduler.rates['fitness'] is None
+
+
+def test_daemon_dedups_over_the_report_window(tmp_path):
+    monitor = SimpleRedditMonitor(state_path=str(tmp_path / 'state.db'), report_windows=(7, 30))
+    daemon = MonitorDaemon(monitor, PollScheduler(monitor.subreddits), days_back=7)
+    assert daemon.days_back == 30
+    assert daemon.deduplicator.window == 30 * SECONDS_PER_DAY
+    monitor.close()
@@ -0,0 +1,130 @@
+import csv
+import glob
+import os
+from datetime import date
+
+import pytest
+
+import dataset_export
+from aggregation import SECONDS_PER_DAY, MatchColumns
+from dataset_export import DatasetWriter, resolve_format
+from keyword_matcher import KeywordMatcher
+
+DAY0 = 19_700 * SECONDS_PER_DAY
+MATCHER = KeywordMatcher(['creatine', 'sleep'], ['esn'])
+
+
+def make_post(i, day):
+    return {'id': f"t3_{i}", 'subreddit': 'fitness', 'created_utc': DAY0 + day * SECONDS_PER_DAY + i,
+            'title': f"Post {i}", 'permalink': f"https://reddit.com/r/fitness/comments/{i}/", 'score': i,
+            'num_comments': 0, 'matched_keywords': ['creatine', 'sleep'], 'matched_competitors': ['esn'],
+            'competitor_sentiment': [0.5], 'crosspost_parent': None, 'discussion': i // 2}
+
+
+def read_posts(directory):
+    """{partition: [post_id, ...]} from the committed CSV part files"""
+    partitions = {}
+    for path in sorted(glob.glob(os.path.join(directory, 'posts', 'date=*', 'part-*.csv'))):
+        with open(path, newline='', encoding='utf-8') as f:
+            rows = list(csv.DictReader(f))
+        partitions.setdefault(os.path.basename(os.path.dirname(path)), []).extend(row['post_id'] for row in rows)
+    return partitions
+
+
+def test_resolve_format(monkeypatch):
+    with pytest.raises(ValueError, match='Unknown export format'):
+        resolve_format('xlsx')
+    monkeypatch.setattr(dataset_export, 'pa', None)
+    assert resolve_format('auto') == 'csv'
+    with pytest.raises(RuntimeError, match='pyarrow'):
+        resolve_format('parquet')
+
+
+def test_posts_are_partitioned_by_creation_day(tmp_path):
+    posts = [make_post(i, day=i % 3) for i in range(30)]
+    # Small batches and one open file at a time: each partition is written as several parts
+    writer = DatasetWriter(str(tmp_path), format='csv', batch_size=4, max_open=1, run_id='run1')
+    writer.add_all(posts)
+    writer.close()
+    partitions = read_posts(str(tmp_path))
+    assert sorted(partitions) == ['date=2023-12-09', 'date=2023-12-10', 'date=2023-12-11']
+    for day, partition in enumerate(sorted(partitions)):
+        assert sorted(partitions[partition]) == sorted(post['id'] for post in posts if post['created_utc'] //
+                                                       SECONDS_PER_DAY == DAY0 // SECONDS_PER_DAY + day)
+    assert writer.posts.rows == 30 and len(writer.posts.paths) > 3
+    assert all(os.path.basename(path).startswith('part-run1-') for path in writer.paths)
+
+    with open(writer.posts.paths[0], newline='', encoding='utf-8') as f:
+        row = next(csv.DictReader(f))
+    assert (row['matched_keywords'], row['competitor_sentiment'], row['crosspost_parent']) == \
+        ('creatine|sleep', '0.5', '')
+
+
+def test_parts_stay_hidden_until_close(tmp_path):
+    writer = DatasetWriter(str(tmp_path), format='csv', batch_size=2)
+    writer.add_all(make_post(i, 0) for i in range(5))
+    writer.posts.flush()
+    assert read_posts(str(tmp_path)) == {}
+    assert glob.glob(str(tmp_path / 'posts' / 'date=*' / '.part-*.tmp'))
+    writer.close()
+    assert len(read_posts(str(tmp_path))['date=2023-12-09']) == 5
+    assert not glob.glob(str(tmp_path / 'posts' / 'date=*' / '.*.tmp'))
+
+
+def test_each_post_is_exported_once(tmp_path):
+    first = DatasetWriter(str(tmp_path), format='csv', run_id='run1')
+    # A repeat within one run is written once
+    first.add_all([make_post(i, 0) for i in range(10)] + [make_post(3, 0)])
+    first.close()
+    assert (first.posts.rows, first.skipped) == (10, 1)
+
+    # A later run over an overlapping window only adds the posts it is first to match
+    second = DatasetWriter(str(tmp_path), format='csv', batch_size=3, run_id='run2')
+    second.add_all(make_post(i, 0) for i in range(5, 15))
+    second.close()
+    assert (second.posts.rows, second.skipped) == (5, 5)
+    exported = read_posts(str(tmp_path))['date=2023-12-09']
+    assert sorted(exported) == sorted(f"t3_{i}" for i in range(15))
+
+
+def test_abort_leaves_the_dataset_as_it_was(tmp_path):
+    writer = DatasetWriter(str(tmp_path), format='csv', batch_size=2)
+    writer.add_all(make_post(i, 0) for i in range(5))
+    writer.posts.flush()
+    writer.abort()
+    assert read_posts(str(tmp_path)) == {}
+    assert not glob.glob(str(tmp_path / 'posts' / 'date=*' / '.*'))
+    # The aborted run's posts were not recorded as exported
+    retry = DatasetWriter(str(tmp_path), format='csv')
+    retry.add_all(make_post(i, 0) for i in range(5))
+    retry.close()
+    assert (retry.posts.rows, retry.skipped) == (5, 0)
+
+
+def test_aggregates_are_partitioned_by_report_day(tmp_path):
+    posts = [make_post(i, day=i % 3) for i in range(6)]
+    writer = DatasetWriter(str(tmp_path), format='csv')
+    writer.add_aggregates(MatchColumns.from_posts(posts, MATCHER), 'Team', report_date=date(2024, 1, 1))
+    writer.close()
+    [path] = writer.aggregates.paths
+    assert os.path.basename(os.path.dirname(path)) == 'date=2024-01-01'
+    with open(path, newline='', encoding='utf-8') as f:
+        rows = {(row['metric'], row['name'], row['day']): float(row['value']) for row in csv.DictReader(f)}
+    assert rows['posts', '', ''] == 6
+    assert rows['discussions', '', ''] == 3
+    assert rows['competitor_mentions', 'Esn', ''] == 6
+    assert rows['daily_keyword_mentions', 'creatine', '2023-12-10'] == 2
+    assert rows['sentiment_positive', 'Esn', ''] == 6
+
+
+@pytest.mark.parametrize('format', ['parquet', 'arrow'])
+def test_arrow_formats_read_back_as_one_dataset(tmp_path, format):
+    ds = pytest.importorskip('pyarrow.dataset')
+    for run in range(2):
+        writer = DatasetWriter(str(tmp_path), format=format, batch_size=4, run_id=f"run{run}")
+        writer.add_all(make_post(i, day=i % 3) for i in range(run * 5, run * 5 + 12))
+        writer.close()
+    table = ds.dataset(str(tmp_path / 'posts'), format='parquet' if format == 'parquet' else 'ipc',
+                       partitioning='hive').to_table()
+    assert sorted(table.column('post_id').to_pylist()) == sorted(f"t3_{i}" for i in range(17))
+    assert table.column('matched_keywords').to_pylist()[0] == ['creatine', 'sleep']
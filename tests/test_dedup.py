@@ -0,0 +1,107 @@
+import random
+
+import pytest
+
+import dedup
+from dedup import Deduplicator, content_signature
+
+DAY = 86400
+WORDS = ('creatine loading phase water retention strength gains protein shake timing recovery sleep '
+         'electrolytes hydration cramps marathon training block taper caffeine tolerance dose').split()
+
+REVIEW = ('I have been taking creatine monohydrate every morning for three weeks now and my squat has gone '
+          'up noticeably, although I also feel a little bloated after training so I am drinking more water '
+          'and adding electrolytes to see whether that helps with the cramps at night')
+
+
+def text(seed, words=40):
+    rng = random.Random(seed)
+    return ' '.join(rng.choice(WORDS) for _ in range(words))
+
+
+def post(post_id, body, created_utc=0.0, crosspost_parent=None):
+    content_hash, simhash = content_signature(body.lower())
+    return {'id': post_id, 'created_utc': created_utc, 'crosspost_parent': crosspost_parent,
+            'content_hash': content_hash, 'simhash': simhash}
+
+
+def test_signature_ignores_case_punctuation_and_spacing():
+    assert content_signature('creatine, loading; phase water retention strength gains protein') == \
+        content_signature('creatine loading  phase water retention strength gains protein!')
+
+
+def test_short_posts_get_no_signature():
+    assert content_signature('creatine is great') == (None, None)
+
+
+def test_signature_is_the_same_without_numpy(monkeypatch):
+    body = text(1)
+    expected = content_signature(body)
+    monkeypatch.setattr(dedup, 'np', None)
+    assert content_signature(body) == expected
+
+
+def test_crossposts_join_their_parent():
+    deduplicator = Deduplicator()
+    parent = post('t3_a', text(1))
+    crosspost = post('t3_b', 'a crosspost has its own title', 10, crosspost_parent='t3_a')
+    assert deduplicator.assign(parent) == deduplicator.assign(crosspost) == 0
+    assert deduplicator.crossposts == 1
+
+
+def test_parent_seen_after_its_crosspost():
+    deduplicator = Deduplicator()
+    crosspost = post('t3_b', 'short', 10, crosspost_parent='t3_a')
+    parent = post('t3_a', text(1), 20)
+    assert deduplicator.assign(crosspost) == deduplicator.assign(parent)
+
+
+def test_exact_and_near_duplicates():
+    posts = [post('t3_a', REVIEW), post('t3_b', REVIEW.upper() + '!!', 5),
+             post('t3_c', REVIEW.replace('three weeks', 'four weeks'), 6), post('t3_d', text(3), 7)]
+    deduplicator = Deduplicator()
+    discussions = [deduplicator.assign(p) for p in posts]
+    assert discussions == [0, 0, 0, 1]
+    assert (deduplicator.exact_duplicates, deduplicator.near_duplicates) == (1, 1)
+    assert deduplicator.duplicates == 2
+    assert [p['discussion'] for p in posts] == discussions
+
+
+def test_different_posts_stay_apart():
+    deduplicator = Deduplicator()
+    discussions = [deduplicator.assign(post(f"t3_{i}", text(100 + i), i)) for i in range(200)]
+    assert discussions == list(range(200))
+
+
+@pytest.mark.parametrize('distance, same', [(3, True), (12, False)])
+def test_simhash_distance_threshold(distance, same):
+    deduplicator = Deduplicator(max_distance=5)
+    first = {'id': 't3_a', 'created_utc': 0, 'content_hash': 1, 'simhash': 0}
+    second = {'id': 't3_b', 'created_utc': 1, 'content_hash': 2, 'simhash': (1 << distance) - 1}
+    assert (deduplicator.assign(first) == deduplicator.assign(second)) is same
+
+
+def test_posts_outside_the_window_are_forgotten():
+    deduplicator = Deduplicator(window_days=1)
+    body = text(4)
+    assert deduplicator.assign(post('t3_a', body, 0)) == 0
+    # A newer post moves the window past the first one
+    assert deduplicator.assign(post('t3_b', text(5), 2 * DAY)) == 1
+    assert deduplicator.assign(post('t3_c', body, 2 * DAY)) == 2
+
+
+def test_max_entries_bounds_memory():
+    deduplicator = Deduplicator(max_entries=10)
+    for i in range(100):
+        deduplicator.assign(post(f"t3_{i}", text(200 + i), i))
+    assert len(deduplicator._window) <= 10
+    # The first post has been evicted, so a copy of it starts a new discussion
+    assert deduplicator.assign(post('t3_copy', text(200), 100)) == 100
+
+
+def test_assign_all_keys_discussions_to_the_oldest_post():
+    body = text(6)
+    posts = [post('t3_new', body, 50), post('t3_old', body, 10)]
+    ordered = Deduplicator().assign_all(posts)
+    assert [p['id'] for p in ordered] == ['t3_old', 't3_new']
+    assert {p['discussion'] for p in posts} == {0}
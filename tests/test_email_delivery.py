@@ -0,0 +1,168 @@
+import email
+
+import pytest
+
+from email_delivery import ReportMailer, parse_recipients
+from reddit_monitor import SimpleRedditMonitor
+from smtp_sink import SMTPSink
+
+HTML = '<html><body><h1>Weekly report</h1></body></html>'
+
+
+def mailer_for(sink, **kwargs):
+    kwargs.setdefault('backoff', 0.01)
+    return ReportMailer(sink.host, sink.port, username='reports', password='secret', sender='reports@example.com',
+                        starttls=False, **kwargs)
+
+
+def addresses(count, domain='example.com'):
+    return [f"user{i}@{domain}" for i in range(count)]
+
+
+def test_parse_recipients():
+    assert parse_recipients(' a@x.com; b@x.com,,a@x.com , ') == ['a@x.com', 'b@x.com']
+    assert parse_recipients(None) == []
+
+
+def test_batches_recipients_over_the_pool(sink):
+    recipients = addresses(120)
+    mailer = mailer_for(sink, connections=2, batch_size=50)
+    result = mailer.send(HTML, 'Weekly report', recipients)
+    mailer.close()
+    assert result.ok
+    assert sorted(result.delivered) == sorted(recipients)
+    assert result.transactions == sink.transactions == 3
+    assert sorted(len(rcpts) for _, rcpts, _ in sink.messages) == [20, 50, 50]
+    assert sorted(sink.recipients) == sorted(recipients)
+    assert mailer.connections_opened <= 2
+    assert sink.logins == sink.connections == mailer.connections_opened
+
+    message = email.message_from_bytes(sink.messages[0][2])
+    assert message['Subject'] == 'Weekly report'
+    assert message['To'] == 'undisclosed-recipients:;'
+    assert HTML in message.get_payload(0).get_payload(decode=True).decode()
+
+
+def test_single_recipient_is_named_in_the_to_header(sink):
+    mailer = mailer_for(sink)
+    assert mailer.send(HTML, 'Report', ['only@example.com']).ok
+    mailer.close()
+    assert email.message_from_bytes(sink.messages[0][2])['To'] == 'only@example.com'
+
+
+def test_sessions_stay_logged_in_between_reports(sink):
+    mailer = mailer_for(sink, connections=1)
+    for week in range(3):
+        assert mailer.send(HTML, f"Week {week}", addresses(5)).ok
+    mailer.close()
+    assert mailer.connections_opened == sink.connections == sink.logins == 1
+    assert sink.transactions == 3
+
+
+def test_send_many_shares_the_pool(sink):
+    mailer = mailer_for(sink, connections=2, batch_size=10)
+    reports = [(HTML, f"Watchlist {i}", addresses(25, f"team{i}.com")) for i in range(4)]
+    result = mailer.send_many(reports)
+    mailer.close()
+    assert result.ok and len(result.delivered) == 100
+    assert result.transactions == sink.transactions == 12
+    assert sink.connections <= 2
+
+
+def test_permanent_refusals_are_not_retried():
+    rejected = ['gone@example.com']
+    with SMTPSink(reject=rejected) as sink:
+        mailer = mailer_for(sink)
+        result = mailer.send(HTML, 'Report', addresses(3) + rejected)
+        mailer.close()
+    assert not result.ok
+    assert sorted(result.delivered) == addresses(3)
+    assert list(result.failed) == rejected
+    assert result.failed['gone@example.com'].startswith('550')
+    assert result.retries == 0
+
+
+def test_all_recipients_refused():
+    rejected = addresses(2)
+    with SMTPSink(reject=rejected) as sink:
+        mailer = mailer_for(sink)
+        result = mailer.send(HTML, 'Report', rejected)
+        mailer.close()
+    assert result.delivered == []
+    assert set(result.failed) == set(rejected)
+    assert all(error.startswith('550') for error in result.failed.values())
+
+
+def test_transient_refusals_are_retried():
+    recipients = addresses(40)
+    with SMTPSink(flaky_rate=0.3, seed=1) as sink:
+        mailer = mailer_for(sink, max_retries=10)
+        result = mailer.send(HTML, 'Report', recipients)
+        mailer.close()
+        delivered = sink.recipients
+    assert result.ok
+    assert result.retries > 0
+    assert sorted(result.delivered) == sorted(delivered) == sorted(recipients)
+
+
+def test_transient_refusals_fail_after_max_retries():
+    with SMTPSink(flaky_rate=1.0) as sink:
+        mailer = mailer_for(sink, max_retries=2)
+        result = mailer.send(HTML, 'Report', addresses(3))
+        mailer.close()
+    assert result.delivered == []
+    assert result.retries == 6
+    assert all(error.startswith('451') for error in result.failed.values())
+
+
+def test_unreachable_server_fails_every_recipient():
+    with SMTPSink() as sink:
+        host, port = sink.host, sink.port
+    mailer = ReportMailer(host, port, starttls=False, sender='reports@example.com', max_retries=1, backoff=0.01)
+    result = mailer.send(HTML, 'Report', addresses(2))
+    assert set(result.failed) == set(addresses(2))
+    assert mailer.connections_opened == 0
+
+
+@pytest.mark.parametrize('batch_size', [1, 7])
+def test_each_recipient_gets_one_copy(sink, batch_size):
+    recipients = addresses(15) + addresses(3)
+    mailer = mailer_for(sink, batch_size=batch_size, connections=3)
+    result = mailer.send(HTML, 'Report', recipients)
+    mailer.close()
+    assert sorted(sink.recipients) == sorted(addresses(15))
+    assert result.transactions == -(-15 // batch_size)
+
+
+def report_chunks(parts=3):
+    for i in range(parts):
+        yield f"<p>part {i}</p>"
+
+
+def test_monitor_streams_the_report_and_emails_the_saved_file(sink, tmp_path, monkeypatch):
+    for name, value in {'SMTP_SERVER': sink.host, 'SMTP_PORT': str(sink.port), 'SMTP_STARTTLS': '0',
+                        'EMAIL_FROM': 'reports@example.com', 'EMAIL_PASSWORD': 'secret',
+                        'EMAIL_TO': 'team@example.com'}.items():
+        monkeypatch.setenv(name, value)
+    monitor = SimpleRedditMonitor()
+    path = tmp_path / 'report.html'
+    assert monitor.deliver_report(report_chunks(), 'Weekly report', filename=str(path))
+    monitor.close()
+    assert path.read_text() == ''.join(report_chunks())
+    body = email.message_from_bytes(sink.messages[0][2]).get_payload(0).get_payload(decode=True).decode()
+    assert path.read_text() in body
+
+
+def test_monitor_without_email_never_reads_the_report_back(tmp_path, monkeypatch):
+    for name in ('EMAIL_FROM', 'EMAIL_PASSWORD', 'EMAIL_TO'):
+        monkeypatch.delenv(name, raising=False)
+    monitor = SimpleRedditMonitor()
+
+    def unread(filename):
+        pytest.fail('the report was joined without email configured')
+        yield
+
+    monkeypatch.setattr(monitor, '_read_report', unread)
+    path = tmp_path / 'report.html'
+    assert not monitor.deliver_report(report_chunks(), filename=str(path))
+    assert path.read_text() == ''.join(report_chunks())
@@ -0,0 +1,124 @@
+import os
+import time
+
+import pytest
+
+from http_cache import CacheMiss, ResponseCache
+from reddit_fetcher import RedditFetcher
+
+DAY = 86400
+
+
+class Response:
+    """Just enough of requests.Response for ResponseCache.update"""
+
+    def __init__(self, status_code=200, content=b'{}', headers=None):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+
+
+def url(n):
+    return f"https://www.reddit.com/r/fitness/new.json?limit=100&after=t3_{n}"
+
+
+def test_fresh_entries_are_served_from_disk(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=60)
+    assert cache.lookup(url(1)) is None
+    cache.update(url(1), Response(content=b'{"kind": "Listing"}', headers={'ETag': '"v1"'}))
+    cached = cache.lookup(url(1))
+    assert cached.from_cache and cached.status_code == 200
+    assert cached.json() == {'kind': 'Listing'}
+    assert (cache.hits, cache.misses) == (1, 1)
+    # Another process sees the same entry
+    assert ResponseCache(str(tmp_path), ttl=60).lookup(url(1)).content == b'{"kind": "Listing"}'
+
+
+def test_stale_entries_are_revalidated(tmp_path):
+    cache = ResponseCache(str(tmp_path), ttl=0)
+    cache.update(url(1), Response(content=b'[1]', headers={'ETag': '"v1"', 'Last-Modified': 'yesterday'}))
+    assert cache.lookup(url(1)) is None
+    assert cache.conditional_headers(url(1)) == {'If-None-Match': '"v1"', 'If-Modified-Since': 'yesterday'}
+    refreshed = cache.update(url(1), Response(status_code=304))
+    assert refreshed.from_cache and refreshed.json() == [1]
+    assert cache.revalidations == 1
+
+
+def test_not_modified_without_an_entry_is_passed_back(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    response = Response(status_code=304)
+    assert cache.update(url(1), response) is response
+    # The body went missing behind the cache's back: the 304 can't be served
+    cache.update(url(2), Response(content=b'[2]', headers={'ETag': '"v2"'}))
+    os.remove(cache._paths(url(2))[1])
+    response = Response(status_code=304)
+    assert cache.update(url(2), response) is response
+    assert cache.conditional_headers(url(2)) == {}
+
+
+def test_errors_are_not_cached(tmp_path):
+    cache = ResponseCache(str(tmp_path))
+    cache.update(url(1), Response(status_code=503, content=b'busy'))
+    assert cache.lookup(url(1)) is None
+    assert os.listdir(tmp_path) == []
+
+
+def test_least_recently_used_entries_are_evicted(tmp_path):
+    body = b'x' * 1000
+    cache = ResponseCache(str(tmp_path), max_bytes=4000)
+    for n in range(3):
+        cache.update(url(n), Response(content=body))
+    # Reading the first entry makes the second the least recently used
+    assert cache.lookup(url(0)) is not None
+    cache.update(url(3), Response(content=body))
+    assert [cache.lookup(url(n)) is not None for n in range(4)] == [True, False, True, True]
+    assert cache._total <= cache.max_bytes
+    assert cache._total == sum(os.path.getsize(tmp_path / name) for name in os.listdir(tmp_path))
+
+
+def test_eviction_order_survives_a_restart(tmp_path):
+    body = b'x' * 1000
+    cache = ResponseCache(str(tmp_path), max_bytes=10_000)
+    now = time.time()
+    for n, age in enumerate([10, 30, 20]):
+        cache.update(url(n), Response(content=body))
+        for path in cache._paths(url(n)):
+            os.utime(path, (now - age, now - age))
+
+    restarted = ResponseCache(str(tmp_path), max_bytes=3000)
+    restarted.evict()
+    assert [restarted.lookup(url(n)) is not None for n in range(3)] == [True, False, True]
+
+
+def test_replay_serves_stale_entries_and_never_misses_quietly(tmp_path):
+    ResponseCache(str(tmp_path)).update(url(1), Response(content=b'[1]'))
+    replay = ResponseCache(str(tmp_path), ttl=0, replay=True)
+    assert replay.lookup(url(1)).json() == [1]
+    with pytest.raises(CacheMiss):
+        replay.lookup(url(2))
+
+
+def test_fetcher_revalidates_and_replays_against_the_stub(stub, tmp_path):
+    stub.posts_per_subreddit = 250
+    cutoff = time.time() - 30 * DAY
+
+    def fetch(cache):
+        fetcher = RedditFetcher(base_url=stub.base_url, rate=1000, backoff=0.01, cache=cache)
+        fetcher.verbose = False
+        return fetcher.fetch_subreddit('fitness', cutoff)
+
+    first = fetch(ResponseCache(str(tmp_path), ttl=0))
+    requests_made = stub.request_count
+    assert first.ok and len(first.posts) == 250
+
+    # Every page is stale, so each one is revalidated with its ETag and comes back 304
+    cache = ResponseCache(str(tmp_path), ttl=0)
+    second = fetch(cache)
+    assert cache.revalidations == second.pages == 3
+    assert stub.request_count == 2 * requests_made
+    assert [post['name'] for post in second.posts] == [post['name'] for post in first.posts]
+
+    # Replay never touches the network
+    replayed = fetch(ResponseCache(str(tmp_path), replay=True))
+    assert stub.request_count == 2 * requests_made
+    assert [post['name'] for post in replayed.posts] == [post['name'] for post in first.posts]
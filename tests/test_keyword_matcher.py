@@ -0,0 +1,99 @@
+import random
+import string
+
+import pytest
+
+import keyword_matcher
+from keyword_matcher import KeywordMatcher
+
+
+def substring_loop(keywords, competitors, text):
+    """The per-keyword loop the compiled matcher replaced"""
+    return ([kw for kw in keywords if kw.lower() in text],
+            [comp for comp in competitors if comp.lower() in text])
+
+
+KEYWORDS = ['pre workout', 'pre', 'workout', 'creatine', 'creatine monohydrate', 'beta alanine',
+            'electrolytes', 'hydration', 'protein', 'protein powder', 'whey protein', 'sleep']
+COMPETITORS = ['myprotein', 'my', 'optimum nutrition', 'esn', 'puresport', 'nutrition', 'protein']
+
+
+@pytest.fixture(params=['loop', 'regex'])
+def scan(request, monkeypatch):
+    """Run with small pattern sets on the substring loop and on the trie regex"""
+    if request.param == 'regex':
+        monkeypatch.setattr(keyword_matcher, 'LOOP_MAX_PATTERNS', 0)
+    return request.param
+
+
+@pytest.mark.parametrize('text', [
+    'best pre workout for sleep?',
+    'creatine monohydrate vs creatine hcl',
+    'myprotein whey protein powder review',
+    'optimum nutrition or esn, which has better hydration',
+    'prepre workoutworkout',
+    'nothing relevant here',
+    '',
+    'beta alaninebeta alanine electrolyteselectrolytes',
+])
+def test_matches_like_the_substring_loop(scan, text):
+    matcher = KeywordMatcher(KEYWORDS, COMPETITORS)
+    assert matcher.match(text) == substring_loop(KEYWORDS, COMPETITORS, text)
+
+
+def test_matches_like_the_substring_loop_on_random_text(scan):
+    rng = random.Random(7)
+
+    def word():
+        return ''.join(rng.choice('abcde') for _ in range(rng.randint(1, 4)))
+
+    keywords = sorted({' '.join(word() for _ in range(rng.randint(1, 2))) for _ in range(60)})
+    competitors = sorted({word() + word() for _ in range(30)})
+    matcher = KeywordMatcher(keywords, competitors)
+    for _ in range(300):
+        text = ' '.join(word() for _ in range(rng.randint(0, 40)))
+        assert matcher.match(text) == substring_loop(keywords, competitors, text), text
+
+
+def test_repeated_patterns_keep_their_repeats(scan):
+    keywords = ['creatine', 'whey', 'creatine']
+    matcher = KeywordMatcher(keywords, [])
+    text = 'creatine and whey'
+    assert matcher.match(text) == substring_loop(keywords, [], text) == (['creatine', 'whey', 'creatine'], [])
+
+
+def test_word_boundaries():
+    matcher = KeywordMatcher(['pre'], ['esn'], word_boundaries=True)
+    assert matcher.match('pre and esn') == (['pre'], ['esn'])
+    assert matcher.match('prepare a lesson') == ([], [])
+
+
+def test_brand_variants_resolve_to_the_brand():
+    matcher = KeywordMatcher(['creatine'], ['Optimum Nutrition', 'Cadence'], brand_variants=True)
+    assert matcher.match('optimum-nutrition creatine') == (['creatine'], ['Optimum Nutrition'])
+    assert matcher.match('tried cadance yesterday') == ([], ['Cadence'])
+    # One edit away from the brand, but an ordinary word
+    assert matcher.match('the cadency of a verse') == ([], [])
+
+
+def test_scan_path_follows_the_pattern_count():
+    assert KeywordMatcher(KEYWORDS, COMPETITORS)._loop_patterns is not None
+    many = [f"pattern {i}" for i in range(keyword_matcher.LOOP_MAX_PATTERNS + 1)]
+    assert KeywordMatcher(many, [])._loop_patterns is None
+    assert KeywordMatcher(KEYWORDS, COMPETITORS, word_boundaries=True)._loop_patterns is None
+
+
+def test_match_ids_reports_competitor_spans():
+    matcher = KeywordMatcher(['whey'], ['esn', 'myprotein'])
+    text = 'myprotein whey beats esn'
+    spans = []
+    keyword_ids, competitor_ids = matcher.match_ids(text, spans)
+    assert (keyword_ids, competitor_ids) == ((0,), (0, 1))
+    assert sorted((index, text[start:end]) for index, start, end in spans) == [(0, 'esn'), (1, 'myprotein')]
+
+
+def test_punctuation_heavy_text(scan):
+    keywords = ['c++', 'pre-workout', 'a.b']
+    matcher = KeywordMatcher(keywords, [])
+    text = string.punctuation + ' pre-workout c++ a.b axb'
+    assert matcher.match(text) == substring_loop(keywords, [], text)
@@ -0,0 +1,88 @@
+import json
+import random
+
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from match_stage import MatchStage
+from sentiment import SentimentScorer
+
+KEYWORDS = ['creatine', 'pre workout', 'electrolytes', 'protein powder']
+COMPETITORS = ['myprotein', 'esn', 'puresport']
+WORDS = ('creatine pre workout electrolytes protein powder myprotein esn puresport great awful love hate '
+         'bloated sleep run lift recovery week the a is and').split()
+
+
+def raw_posts(count=500, seed=9):
+    """Posts in every shape the stage accepts: JSON text and bytes, bare and listing-wrapped dicts"""
+    rng = random.Random(seed)
+    posts = []
+    for i in range(count):
+        data = {'id': f"p{i}", 'name': f"t3_p{i}", 'title': ' '.join(rng.choice(WORDS) for _ in range(6)),
+                'selftext': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 40))),
+                'score': rng.randrange(100), 'num_comments': rng.randrange(20), 'created_utc': 1_700_000_000 + i,
+                'subreddit': rng.choice(['fitness', 'running']), 'permalink': f"/r/fitness/comments/p{i}/"}
+        if i % 7 == 0:
+            data['title'] = data['selftext'] = 'nothing to see here'
+        shape = i % 4
+        posts.append(json.dumps(data) if shape == 0 else json.dumps(data).encode() if shape == 1
+                     else data if shape == 2 else {'kind': 't3', 'data': data})
+    return posts
+
+
+def fields(record):
+    return (record.id, record.created_utc, record.title, record.subreddit, record.keyword_ids,
+            record.competitor_ids, record.path, record.content_hash, record.simhash, record.competitor_sentiment)
+
+
+@pytest.fixture
+def matcher():
+    return KeywordMatcher(KEYWORDS, COMPETITORS)
+
+
+@pytest.mark.parametrize('with_sentiment', [False, True])
+def test_pool_matches_like_the_serial_stage(matcher, with_sentiment):
+    posts = raw_posts()
+    sentiment = SentimentScorer() if with_sentiment else None
+    serial = [fields(record) for record in MatchStage(matcher, processes=0, sentiment=sentiment).match(posts)]
+    with MatchStage(matcher, processes=2, batch_size=37, sentiment=sentiment) as stage:
+        pooled = [fields(record) for record in stage.match(posts)]
+    assert pooled == serial
+    # Only matching posts come back, in input order
+    assert 0 < len(serial) < len(posts)
+    assert [row[0] for row in serial] == sorted((row[0] for row in serial), key=lambda name: int(name[4:]))
+    assert all(row[4] or row[5] for row in serial)
+    assert any(row[9] for row in serial) is with_sentiment
+
+
+def test_subreddit_name_overrides_the_posts(matcher):
+    records = list(MatchStage(matcher).match(raw_posts(50), subreddit_name='Fitness'))
+    assert {record.subreddit for record in records} == {'Fitness'}
+
+
+def test_pool_is_started_once_and_reused(matcher):
+    stage = MatchStage(matcher, processes=2, batch_size=50)
+    first = list(stage.match(raw_posts(200)))
+    executor = stage._executor
+    second = list(stage.match(raw_posts(200)))
+    assert stage._executor is executor
+    assert [fields(record) for record in first] == [fields(record) for record in second]
+    stage.close()
+    assert stage._executor is None
+
+
+def test_stopping_early_leaves_the_pool_usable(matcher):
+    with MatchStage(matcher, processes=2, batch_size=10) as stage:
+        matches = stage.match(raw_posts(300))
+        next(matches)
+        matches.close()
+        assert len(list(stage.match(raw_posts(30)))) == len(list(MatchStage(matcher).match(raw_posts(30))))
+
+
+@pytest.mark.parametrize('processes', [0, 2])
+def test_signatures_are_only_computed_for_dedup(matcher, processes):
+    with MatchStage(matcher, processes=processes, batch_size=50) as stage:
+        assert any(record.simhash is not None for record in stage.match(raw_posts(100)))
+    with MatchStage(matcher, processes=processes, batch_size=50, signatures=False) as stage:
+        records = list(stage.match(raw_posts(100)))
+    assert records and all(record.content_hash is None and record.simhash is None for record in records)
@@ -0,0 +1,96 @@
+import time
+from datetime import date
+
+import pytest
+
+from aggregation import SECONDS_PER_DAY
+from post_index import PostIndex, fts_query
+from reddit_monitor import SimpleRedditMonitor
+
+DAY0 = 19_700 * SECONDS_PER_DAY
+
+
+def listing_post(post_id, title, subreddit='Fitness', day=0, score=1, num_comments=0, selftext=''):
+    return {'id': post_id, 'name': f"t3_{post_id}", 'subreddit': subreddit, 'created_utc': DAY0 + day * SECONDS_PER_DAY,
+            'score': score, 'num_comments': num_comments, 'permalink': f"/r/{subreddit}/comments/{post_id}/",
+            'title': title, 'selftext': selftext}
+
+
+POSTS = [
+    listing_post('a', 'Creatine loading phase', score=50),
+    listing_post('b', 'Pre workout before a run', 'running', day=1, score=5, num_comments=3),
+    listing_post('c', 'Protein powder review', 'nutrition', day=2, selftext='creatine monohydrate works'),
+    listing_post('d', 'Creatinine levels and creatine', 'Fitness', day=3, score=10, num_comments=20),
+    listing_post('e', 'Rest day thoughts', 'Running', day=4),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    index = PostIndex(str(tmp_path / 'index.db'))
+    index.add(POSTS)
+    yield index
+    index.close()
+
+
+def test_fts_query_quotes_terms():
+    assert fts_query('pre workout') == '"pre workout"'
+    assert fts_query('creat*') == '"creat"*'
+    assert fts_query('say "hi"') == '"say ""hi"""'
+
+
+def test_posts_seen_again_only_refresh_engagement(index):
+    assert index.add([listing_post('a', 'Edited title', score=99, num_comments=7), listing_post('f', 'New')]) == 1
+    assert index.post_count() == 6
+    [post] = [post for post in index.posts() if post['name'] == 't3_a']
+    assert (post['title'], post['score'], post['num_comments']) == ('Creatine loading phase', 99, 7)
+    # The text was indexed once
+    assert index.query('creatine').count == 3
+
+
+def test_query_counts_and_top_posts(index):
+    result = index.query('creatine')
+    assert result.count == 3
+    assert result.by_subreddit == {'Fitness': 2, 'nutrition': 1}
+    assert result.by_day == {date(2023, 12, 9): 1, date(2023, 12, 11): 1, date(2023, 12, 12): 1}
+    assert [post['id'] for post in result.top_posts] == ['t3_a', 't3_d', 't3_c']
+    assert result.top_posts[0]['permalink'] == 'https://reddit.com/r/Fitness/comments/a/'
+    assert index.query('pre workout').count == 1
+    assert index.query('creat*').count == 3
+    assert index.query('creatine', top=1).top_posts[0]['id'] == 't3_a'
+
+
+def test_query_by_range_and_subreddit(index):
+    assert index.query('creatine', since_utc=DAY0 + SECONDS_PER_DAY).count == 2
+    assert index.query('creatine', until_utc=DAY0 + 3 * SECONDS_PER_DAY).count == 2
+    assert index.query('creatine', since_utc=DAY0 + 10 * SECONDS_PER_DAY).count == 0
+    assert index.query('creatine', subreddits=['fitness']).count == 2
+
+
+def test_posts_stream_back_in_listing_shape(index):
+    posts = list(index.posts(since_utc=DAY0 + SECONDS_PER_DAY, until_utc=DAY0 + 4 * SECONDS_PER_DAY))
+    assert [post['name'] for post in posts] == ['t3_b', 't3_c', 't3_d']
+    assert posts[1] == {'name': 't3_c', 'subreddit': 'nutrition', 'created_utc': DAY0 + 2 * SECONDS_PER_DAY,
+                        'score': 1, 'num_comments': 0, 'permalink': '/r/nutrition/comments/c/',
+                        'title': 'Protein powder review', 'selftext': 'creatine monohydrate works',
+                        'crosspost_parent': None}
+
+
+def test_subreddits_are_matched_case_insensitively(index):
+    # Reddit stores 'Fitness'; the monitor is configured with lowercase names
+    assert [post['name'] for post in index.posts(subreddits=['fitness', 'RUNNING'])] == \
+        ['t3_a', 't3_b', 't3_d', 't3_e']
+    assert index.oldest(['fitness', 'running']) == {'Fitness': DAY0, 'running': DAY0 + SECONDS_PER_DAY}
+    assert index.oldest(['nutrition']) == {'nutrition': DAY0 + 2 * SECONDS_PER_DAY}
+
+
+def test_report_from_the_index_finds_reddit_cased_subreddits(tmp_path):
+    monitor = SimpleRedditMonitor(index_path=str(tmp_path / 'index.db'))
+    monitor.subreddits = ['fitness']
+    now = time.time()
+    monitor.post_index.add([dict(listing_post('a', 'Creatine every day'), created_utc=now - 3600),
+                            dict(listing_post('b', 'Nothing to see'), created_utc=now - 7200)])
+    posts = monitor.search_index(days_back=1)
+    assert [post['id'] for post in posts] == ['t3_a']
+    assert monitor.covered_since == pytest.approx(now - 7200)
+    monitor.close()
@@ -0,0 +1,51 @@
+import pytest
+
+from keyword_matcher import KeywordMatcher
+from match_stage import match_batch
+from post_index import PostIndex
+from post_record import PostRecord, post_fullname
+
+MATCHER = KeywordMatcher(['creatine', 'whey'], ['myprotein'])
+
+
+def listing_data(**fields):
+    data = {'id': 'abc123', 'name': 't3_abc123', 'title': 'Creatine or myprotein whey?', 'selftext': '',
+            'score': 12, 'num_comments': 3, 'created_utc': 1_700_000_000.0, 'subreddit': 'fitness',
+            'permalink': '/r/fitness/comments/abc123/creatine/'}
+    data.update(fields)
+    return data
+
+
+def record_for(data):
+    keyword_ids, competitor_ids = MATCHER.match_ids(data['title'].lower())
+    return PostRecord.from_listing(data, 'fitness', keyword_ids, competitor_ids, MATCHER)
+
+
+def test_fullname_falls_back_to_the_id():
+    assert post_fullname(listing_data()) == 't3_abc123'
+    assert post_fullname(listing_data(name=None)) == 't3_abc123'
+    with pytest.raises(KeyError):
+        post_fullname({'title': 'no id at all'})
+
+
+def test_posts_without_a_name_get_the_same_id_everywhere(tmp_path):
+    data = listing_data()
+    del data['name']
+    assert record_for(data).id == 't3_abc123'
+    assert match_batch(MATCHER, [data])[0][0] == 't3_abc123'
+    index = PostIndex(str(tmp_path / 'index.db'))
+    index.add([data])
+    assert [post['name'] for post in index.posts()] == ['t3_abc123']
+
+
+def test_record_reads_like_a_post_dict():
+    record = record_for(listing_data())
+    assert record['matched_keywords'] == ['creatine', 'whey']
+    assert record['matched_competitors'] == ['myprotein']
+    assert record.permalink == 'https://reddit.com/r/fitness/comments/abc123/creatine/'
+    assert record.get('missing', 'default') == 'default'
+    with pytest.raises(KeyError):
+        record['missing']
+    post = dict(record)
+    assert set(post) == set(PostRecord.FIELDS)
+    assert post['id'] == 't3_abc123' and post['score'] == 12
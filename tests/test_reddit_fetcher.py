@@ -0,0 +1,138 @@
+import asyncio
+import time
+
+import pytest
+
+from reddit_fetcher import RedditFetcher, TokenBucket
+from reddit_stub import RedditStub
+
+DAY = 86400
+
+
+def fetcher_for(stub, **kwargs):
+    fetcher = RedditFetcher(base_url=stub.base_url, rate=kwargs.pop('rate', 1000), backoff=0.01, **kwargs)
+    fetcher.verbose = False
+    return fetcher
+
+
+def test_token_bucket_allows_a_burst_then_paces():
+    bucket = TokenBucket(rate=20, capacity=3)
+    waits = [bucket.acquire() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    # Two more tokens at 20 per second take about 0.1s
+    assert 0.03 < sum(waits[3:]) < 0.3
+
+
+def test_token_bucket_pause_holds_callers_back():
+    bucket = TokenBucket(rate=1000, capacity=10)
+    bucket.pause(0.2)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_token_bucket_spreads_the_servers_remaining_budget():
+    bucket = TokenBucket(rate=100, capacity=1)
+    bucket.acquire()
+    bucket.observe(remaining=10, reset=10)
+    assert bucket.rate == pytest.approx(1.0, rel=0.2)
+    bucket.observe(remaining=0, reset=0.2)
+    started = time.monotonic()
+    bucket.acquire()
+    assert time.monotonic() - started >= 0.15
+
+
+def test_pages_back_to_the_cutoff(stub):
+    stub.posts_per_subreddit = 250
+    stub.spacing = 600
+    fetcher = fetcher_for(stub)
+    result = fetcher.fetch_subreddit('fitness', time.time() - 1000 * 600)
+    assert result.ok and result.complete
+    assert result.pages == 3
+    assert len(result.posts) == 250
+    assert [post['created_utc'] for post in result.posts] == sorted(
+        (post['created_utc'] for post in result.posts), reverse=True)
+
+
+def test_stops_at_the_high_water_mark(stub):
+    fetcher = fetcher_for(stub)
+    listing = stub.listing_for('fitness')
+    mark = listing[10]['data']
+    result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY,
+                                     high_water={'fitness': (mark['name'], mark['created_utc'])})
+    assert [post['name'] for post in result.posts] == [child['data']['name'] for child in listing[:10]]
+    assert result.complete
+
+
+def test_truncated_at_max_pages(stub):
+    stub.posts_per_subreddit = 500
+    fetcher = fetcher_for(stub, max_pages=2)
+    result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+    assert result.ok and result.truncated and not result.complete
+    assert len(result.posts) == 200
+    assert result.covered_since() == result.posts[-1]['created_utc']
+
+
+def test_last_page_is_not_truncated(stub):
+    stub.posts_per_subreddit = 200
+    fetcher = fetcher_for(stub, max_pages=2)
+    result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+    assert result.complete
+    assert len(result.posts) == 200
+
+
+def test_retries_server_errors():
+    with RedditStub(fault_rate=0.5, fault_burst=2, posts_per_subreddit=300) as stub:
+        fetcher = fetcher_for(stub, max_retries=4)
+        result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+        faults = stub.faults
+    assert faults > 0
+    assert result.ok and len(result.posts) == 300
+    assert result.retries == faults
+
+
+def test_gives_up_after_max_retries():
+    with RedditStub(fault_rate=1.0, fault_burst=10) as stub:
+        fetcher = fetcher_for(stub, max_retries=2)
+        result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+    assert not result.ok
+    assert result.error.startswith('HTTP 5')
+    assert result.retries == 2
+
+
+def test_honours_retry_after():
+    with RedditStub(rate_limit=2, rate_window=1.0, posts_per_subreddit=350) as stub:
+        fetcher = fetcher_for(stub)
+        # Ignore the stub's x-ratelimit headers so the third request is refused
+        fetcher._observe_limits = lambda response: None
+        started = time.monotonic()
+        result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+        elapsed = time.monotonic() - started
+        throttled = stub.throttled
+    assert result.ok and len(result.posts) == 350
+    assert throttled >= 1
+    assert result.retries == throttled
+    # Retry-After: 1 is waited out rather than retried straight away
+    assert elapsed >= 0.9
+    assert result.waited >= 0.9
+
+
+def test_stays_inside_the_advertised_rate_limit():
+    with RedditStub(rate_limit=3, rate_window=1.0, posts_per_subreddit=500) as stub:
+        fetcher = fetcher_for(stub)
+        result = fetcher.fetch_subreddit('fitness', time.time() - 30 * DAY)
+        throttled = stub.throttled
+    assert result.ok and result.pages == 5
+    assert throttled == 0
+
+
+def test_async_fetch_matches_sequential(stub):
+    stub.posts_per_subreddit = 150
+    fetcher = fetcher_for(stub, concurrency=3)
+    names = ['fitness', 'running', 'nutrition']
+    cutoff = time.time() - 30 * DAY
+    results = asyncio.run(fetcher.fetch_all_async(names, cutoff))
+    sequential = list(fetcher.fetch_all(names, cutoff))
+    assert [result.subreddit_name for result in results] == names
+    assert [[post['name'] for post in result.posts] for result in results] == \
+        [[post['name'] for post in result.posts] for result in sequential]
@@ -0,0 +1,67 @@
+import types
+
+from aggregation import MatchColumns
+from keyword_matcher import KeywordMatcher
+from report_renderer import ReportRenderer, sparkline
+
+MATCHER = KeywordMatcher(['creatine', 'pre <workout>'], ['myprotein', 'b&q'])
+
+
+def make_post(index, title='Creatine question', **fields):
+    post = {'id': f"t3_{index}", 'title': title, 'subreddit': 'fitness', 'created_utc': 1_700_000_000 + index,
+            'score': index, 'num_comments': 0, 'permalink': f"https://reddit.com/r/fitness/comments/{index}/",
+            'matched_keywords': ['creatine'], 'matched_competitors': []}
+    post.update(fields)
+    return post
+
+
+def render(posts, renderer=None, **kwargs):
+    renderer = renderer or ReportRenderer()
+    return renderer.render(MatchColumns.from_posts(posts, MATCHER), '2024-01-01', ['fitness'], **kwargs)
+
+
+def test_interpolated_values_are_escaped():
+    post = make_post(1, title='<script>alert("hi")</script> & more', subreddit='fit<ness>',
+                     permalink='https://reddit.com/r/x/"onmouseover="steal()',
+                     matched_keywords=['pre <workout>'], matched_competitors=['b&q'])
+    html = ''.join(render([post], watchlist='Team <A> & B'))
+    assert '<script>' not in html
+    assert '&lt;script&gt;alert(&quot;hi&quot;)&lt;/script&gt; &amp; more' in html
+    assert 'r/fit&lt;ness&gt;' in html
+    assert 'href="https://reddit.com/r/x/&quot;onmouseover=&quot;steal()"' in html
+    assert 'pre &lt;workout&gt;' in html and 'pre <workout>' not in html
+    assert 'B&amp;Q' in html
+    assert 'Team &lt;A&gt; &amp; B' in html
+
+
+def test_report_is_streamed_in_chunks():
+    posts = [make_post(i) for i in range(25)]
+    chunks = render(posts, ReportRenderer(top_posts=None))
+    assert isinstance(chunks, types.GeneratorType)
+    first = next(chunks)
+    assert first.lstrip().startswith('<!DOCTYPE html>')
+    rest = list(chunks)
+    # Each post is its own chunk
+    assert sum('<div class="post">' in chunk for chunk in rest) == 25
+    assert all(chunk.count('<div class="post">') <= 1 for chunk in rest)
+    assert rest[-1].strip().endswith('</html>')
+
+
+def test_sample_posts_are_the_most_engaging():
+    posts = [make_post(i, title=f"Post {i}") for i in range(20)]
+    html = ''.join(render(posts, ReportRenderer(top_posts=3)))
+    assert [title for title in (f"Post {i}" for i in range(20)) if f">{title}</a>" in html] == \
+        ['Post 17', 'Post 18', 'Post 19']
+
+
+def test_empty_report():
+    html = ''.join(render([]))
+    assert 'No competitor mentions found this week.' in html
+    assert '<div class="post">' not in html
+    assert html.strip().endswith('</html>')
+
+
+def test_sparkline_scales_to_the_peak():
+    svg = sparkline([0, 5, 10], width=12, height=12)
+    assert 'points="1.0,11.0 6.0,6.0 11.0,1.0"' in svg
+    assert 'points=' in sparkline([])
@@ -0,0 +1,99 @@
+import json
+import os
+import time
+
+import pytest
+
+from reddit_fetcher import SubredditFetch
+from reddit_monitor import SimpleRedditMonitor
+from run_metrics import RunMetrics
+
+
+def fetch_result(name, posts=3, error=None, truncated=False):
+    result = SubredditFetch(name)
+    result.posts = [{'id': i} for i in range(posts)]
+    result.pages, result.bytes, result.status = 2, 4096, 200 if error is None else 503
+    result.elapsed, result.waited, result.retries = 1.5, 0.25, 1
+    result.error, result.truncated = error, truncated
+    return result
+
+
+@pytest.fixture
+def metrics():
+    metrics = RunMetrics('report')
+    metrics.record_fetch(fetch_result('fitness'))
+    metrics.record_fetch(fetch_result('running', posts=0, error='HTTP 503'))
+    metrics.record_fetch(fetch_result('Health "&" Fitness', truncated=True))
+    metrics.count('posts_scanned', 1000)
+    metrics.stages['match'] = 0.5
+    metrics.finish()
+    return metrics
+
+
+def test_stages_accumulate():
+    metrics = RunMetrics()
+    for _ in range(2):
+        with metrics.stage('render'):
+            time.sleep(0.01)
+    assert metrics.stages['render'] >= 0.02
+
+    def slow():
+        for item in range(3):
+            time.sleep(0.01)
+            yield item
+
+    assert list(metrics.timed('fetch', slow())) == [0, 1, 2]
+    assert metrics.stages['fetch'] >= 0.03
+
+
+def test_summary_json(metrics, tmp_path):
+    summary = json.loads(open(metrics.write_json(str(tmp_path / 'run.json'))).read())
+    assert summary['status'] == 'ok' and summary['mode'] == 'report'
+    assert summary['counters'] == {'pages': 6, 'bytes': 12288, 'posts_fetched': 6, 'rate_limit_wait_seconds': 0.75,
+                                   'retries': 3, 'fetch_errors': 1, 'fetch_truncated': 1, 'posts_scanned': 1000}
+    assert summary['subreddits']['running']['error'] == 'HTTP 503'
+    assert summary['subreddits']['fitness']['seconds'] == 1.5
+    assert summary['match_posts_per_second'] == 2000.0
+
+
+def test_history_gets_one_line_per_run(metrics, tmp_path):
+    path = str(tmp_path / 'history.jsonl')
+    metrics.append_jsonl(path)
+    RunMetrics('backfill').append_jsonl(path)
+    runs = [json.loads(line) for line in open(path)]
+    assert [run['mode'] for run in runs] == ['report', 'backfill']
+    assert runs[0]['counters']['posts_fetched'] == 6
+
+
+def test_prometheus_textfile(metrics, tmp_path):
+    path = metrics.write_prometheus(str(tmp_path / 'reddit.prom'))
+    lines = open(path).read().splitlines()
+    assert os.listdir(tmp_path) == ['reddit.prom']
+    assert 'reddit_monitor_run_success{mode="report"} 1' in lines
+    assert 'reddit_monitor_stage_seconds{mode="report",stage="match"} 0.5' in lines
+    assert '# TYPE reddit_monitor_fetch_errors gauge' in lines
+    assert 'reddit_monitor_posts_fetched{mode="report"} 6' in lines
+    assert 'reddit_monitor_subreddit_fetch_status{mode="report",subreddit="running"} 503' in lines
+    assert 'reddit_monitor_subreddit_fetch_posts{mode="report",subreddit="Health \\"&\\" Fitness"} 3' in lines
+    # Every sample line is "name{labels} number"
+    for line in lines:
+        if not line.startswith('#'):
+            float(line.rsplit(' ', 1)[1])
+
+
+def test_failed_runs_report_no_success(tmp_path):
+    metrics = RunMetrics('daemon')
+    metrics.finish('failed')
+    assert 'reddit_monitor_run_success{mode="daemon"} 0' in metrics.prometheus_lines()
+
+
+def test_monitor_appends_finished_runs_to_the_history(tmp_path):
+    history = tmp_path / 'metrics_history.jsonl'
+    monitor = SimpleRedditMonitor(metrics_path=str(tmp_path / 'run.json'), metrics_history=str(history))
+    # A snapshot of a run still going (the daemon writes these) is not history
+    monitor.write_metrics(verbose=False)
+    assert not history.exists()
+    monitor.metrics.finish()
+    monitor.write_metrics(verbose=False)
+    assert [json.loads(line)['status'] for line in open(history)] == ['ok']
+    monitor.close()
@@ -0,0 +1,124 @@
+import math
+import random
+
+import pytest
+
+import sentiment
+from keyword_matcher import KeywordMatcher
+from match_stage import MatchStage
+from sentiment import (BREAK_TOKEN, DEFAULT_LEXICON, NEGATION_SCALAR, NORMALIZATION_ALPHA, SentimentCache,
+                       SentimentScorer, label, load_lexicon, mention_windows, tokenize)
+
+COMPETITORS = ['myprotein', 'esn']
+WORDS = list(DEFAULT_LEXICON)[::7] + ['not', "don't", 'never', 'really', 'slightly', 'the', 'tub', 'flavour',
+                                      'and', '.', '!', '\n', 'myprotein', 'esn']
+
+
+def compound(valence):
+    return valence / math.sqrt(valence * valence + NORMALIZATION_ALPHA)
+
+
+@pytest.fixture(params=['numpy', 'python'])
+def engine(request, monkeypatch):
+    """Run each test with NumPy and with the pure-Python fallback"""
+    if request.param == 'python':
+        monkeypatch.setattr(sentiment, 'np', None)
+    return request.param
+
+
+def test_tokenize_keeps_breaks_and_apostrophes():
+    assert tokenize("don't, love it. great!\nok") == \
+        ["don't", 'love', 'it', BREAK_TOKEN, 'great', BREAK_TOKEN, BREAK_TOKEN, 'ok']
+
+
+def test_label():
+    assert [label(score) for score in (-0.5, -0.05, 0.0, 0.05, 0.5)] == \
+        ['negative', 'negative', 'neutral', 'positive', 'positive']
+
+
+@pytest.mark.parametrize('window, valence', [
+    ('myprotein is great', 3.1),
+    ('myprotein is not great', 3.1 * NEGATION_SCALAR),
+    ("i don't think it is great", 3.1),
+    ('myprotein is really great', 3.1 * 1.3),
+    ('not. great stuff', 3.1),
+    ('great but chalky', 3.1 - 1.5),
+    ('just a tub of powder', 0.0),
+])
+def test_rules(engine, window, valence):
+    [score] = SentimentScorer().score_windows([window])
+    assert score == pytest.approx(compound(valence))
+
+
+def test_numpy_and_python_scores_agree(monkeypatch):
+    rng = random.Random(5)
+    windows = [' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 30))) for _ in range(300)]
+    expected = SentimentScorer().score_windows(windows)
+    monkeypatch.setattr(sentiment, 'np', None)
+    assert SentimentScorer().score_windows(windows) == pytest.approx(expected)
+    assert any(score > 0 for score in expected) and any(score < 0 for score in expected)
+
+
+def test_mention_windows_join_each_competitors_mentions():
+    text = 'x' * 10 + ' myprotein ' + 'y' * 10 + ' esn ' + 'z' * 10 + ' myprotein'
+    matcher = KeywordMatcher([], COMPETITORS)
+    spans = []
+    _, competitor_ids = matcher.match_ids(text, spans)
+    windows = mention_windows(text, spans, competitor_ids, width=3)
+    assert windows[competitor_ids.index(0)] == 'xx myprotein yy\nzz myprotein'
+    assert windows[competitor_ids.index(1)] == 'yy esn zz'
+
+
+def test_load_lexicon(tmp_path):
+    path = tmp_path / 'lexicon.txt'
+    path.write_text('# comment\t1\nGreat\t2.5\t0.5\t[2, 3]\nbroken line\n\tmissing\n')
+    lexicon = load_lexicon(str(path))
+    assert lexicon == {'great': 2.5}
+    assert SentimentScorer(lexicon).score_windows(['great']) == pytest.approx([compound(2.5)])
+
+
+def posts(count=200, seed=11):
+    rng = random.Random(seed)
+    return [{'id': f"p{i}", 'name': f"t3_p{i}", 'title': ' '.join(rng.choice(WORDS) for _ in range(8)),
+             'selftext': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(0, 30))), 'score': 1,
+             'num_comments': 0, 'created_utc': 1_700_000_000 + i, 'subreddit': 'fitness', 'permalink': ''}
+            for i in range(count)]
+
+
+def scored(scorer, signatures=True):
+    records = list(MatchStage(KeywordMatcher([], COMPETITORS), sentiment=scorer, signatures=signatures)
+                   .match(posts()))
+    return {record.id: record.competitor_sentiment for record in records}
+
+
+@pytest.mark.parametrize('signatures', [True, False])
+def test_cached_scores_are_reused_across_runs(tmp_path, signatures):
+    path = str(tmp_path / 'sentiment.db')
+    first = SentimentScorer(cache=SentimentCache(path))
+    expected = scored(first, signatures)
+    assert first.scored > 0 and first.cache_hits == 0
+    assert expected and all(expected.values())
+    first.cache.close()
+
+    second = SentimentScorer(cache=SentimentCache(path))
+    assert scored(second, signatures) == pytest.approx(expected)
+    assert (second.scored, second.cache_hits) == (0, first.scored)
+
+
+def test_a_new_lexicon_rescores(tmp_path):
+    path = str(tmp_path / 'sentiment.db')
+    first = SentimentScorer(cache=SentimentCache(path))
+    scored(first)
+    changed = SentimentScorer({**DEFAULT_LEXICON, 'great': -3.0}, cache=SentimentCache(path))
+    assert changed.version != first.version
+    scored(changed)
+    assert (changed.scored, changed.cache_hits) == (first.scored, 0)
+
+
+def test_large_hashes_round_trip(tmp_path):
+    cache = SentimentCache(str(tmp_path / 'sentiment.db'))
+    scores = {((1 << 64) - 1, 'Esn'): -0.5, (1 << 63, 'Esn'): 0.25, (7, 'Myprotein'): 0.0}
+    cache.put_many(scores, 'v1')
+    assert cache.get_many(list(scores) + [(8, 'Esn')], 'v1') == scores
+    assert cache.get_many(scores, 'v2') == {}
+    cache.close()
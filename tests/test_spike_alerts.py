@@ -0,0 +1,132 @@
+import math
+import random
+from collections import Counter
+
+import pytest
+
+from spike_alerts import SpikeDetector
+
+HOUR = 3600
+START = 480_000 * HOUR
+
+
+def reference_spikes(events, baseline_buckets, z_threshold, ratio_threshold, min_count, min_baseline):
+    """Spikes found by rescanning each pattern's history on every mention (events in time order)"""
+    counts = {}
+    alerted = set()
+    first = None
+    spikes = []
+    for name, created_utc in events:
+        bucket = int(created_utc // HOUR)
+        first = bucket if first is None else first
+        series = counts.setdefault(name, Counter())
+        series[bucket] += 1
+        history = min(bucket - first, baseline_buckets)
+        if history < min_baseline or (name, bucket) in alerted:
+            continue
+        window = [series[b] for b in range(bucket - history, bucket)]
+        mean = sum(window) / history
+        std = math.sqrt(max(sum(c * c for c in window) / history - mean * mean, 0.0))
+        thresholds = []
+        if z_threshold is not None:
+            thresholds.append(math.ceil(mean + z_threshold * max(std, 1.0)))
+        if ratio_threshold is not None:
+            thresholds.append(math.ceil(ratio_threshold * max(mean, 1.0)))
+        if series[bucket] >= max(min_count, min(thresholds)):
+            alerted.add((name, bucket))
+            spikes.append((name, bucket * HOUR, series[bucket]))
+    return spikes
+
+
+def bursty_events(seed, hours=400):
+    rng = random.Random(seed)
+    events = []
+    for hour in range(hours):
+        # Quiet stretches longer than a short ring
+        if 60 <= hour % 100 < 90:
+            continue
+        for name in ('creatine', 'protein', 'sleep'):
+            rate = 3 if rng.random() > 0.03 else 25
+            events.extend((name, START + hour * HOUR + rng.randrange(HOUR)) for _ in range(rng.randint(0, rate)))
+    return sorted(events, key=lambda event: event[1])
+
+
+@pytest.mark.parametrize('params', [
+    dict(baseline_buckets=168, z_threshold=4.0, ratio_threshold=None, min_count=5, min_baseline=24),
+    dict(baseline_buckets=12, z_threshold=3.0, ratio_threshold=3.0, min_count=3, min_baseline=4),
+    dict(baseline_buckets=24, z_threshold=None, ratio_threshold=2.5, min_count=5, min_baseline=24),
+])
+def test_spikes_match_a_rescan_of_the_history(params):
+    events = bursty_events(seed=params['baseline_buckets'])
+    detector = SpikeDetector(HOUR, **params)
+    found = [(spike.name, spike.bucket_start, spike.count)
+             for name, created_utc in events for spike in [detector.add('keyword', name, created_utc)] if spike]
+    assert found == reference_spikes(events, **params)
+    assert found and detector.spikes == len(found)
+    assert detector.events == len(events) and len(detector) == 3
+
+
+def seeded_detector(per_hour=2, hours=24, **kwargs):
+    detector = SpikeDetector(HOUR, **kwargs)
+    for hour in range(hours):
+        detector.seed('competitor', 'myprotein', START + hour * HOUR, per_hour)
+    return detector
+
+
+def test_seeded_baseline_alerts_once_per_bucket():
+    detector = seeded_detector()
+    now = START + 24 * HOUR
+    # A flat baseline of 2/hour: the std floor of 1 puts the trigger at 2 + 4 * 1 = 6
+    results = [detector.add('competitor', 'myprotein', now + i, now=now) for i in range(10)]
+    assert [i for i, spike in enumerate(results) if spike] == [5]
+    spike = results[5]
+    assert (spike.count, spike.mean, spike.std, spike.z, spike.ratio) == (6, 2.0, 0.0, 4.0, 3.0)
+    assert spike.display_name == 'Myprotein'
+    assert spike.as_dict()['bucket_start'] == now
+    assert 'Myprotein: 6 mentions in 60 min' in spike.describe()
+
+
+def test_nothing_fires_before_min_baseline():
+    detector = seeded_detector(hours=10, min_baseline=24)
+    now = START + 10 * HOUR
+    assert not any(detector.add('competitor', 'myprotein', now, now=now) for _ in range(100))
+
+
+def test_replayed_history_sends_no_stale_alerts():
+    detector = seeded_detector()
+    old = START + 24 * HOUR
+    assert not any(detector.add('competitor', 'myprotein', old, now=old + 5 * HOUR) for _ in range(20))
+    # The bucket that just ended can still alert
+    detector = seeded_detector()
+    assert any(detector.add('competitor', 'myprotein', old, now=old + HOUR) for _ in range(20))
+
+
+def test_late_mentions_count_towards_the_baseline():
+    detector = seeded_detector()
+    now = START + 24 * HOUR
+    detector.add('competitor', 'myprotein', now)
+    # Ten late mentions an hour back raise that bucket to 12: the trigger goes from 6 to 11
+    assert not any(detector.add('competitor', 'myprotein', now - HOUR) for _ in range(10))
+    results = [detector.add('competitor', 'myprotein', now + 1) for _ in range(10)]
+    assert [spike.count for spike in results if spike] == [11]
+
+
+def test_long_gap_clears_the_ring():
+    detector = seeded_detector(per_hour=50, baseline_buckets=24)
+    later = START + 200 * HOUR
+    # The busy hours are out of the window, so a modest count is a spike again
+    assert any(detector.add('competitor', 'myprotein', later) for _ in range(5))
+
+
+def test_observe_counts_every_pattern_of_a_post():
+    detector = SpikeDetector(HOUR, z_threshold=None, ratio_threshold=1.0, min_count=1, min_baseline=0)
+    post = {'created_utc': START, 'matched_keywords': ['creatine', 'sleep'], 'matched_competitors': ['esn']}
+    spikes = detector.observe(post)
+    assert [(spike.kind, spike.display_name) for spike in spikes] == \
+        [('keyword', 'creatine'), ('keyword', 'sleep'), ('competitor', 'Esn')]
+    assert detector.observe(post) == []
+
+
+def test_needs_a_threshold():
+    with pytest.raises(ValueError):
+        SpikeDetector(z_threshold=None, ratio_threshold=None)
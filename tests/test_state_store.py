@@ -0,0 +1,124 @@
+import time
+
+import pytest
+
+from reddit_fetcher import TokenBucket
+from reddit_monitor import SimpleRedditMonitor
+from run_metrics import RunMetrics
+from state_store import StateStore
+
+DAY = 86400
+
+
+def listing_post(index, created_utc, subreddit='fitness'):
+    """A listing child that always matches (every title mentions creatine)"""
+    post_id = f"{subreddit[:3]}{index:07d}"
+    return {'kind': 't3', 'data': {
+        'id': post_id, 'name': f"t3_{post_id}", 'title': f"Creatine question {index}", 'selftext': '',
+        'score': index % 50, 'num_comments': index % 7, 'created_utc': created_utc, 'subreddit': subreddit,
+        'permalink': f"/r/{subreddit}/comments/{post_id}/post/"}}
+
+
+def prepend_posts(stub, count, first_index, now, spacing=60, subreddit='fitness'):
+    """New posts at the top of a stub listing, newest first, all newer than what is there"""
+    new = [listing_post(first_index + count - 1 - i, now - i * spacing, subreddit) for i in range(count)]
+    stub.listings[subreddit] = new + stub.listings.get(subreddit, [])
+    return [child['data'] for child in new]
+
+
+@pytest.fixture
+def monitor(stub, tmp_path):
+    monitor = SimpleRedditMonitor(state_path=str(tmp_path / 'state.db'))
+    monitor.metrics = RunMetrics('report')
+    monitor.subreddits = ['fitness']
+    monitor.fetcher.base_url = stub.base_url
+    monitor.fetcher.verbose = False
+    monitor.fetcher.rate_limiter = TokenBucket(1000, 100)
+    yield monitor
+    monitor.close()
+
+
+def test_high_water_round_trip(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    assert store.get_high_water('fitness') is None
+    store.set_high_water('fitness', 't3_a', 100.0)
+    store.set_high_water('fitness', 't3_b', 200.0)
+    assert store.get_high_water('fitness') == ('t3_b', 200.0)
+    store.close()
+    assert StateStore(str(tmp_path / 'state.db')).get_high_water('fitness') == ('t3_b', 200.0)
+
+
+def test_matches_and_coverage(tmp_path):
+    store = StateStore(str(tmp_path / 'state.db'))
+    posts = [{'id': f"t3_{i}", 'subreddit': 'fitness' if i % 2 else 'running', 'created_utc': float(i)}
+             for i in range(10)]
+    store.add_matches(posts)
+    store.add_matches(posts[:3])
+    assert store.seen_ids(['t3_1', 't3_9', 't3_x']) == {'t3_1', 't3_9'}
+    assert [post['id'] for post in store.matches_since(5, {'fitness'})] == ['t3_5', 't3_7', 't3_9']
+    store.set_coverage('fitness', 50.0)
+    assert store.get_coverage() == {'fitness': 50.0}
+    assert store.get_coverage(['running']) == {}
+
+
+def test_incremental_runs_only_return_new_matches(monitor, stub):
+    now = time.time()
+    prepend_posts(stub, 150, 0, now - DAY)
+    first = monitor.search_reddit_posts(days_back=7)
+    assert len(first) == 150
+    newest = stub.listings['fitness'][0]['data']
+    assert monitor.state_store.get_high_water('fitness') == (newest['name'], newest['created_utc'])
+
+    added = prepend_posts(stub, 20, 150, now)
+    second = monitor.search_reddit_posts(days_back=7)
+    assert sorted(post['id'] for post in second) == sorted(post['name'] for post in added)
+    assert monitor.state_store.get_high_water('fitness')[0] == added[0]['name']
+    # The second fetch stopped at the mark instead of paging back a week
+    assert monitor.fetch_stats['fitness']['pages'] == 1
+
+
+def test_truncated_fetch_keeps_the_mark_until_a_run_reaches_it(monitor, stub):
+    now = time.time()
+    prepend_posts(stub, 50, 0, now - DAY)
+    monitor.search_reddit_posts(days_back=7)
+    mark = monitor.state_store.get_high_water('fitness')
+
+    # More new posts than two pages hold
+    added = prepend_posts(stub, 350, 50, now)
+    monitor.fetcher.max_pages = 2
+    truncated = monitor.search_reddit_posts(days_back=7)
+    assert len(truncated) == 200
+    assert monitor.metrics.counters['fetch_truncated'] == 1
+    assert monitor.state_store.get_high_water('fitness') == mark
+    # The report knows the older part of the window is incomplete
+    assert monitor.covered_since == added[199]['created_utc']
+
+    monitor.fetcher.max_pages = 10
+    caught_up = monitor.search_reddit_posts(days_back=7)
+    assert len(caught_up) == 150
+    assert monitor.state_store.seen_ids(post['name'] for post in added) == {post['name'] for post in added}
+    assert monitor.state_store.get_high_water('fitness')[0] == added[0]['name']
+    assert monitor.covered_since < now - 6 * DAY
+
+
+def test_first_truncated_fetch_sets_the_mark_and_records_the_gap(monitor, stub):
+    now = time.time()
+    added = prepend_posts(stub, 300, 0, now, spacing=600)
+    monitor.fetcher.max_pages = 1
+    monitor.search_reddit_posts(days_back=7)
+    assert monitor.state_store.get_high_water('fitness')[0] == added[0]['name']
+    assert monitor.state_store.get_coverage() == {'fitness': added[99]['created_utc']}
+    assert monitor.covered_since == added[99]['created_utc']
+
+
+def test_failed_fetch_keeps_the_mark(monitor, stub):
+    now = time.time()
+    prepend_posts(stub, 30, 0, now - DAY)
+    monitor.search_reddit_posts(days_back=7)
+    mark = monitor.state_store.get_high_water('fitness')
+
+    prepend_posts(stub, 10, 30, now)
+    stub.fault_rate, stub.fault_burst = 1.0, 100
+    monitor.fetcher.max_retries = 0
+    assert monitor.search_reddit_posts(days_back=7) == []
+    assert monitor.state_store.get_high_water('fitness') == mark
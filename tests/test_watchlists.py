@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from post_record import PostRecord
+from watchlists import ProfileIndex, WatchlistProfile, load_profiles
+
+PROFILES = [
+    WatchlistProfile('Supplements', ['creatine', 'protein'], ['myprotein', 'esn'], ['Fitness', 'nutrition']),
+    WatchlistProfile('Endurance', ['electrolytes', 'protein'], ['puresport', 'myprotein'], ['running', 'fitness']),
+]
+TEXTS = [
+    'creatine and electrolytes, myprotein vs puresport',
+    'esn protein bars',
+    'electrolytes for a marathon',
+    'nothing relevant',
+    'protein protein myprotein',
+]
+
+
+def records(index, subreddit):
+    for i, text in enumerate(TEXTS):
+        keyword_ids, competitor_ids = index.matcher.match_ids(text)
+        if keyword_ids or competitor_ids:
+            record = PostRecord(f"t3_{subreddit}{i}", 1_700_000_000 + i, text, i, 0, subreddit, keyword_ids,
+                                competitor_ids, f"/r/{subreddit}/{i}", index.matcher,
+                                competitor_sentiment=tuple(0.1 * (n + 1) for n in range(len(competitor_ids))))
+            record.discussion = i
+            yield record
+
+
+def test_subreddits_are_fetched_once():
+    assert ProfileIndex(PROFILES).subreddits == ['Fitness', 'nutrition', 'running']
+
+
+def test_one_scan_gives_each_profile_its_own_matches():
+    index = ProfileIndex(PROFILES)
+    posts = [record for subreddit in ('fitness', 'nutrition', 'running') for record in records(index, subreddit)]
+    for profile in PROFILES:
+        selected = list(index.select(profile, posts))
+        expected = [(post.id, profile.matcher.match(post.title)) for post in posts
+                    if post.subreddit in profile.subreddit_set and any(profile.matcher.match(post.title))]
+        assert [(post.id, (post.matched_keywords, post.matched_competitors)) for post in selected] == expected
+        assert all(post.patterns is profile.matcher for post in selected)
+
+
+def test_selected_records_keep_their_discussion_and_sentiment():
+    index = ProfileIndex(PROFILES)
+    [first] = [post for post in records(index, 'fitness') if post.id == 't3_fitness0']
+    assert first.matched_competitors == ['myprotein', 'puresport', 'myprotein']
+    supplements = next(index.select(PROFILES[0], [first]))
+    endurance = next(index.select(PROFILES[1], [first]))
+    # Sentiment scores follow their competitor into each profile
+    assert supplements.matched_competitors == ['myprotein']
+    assert supplements.competitor_sentiment == (0.1,)
+    assert endurance.matched_competitors == ['puresport', 'myprotein']
+    assert endurance.competitor_sentiment == pytest.approx((0.2, 0.3))
+    assert supplements.discussion == endurance.discussion == 0
+
+
+def test_stored_post_dicts_are_selected_by_name():
+    index = ProfileIndex(PROFILES)
+    post = {'id': 't3_x', 'subreddit': 'Running', 'matched_keywords': ['electrolytes', 'creatine'],
+            'matched_competitors': ['esn', 'puresport'], 'competitor_sentiment': [-0.5, 0.5]}
+    assert list(index.select(PROFILES[0], [post])) == []
+    [selected] = index.select(PROFILES[1], [post])
+    assert selected['matched_keywords'] == ['electrolytes']
+    assert selected['matched_competitors'] == ['puresport']
+    assert selected['competitor_sentiment'] == [0.5]
+    # The stored post itself is left alone
+    assert post['matched_keywords'] == ['electrolytes', 'creatine']
+
+
+def test_load_profiles_from_json(tmp_path):
+    path = tmp_path / 'watchlists.json'
+    path.write_text(json.dumps({'profiles': [
+        {'name': 'Team A/B', 'keywords': ['creatine'], 'subreddits': ['fitness'], 'recipients': 'a@x.com; b@x.com'},
+        {'name': 'Brands', 'competitors': ['esn'], 'subreddits': ['nutrition']},
+    ]}))
+    first, second = load_profiles(str(path))
+    assert (first.name, first.slug, first.recipients) == ('Team A/B', 'Team-A-B', ['a@x.com', 'b@x.com'])
+    assert (second.competitors, second.recipients) == (['esn'], [])
+
+    path.write_text(json.dumps({'Solo': {'keywords': ['sleep'], 'subreddits': ['running']}}))
+    assert [profile.name for profile in load_profiles(str(path))] == ['Solo']
+
+
+@pytest.mark.parametrize('config, error', [
+    ({'profiles': [{'keywords': ['x'], 'subreddits': ['y']}]}, 'needs a name'),
+    ({'profiles': [{'name': 'A', 'keywords': ['x'], 'subreddits': ['y']}] * 2}, 'duplicate'),
+    ({'A': {'keywords': ['x']}}, 'no subreddits'),
+    ({'A': {'subreddits': ['y']}}, 'no keywords or competitors'),
+    ({}, 'no watchlist profiles'),
+    ([], 'expected a mapping'),
+])
+def test_invalid_profiles_are_rejected(tmp_path, config, error):
+    path = tmp_path / 'watchlists.json'
+    path.write_text(json.dumps(config))
+    with pytest.raises(ValueError, match=error):
+        load_profiles(str(path))
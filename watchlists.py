@@ -0,0 +1,165 @@
+import json
+import re
+
+try:
+    import yaml
+except ImportError:  # pragma: no cover - only needed for YAML watchlists
+    yaml = None
+
+from keyword_matcher import KeywordMatcher
+from post_record import PostRecord
+
+
+class WatchlistProfile:
+    """One team's watchlist: what to look for, where, and who gets the report"""
+
+    def __init__(self, name, keywords=(), competitors=(), subreddits=(), recipients=(),
+                 word_boundaries=False):
+        self.name = name
+        self.keywords = list(keywords)
+        self.competitors = list(competitors)
+        self.subreddits = list(subreddits)
+        self.recipients = list(recipients)
+        self.subreddit_set = {s.lower() for s in self.subreddits}
+        self.keyword_set = set(self.keywords)
+        self.competitor_set = set(self.competitors)
+        # Only used to resolve this profile's pattern IDs to names and count them;
+        # posts are scanned once by the ProfileIndex's combined matcher
+        self.matcher = KeywordMatcher(self.keywords, self.competitors, word_boundaries=word_boundaries)
+
+    @property
+    def slug(self):
+        """The name made safe for use in a file name"""
+        return re.sub(r'[^A-Za-z0-9_-]+', '-', self.name).strip('-') or 'profile'
+
+    @classmethod
+    def from_config(cls, name, config, word_boundaries=False):
+        if not isinstance(config, dict):
+            raise ValueError(f"Watchlist '{name}' must be a mapping")
+        if not config.get('subreddits'):
+            raise ValueError(f"Watchlist '{name}' has no subreddits")
+        if not (config.get('keywords') or config.get('competitors')):
+            raise ValueError(f"Watchlist '{name}' has no keywords or competitors")
+        recipients = config.get('recipients') or ()
+        if isinstance(recipients, str):
+            recipients = [r.strip() for r in recipients.replace(';', ',').split(',') if r.strip()]
+        return cls(name, config.get('keywords') or (), config.get('competitors') or (),
+                   config['subreddits'], recipients, word_boundaries=word_boundaries)
+
+    def __repr__(self):
+        return f"WatchlistProfile(name={self.name!r}, subreddits={self.subreddits!r})"
+
+
+def load_profiles(path, word_boundaries=False):
+    """Read watchlist profiles from a JSON or YAML file
+
+    The file holds either `{"profiles": [{"name": ..., ...}, ...]}` or a mapping
+    of profile name to profile. Each profile has `subreddits`, `keywords` and/or
+    `competitors`, and optionally `recipients`.
+    """
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            if yaml is None:
+                raise RuntimeError("Reading YAML watchlists requires the 'PyYAML' package")
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+
+    if isinstance(config, dict) and 'profiles' in config:
+        entries = [(entry.get('name') if isinstance(entry, dict) else None, entry)
+                   for entry in config['profiles'] or ()]
+    elif isinstance(config, dict):
+        entries = list(config.items())
+    else:
+        raise ValueError(f"{path}: expected a mapping of watchlist profiles")
+
+    profiles = []
+    for name, entry in entries:
+        if not name:
+            raise ValueError(f"{path}: every watchlist profile needs a name")
+        if any(profile.name == name for profile in profiles):
+            raise ValueError(f"{path}: duplicate watchlist profile '{name}'")
+        profiles.append(WatchlistProfile.from_config(str(name), entry, word_boundaries))
+    if not profiles:
+        raise ValueError(f"{path}: no watchlist profiles defined")
+    return profiles
+
+
+class ProfileIndex:
+    """One combined pattern index and subreddit list for many watchlist profiles
+
+    The combined matcher's keyword and competitor lists are the profiles' lists
+    laid end to end, so a post is scanned once for every profile and each
+    profile's hits are a contiguous ID range. `select` hands each profile the
+    posts from its own subreddits that hit its own patterns, renumbered into its
+    own matcher's IDs.
+    """
+
+    def __init__(self, profiles, word_boundaries=False, brand_variants=False):
+        self.profiles = list(profiles)
+        keywords, competitors = [], []
+        self._ranges = {}
+        for profile in self.profiles:
+            self._ranges[profile.name] = (len(keywords), len(competitors))
+            keywords.extend(profile.keywords)
+            competitors.extend(profile.competitors)
+        self.keywords = keywords
+        self.competitors = competitors
+        self.matcher = KeywordMatcher(keywords, competitors, word_boundaries=word_boundaries,
+                                      brand_variants=brand_variants)
+
+        # Fetch every subreddit once, however many profiles watch it
+        self.subreddits = []
+        seen = set()
+        for profile in self.profiles:
+            for name in profile.subreddits:
+                if name.lower() not in seen:
+                    seen.add(name.lower())
+                    self.subreddits.append(name)
+
+    @staticmethod
+    def _renumber(ids, start, count):
+        return tuple(i - start for i in ids if start <= i < start + count)
+
+    def select(self, profile, posts):
+        """Yield the posts relevant to `profile`, with matches limited to its patterns
+
+        Accepts PostRecords built against the combined matcher, or stored post
+        dicts carrying pattern names.
+        """
+        keyword_start, competitor_start = self._ranges[profile.name]
+        keyword_count, competitor_count = len(profile.keywords), len(profile.competitors)
+        for post in posts:
+            if post['subreddit'].lower() not in profile.subreddit_set:
+                continue
+            if isinstance(post, PostRecord):
+                keyword_ids = self._renumber(post.keyword_ids, keyword_start, keyword_count)
+                competitor_ids = self._renumber(post.competitor_ids, competitor_start, competitor_count)
+                comment_keyword_ids = self._renumber(post.comment_keyword_ids, keyword_start, keyword_count)
+                comment_competitor_ids = self._renumber(post.comment_competitor_ids, competitor_start,
+                                                        competitor_count)
+                if keyword_ids or competitor_ids or comment_keyword_ids or comment_competitor_ids:
+                    sentiment = post.competitor_sentiment
+                    if sentiment is not None:
+                        sentiment = tuple(score for i, score in zip(post.competitor_ids, sentiment)
+                                          if competitor_start <= i < competitor_start + competitor_count)
+                    record = PostRecord(post.id, post.created_utc, post.title, post.score, post.num_comments,
+                                        post.subreddit, keyword_ids, competitor_ids, post.path,
+                                        profile.matcher, comment_keyword_ids, comment_competitor_ids,
+                                        post.crosspost_parent, post.content_hash, post.simhash, sentiment)
+                    record.discussion = post.discussion
+                    yield record
+            else:
+                names = {
+                    field: [name for name in post.get(field) or () if name in allowed]
+                    for field, allowed in (('matched_keywords', profile.keyword_set),
+                                           ('matched_competitors', profile.competitor_set),
+                                           ('comment_keywords', profile.keyword_set),
+                                           ('comment_competitors', profile.competitor_set))
+                }
+                if any(names.values()):
+                    if post.get('competitor_sentiment'):
+                        names['competitor_sentiment'] = [
+                            score for name, score in zip(post['matched_competitors'], post['competitor_sentiment'])
+                            if name in profile.competitor_set]
+                    yield dict(post, **names)